@@ -1,13 +1,31 @@
 # -*- mode: python ; coding: utf-8 -*-
+from PyInstaller.utils.hooks import collect_data_files, copy_metadata
 
 block_cipher = None
 
+# run_app.py starts Streamlit in-process, so Streamlit (with its static
+# assets and package metadata) is bundled. The app modules ship as data and
+# import their dependencies lazily, which analysis can't see; list them here.
+hidden_imports = [
+    'streamlit.web.cli',
+    'streamlit.runtime.scriptrunner.magic_funcs',
+    'requests',
+    'lxml.etree',
+    'PIL.Image',
+    'PIL.ImageOps',
+    'fitz',
+    'pytesseract',
+    'tesserocr',
+    'sqlite3',
+]
+
 a = Analysis(
     ['run_app.py'],
     pathex=['.'],
     binaries=[],
-    datas=[('app.py', '.')],
-    hiddenimports=[],
+    datas=[('app.py', '.'), ('utils.py', '.'), ('compliance_logic.py', '.'), ('rule_engine.py', '.'), ('rules.json', '.'), ('extract_cache.py', '.'), ('api_client.py', '.'), ('ocr_engine.py', '.'), ('pdf_extract.py', '.'), ('html_extract.py', '.'), ('fuzzy.py', '.'), ('metrics.py', '.'), ('errors.py', '.'), ('incremental.py', '.'), ('result_store.py', '.')]
+        + collect_data_files('streamlit') + copy_metadata('streamlit'),
+    hiddenimports=hidden_imports,
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
@@ -29,7 +47,8 @@ exe = EXE(
     debug=False,
     bootloader_ignore_signals=False,
     strip=False,
-    upx=True,
+    # UPX-packed binaries are decompressed on every launch; size isn't worth it.
+    upx=False,
     console=False
 )
 
@@ -38,7 +57,7 @@ coll = COLLECT(
     a.binaries,
     a.datas,
     strip=False,
-    upx=True,
+    upx=False,
     upx_exclude=[],
     name='A2PComplianceApp'
 )
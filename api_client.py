@@ -0,0 +1,72 @@
+"""
+Client for api_server.py, used by the Streamlit UI when A2P_API_URL is set so
+that every reviewer shares one warm backend instead of OCR'ing in-process.
+"""
+import base64
+import os
+import time
+
+from errors import ExtractionError, error_reason
+
+API_URL = os.environ.get("A2P_API_URL", "").rstrip("/")
+
+def _post(path, payload, retries=3):
+    import requests  # Deferred so the app can render before it loads.
+
+    for attempt in range(retries + 1):
+        response = requests.post(f"{API_URL}{path}", json=payload, timeout=120)
+        if response.status_code in (429, 503) and attempt < retries:
+            time.sleep(float(response.headers.get("Retry-After", 1)))
+            continue
+        if response.status_code == 422:
+            # The server's extractor failed; keep its stage and reason.
+            body = response.json()
+            raise ExtractionError(body.get("stage", "api"), body.get("reason", "unknown"), body.get("error", ""))
+        response.raise_for_status()
+        return response.json()
+
+def extract_text_from_image(uploaded_file):
+    """
+    Extracts text from an uploaded image via the API's OCR workers.
+    Raises ExtractionError on failure.
+    """
+    try:
+        data = uploaded_file.getvalue()
+        return _post("/v1/extract/image", {"image_base64": base64.b64encode(data).decode("ascii")})["text"]
+    except ExtractionError:
+        raise
+    except Exception as e:
+        raise ExtractionError("extract_image", error_reason(e), f"Failed to extract text from image: {e}") from e
+
+def extract_text_from_images(uploaded_files, max_workers=4):
+    """
+    Extracts text from several images with concurrent requests. Returns
+    (text, error) pairs in input order, like `utils.extract_text_from_images`;
+    memory is bounded by the server's OCR workers.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    def extract(uploaded_file):
+        try:
+            return extract_text_from_image(uploaded_file), None
+        except ExtractionError as e:
+            return None, e
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        return list(pool.map(extract, uploaded_files))
+
+def extract_text_from_url(url):
+    """
+    Extracts text from a URL via the API's fetch workers; like
+    utils.extract_text_from_url, text cut at the byte cap is flagged.
+    Raises ExtractionError on failure.
+    """
+    from html_extract import PageText  # Deferred, like requests in _post.
+
+    try:
+        response = _post("/v1/extract/url", {"url": url})
+        return PageText(response["text"], response.get("truncated", False))
+    except ExtractionError:
+        raise
+    except Exception as e:
+        raise ExtractionError("extract_url", error_reason(e), f"Failed to fetch content from URL: {e}") from e
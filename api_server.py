@@ -0,0 +1,399 @@
+"""
+HTTP API for extraction and compliance checks.
+
+One long-running backend that the Streamlit UI (see api_client.py) and the
+intake pipeline can share. OCR, URL fetches and checks run on a bounded
+worker pool; when every worker is busy and the queue is full, requests get
+429 with a Retry-After header, and 503 while the server is shutting down.
+
+Endpoints (JSON in, JSON out):
+    GET  /health
+    POST /v1/extract/image   {"image_base64": ...}
+    POST /v1/extract/url     {"url": ...}
+    POST /v1/check/optin     {"text": ..., "fuzzy": false, "campaign_id": ...}
+    POST /v1/check/privacy   {"text": ..., "fuzzy": false, "campaign_id": ...}
+    POST /v1/check           {"optin_text" | "optin_image_base64",
+                              "privacy_text" | "privacy_url" | "privacy_image_base64",
+                              "fuzzy": false, "campaign_id": ...}
+    GET  /v1/jobs/<job_id>
+    GET  /metrics            Prometheus text format
+    GET  /metrics.json
+
+POST requests accept "?mode=async" to return 202 with a job id to poll
+instead of waiting for the result. Request bodies must be JSON objects, and
+the text, URL, image and campaign fields strings; anything else gets 400.
+Extraction failures return 422 with the failing "stage" and a
+machine-readable "reason". URL text cut at the download cap is flagged with
+"truncated": true (extract/url) or "privacy_truncated": true (check).
+
+Checks go through the result store (see result_store.py); "cached_at" is the
+time identical content was first checked under the current rules, or null.
+
+Set A2P_TRACE_LOG to a file path to log a JSON trace of each request's
+stages (see metrics.py).
+
+Usage:
+    python api_server.py --port 8600 --workers 4 --queue-size 32
+"""
+import argparse
+import base64
+import binascii
+import functools
+import json
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import metrics
+from compliance_logic import check_opt_in_compliance, check_privacy_compliance, summary_fields
+from errors import ExtractionError
+from result_store import checked
+
+MAX_BODY_BYTES = 25 * 1024 * 1024
+
+class Saturated(Exception):
+    """
+    Raised when the worker pool and its queue are full.
+    """
+
+class ShuttingDown(Exception):
+    """
+    Raised when work is submitted after shutdown has begun.
+    """
+
+class ApiError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+# --- Worker pool ---
+
+class WorkerPool:
+    """
+    Thread pool with a bounded queue: at most `workers + queue_size` tasks
+    are accepted at once, and further submissions fail fast.
+    """
+
+    def __init__(self, workers=4, queue_size=32):
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="a2p-worker")
+        self._slots = threading.BoundedSemaphore(workers + queue_size)
+        self._closed = False
+        self.workers = workers
+        self.queue_size = queue_size
+
+    def submit(self, fn, *args):
+        if self._closed:
+            raise ShuttingDown()
+        if not self._slots.acquire(blocking=False):
+            raise Saturated()
+        def run():
+            # Release before the result is published, so a caller that has
+            # seen it can submit again straight away.
+            try:
+                return fn(*args)
+            finally:
+                self._slots.release()
+
+        try:
+            future = self._executor.submit(run)
+        except RuntimeError:
+            self._slots.release()
+            raise ShuttingDown()
+        # A future cancelled while queued never runs, so never releases.
+        future.add_done_callback(lambda f: f.cancelled() and self._slots.release())
+        return future
+
+    def shutdown(self):
+        self._closed = True
+        self._executor.shutdown(wait=True)
+
+class JobStore:
+    """
+    Keeps futures for async-mode requests until they are collected or expire.
+    """
+
+    def __init__(self, ttl=15 * 60):
+        self.ttl = ttl
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def add(self, future):
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            self._purge()
+            self._jobs[job_id] = (future, time.time())
+        return job_id
+
+    def get(self, job_id):
+        with self._lock:
+            entry = self._jobs.get(job_id)
+        return entry[0] if entry else None
+
+    def _purge(self):
+        cutoff = time.time() - self.ttl
+        for job_id in [j for j, (f, created) in self._jobs.items() if f.done() and created < cutoff]:
+            del self._jobs[job_id]
+
+# --- Work ---
+
+class _BytesUpload:
+    """
+    Minimal stand-in for a Streamlit upload: the extractors only call getvalue().
+    """
+
+    def __init__(self, data):
+        self._data = data
+
+    def getvalue(self):
+        return self._data
+
+# Optional request fields that must be strings (or null) when present.
+STRING_FIELDS = (
+    "text", "url", "optin_text", "privacy_text", "privacy_url", "campaign_id",
+    "image_base64", "optin_image_base64", "privacy_image_base64",
+)
+
+def _check_fields(payload):
+    for field in STRING_FIELDS:
+        value = payload.get(field)
+        if value is not None and not isinstance(value, str):
+            raise ApiError(400, f"{field} must be a string")
+
+def _decode_image(payload, field):
+    try:
+        return base64.b64decode(payload[field], validate=True)
+    except (binascii.Error, TypeError) as e:
+        raise ApiError(400, f"{field} is not valid base64: {e}")
+
+def extract_image(data):
+    from utils import extract_text_from_image
+    return {"text": extract_text_from_image(_BytesUpload(data))}
+
+def extract_url(url):
+    from utils import extract_text_from_url
+    text = extract_text_from_url(url)
+    return {"text": text, "truncated": getattr(text, "truncated", False)}
+
+def full_check(payload):
+    """
+    Extracts opt-in and privacy text from the payload and runs both checks,
+    mirroring the Streamlit app's input precedence.
+    """
+    from utils import extract_text_from_image, extract_text_from_url
+
+    if payload.get("optin_image_base64"):
+        optin_text = extract_text_from_image(_BytesUpload(_decode_image(payload, "optin_image_base64")))
+    else:
+        optin_text = payload.get("optin_text") or ""
+
+    privacy_text = payload.get("privacy_text") or ""
+    privacy_url = payload.get("privacy_url") or (privacy_text if privacy_text.startswith("http") else "")
+    if payload.get("privacy_image_base64"):
+        privacy_text = extract_text_from_image(_BytesUpload(_decode_image(payload, "privacy_image_base64")))
+    elif privacy_url:
+        privacy_text = extract_text_from_url(privacy_url)
+
+    fuzzy = bool(payload.get("fuzzy"))
+    campaign = payload.get("campaign_id")
+    optin_result, optin_cached_at = checked(
+        "optin", optin_text, lambda: check_opt_in_compliance(optin_text, fuzzy=fuzzy),
+        fuzzy=fuzzy, campaign=campaign,
+    )
+    privacy_result, privacy_cached_at = checked(
+        "privacy", privacy_text, lambda: check_privacy_compliance(privacy_text, fuzzy=fuzzy),
+        fuzzy=fuzzy, campaign=campaign, source=privacy_url or None,
+    )
+    return {
+        "optin_text": optin_text,
+        "privacy_text": privacy_text,
+        "privacy_truncated": getattr(privacy_text, "truncated", False),
+        "optin": optin_result,
+        "privacy": privacy_result,
+        "summary": summary_fields(optin_result, privacy_result),
+        "cached_at": {"optin": optin_cached_at, "privacy": privacy_cached_at},
+    }
+
+def check_text(rule_set, payload):
+    """
+    Checks pasted text for the single-rule-set endpoints.
+    """
+    text = payload.get("text") or ""
+    fuzzy = bool(payload.get("fuzzy"))
+    check = check_opt_in_compliance if rule_set == "optin" else check_privacy_compliance
+    result, cached_at = checked(
+        rule_set, text, lambda: check(text, fuzzy=fuzzy), fuzzy=fuzzy, campaign=payload.get("campaign_id"),
+    )
+    return dict(result, cached_at=cached_at)
+
+def traced(name, fn, *args):
+    """
+    Runs fn inside a request trace; used for work handed to the pool, whose
+    threads don't see the handler's context.
+    """
+    with metrics.request_trace(name):
+        return fn(*args)
+
+# --- HTTP ---
+
+ROUTES = {
+    "/health", "/metrics", "/metrics.json", "/v1/extract/image", "/v1/extract/url",
+    "/v1/check/optin", "/v1/check/privacy", "/v1/check",
+}
+
+class ApiHandler(BaseHTTPRequestHandler):
+    server_version = "A2PCompliance/1.0"
+
+    def _route(self):
+        path = urlsplit(self.path).path
+        if path.startswith("/v1/jobs/"):
+            return "/v1/jobs"
+        return path if path in ROUTES else "other"
+
+    def _send(self, status, body, headers=None, content_type="application/json; charset=utf-8"):
+        if isinstance(body, str):
+            data = body.encode("utf-8")
+        else:
+            data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        metrics.inc("a2p_http_requests_total", route=self._route(), status=status)
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _payload(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        if length > MAX_BODY_BYTES:
+            raise ApiError(413, "Request body too large")
+        try:
+            payload = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError as e:
+            raise ApiError(400, f"Invalid JSON: {e}")
+        if not isinstance(payload, dict):
+            raise ApiError(400, "Request body must be a JSON object")
+        return payload
+
+    def _dispatch(self, fn, *args):
+        """
+        Runs fn on the worker pool, either waiting for it or returning a job id.
+        """
+        app = self.server.app
+        query = parse_qs(urlsplit(self.path).query)
+        future = app.pool.submit(functools.partial(traced, self._route(), fn), *args)
+        if query.get("mode", ["sync"])[0] == "async":
+            job_id = app.jobs.add(future)
+            return self._send(202, {"job_id": job_id, "status": "queued"},
+                              {"Location": f"/v1/jobs/{job_id}"})
+        try:
+            return self._send(200, future.result(timeout=app.request_timeout))
+        except FutureTimeout:
+            # Keep the work going and let the caller poll for it instead.
+            job_id = app.jobs.add(future)
+            return self._send(504, {"error": "Timed out waiting for result", "job_id": job_id})
+
+    def do_GET(self):
+        path = urlsplit(self.path).path
+        try:
+            if path == "/health":
+                pool = self.server.app.pool
+                return self._send(200, {"status": "ok", "workers": pool.workers, "queue_size": pool.queue_size})
+            if path == "/metrics":
+                return self._send(200, metrics.render_prometheus(), content_type="text/plain; version=0.0.4")
+            if path == "/metrics.json":
+                return self._send(200, metrics.snapshot())
+            if path.startswith("/v1/jobs/"):
+                return self._job(path.rsplit("/", 1)[-1])
+            raise ApiError(404, "Not found")
+        except ApiError as e:
+            self._send(e.status, {"error": str(e)})
+
+    def _job(self, job_id):
+        future = self.server.app.jobs.get(job_id)
+        if future is None:
+            raise ApiError(404, "Unknown or expired job")
+        if not future.done():
+            return self._send(200, {"job_id": job_id, "status": "running" if future.running() else "queued"})
+        error = future.exception()
+        if isinstance(error, ExtractionError):
+            return self._send(200, {"job_id": job_id, "status": "failed", "code": 422, **error.to_dict()})
+        if error is not None:
+            status = error.status if isinstance(error, ApiError) else 500
+            return self._send(200, {"job_id": job_id, "status": "failed", "error": str(error), "code": status})
+        return self._send(200, {"job_id": job_id, "status": "done", "result": future.result()})
+
+    def do_POST(self):
+        path = urlsplit(self.path).path
+        try:
+            payload = self._payload()
+            _check_fields(payload)
+            if path == "/v1/check/optin":
+                # Fuzzy checks of long texts take seconds of CPU; bound them like extraction.
+                return self._dispatch(check_text, "optin", payload)
+            if path == "/v1/check/privacy":
+                return self._dispatch(check_text, "privacy", payload)
+            if path == "/v1/extract/image":
+                if not payload.get("image_base64"):
+                    raise ApiError(400, "image_base64 is required")
+                return self._dispatch(extract_image, _decode_image(payload, "image_base64"))
+            if path == "/v1/extract/url":
+                if not payload.get("url"):
+                    raise ApiError(400, "url is required")
+                return self._dispatch(extract_url, payload["url"])
+            if path == "/v1/check":
+                return self._dispatch(full_check, payload)
+            raise ApiError(404, "Not found")
+        except Saturated:
+            self._send(429, {"error": "Server busy, retry later"}, {"Retry-After": "1"})
+        except ShuttingDown:
+            self._send(503, {"error": "Server shutting down"}, {"Retry-After": "5"})
+        except ApiError as e:
+            self._send(e.status, {"error": str(e)})
+        except ExtractionError as e:
+            self._send(422, e.to_dict())
+        except Exception as e:
+            self._send(500, {"error": f"{type(e).__name__}: {e}"})
+
+class ApiApp:
+    def __init__(self, workers=4, queue_size=32, request_timeout=60, job_ttl=15 * 60):
+        self.pool = WorkerPool(workers, queue_size)
+        self.jobs = JobStore(job_ttl)
+        self.request_timeout = request_timeout
+
+def make_server(host="127.0.0.1", port=8600, **options):
+    """
+    Builds (but does not start) the HTTP server.
+    """
+    server = ThreadingHTTPServer((host, port), ApiHandler)
+    server.daemon_threads = True
+    server.app = ApiApp(**options)
+    return server
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="A2P/TFV compliance HTTP API.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8600)
+    parser.add_argument("--workers", type=int, default=4, help="OCR/fetch worker threads")
+    parser.add_argument("--queue-size", type=int, default=32, help="requests queued before returning 429")
+    parser.add_argument("--request-timeout", type=float, default=60, help="seconds a sync request waits")
+    args = parser.parse_args(argv)
+
+    server = make_server(args.host, args.port, workers=args.workers, queue_size=args.queue_size,
+                         request_timeout=args.request_timeout)
+    print(f"Serving on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        # Close the pool first so requests still being handled get 503.
+        server.app.pool.shutdown()
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
@@ -1,123 +1,29 @@
+import os
+import time
+
 import streamlit as st
-from PIL import Image
-import pytesseract
-import requests
-from bs4 import BeautifulSoup
-import io
-import re
 
-# --- Utility Functions (from utils.py) ---
-
-def extract_text_from_image(uploaded_file):
-    """
-    Extracts text from an uploaded image file using OCR.
-    """
-    try:
-        image = Image.open(uploaded_file)
-        # Using pytesseract to perform OCR on the image
-        text = pytesseract.image_to_string(image)
-        return text
-    except Exception as e:
-        return f"Failed to extract text from image: {e}"
-
-def extract_text_from_url(url):
-    """
-    Scrapes and extracts text content from a given URL.
-    """
-    try:
-        response = requests.get(url, timeout=10)
-        # Ensure the request was successful
-        response.raise_for_status()  
-        soup = BeautifulSoup(response.text, 'html.parser')
-        return soup.get_text(separator=' ', strip=True)
-    except requests.exceptions.RequestException as e:
-        return f"Failed to fetch content from URL: {e}"
-    except Exception as e:
-        return f"An error occurred during URL processing: {e}"
-
-# --- Compliance Logic (from compliance_logic.py) ---
-
-# Pre-defined compliance phrases
-required_optin_phrases = [
-    "consent to receive messages",
-    "message and data rates may apply",
-    "reply stop to unsubscribe",
-    "reply help for help"
-]
-
-prohibited_optin_phrases = [
-    "you will not receive any messages",
-    "we will not contact you"
-]
-
-required_privacy_phrases = [
-    "how information is collected",
-    "how information is used",
-    "how to opt-out",
-    "third parties",
-    "data security",
-    "contact information"
-]
-
-prohibited_privacy_phrases = [
-    "we sell your data",
-    "no responsibility",
-    "at your own risk"
-]
-
-def check_opt_in_compliance(text: str):
-    """
-    Checks opt-in language for compliance with required and prohibited phrases.
-    """
-    if not text.strip():
-        return {
-            "compliant": False,
-            "message": "⚠️ No opt-in language provided.",
-            "present_required": [],
-            "missing_required": required_optin_phrases,
-            "prohibited_phrases_found": []
-        }
-
-    lower_text = text.lower()
-    present_required = [phrase for phrase in required_optin_phrases if phrase in lower_text]
-    prohibited_found = [phrase for phrase in prohibited_optin_phrases if phrase in lower_text]
-    missing_required = [phrase for phrase in required_optin_phrases if phrase not in lower_text]
-
-    compliant = len(missing_required) == 0 and len(prohibited_found) == 0
-
-    return {
-        "compliant": compliant,
-        "message": "✅ Opt-in is compliant." if compliant else "❌ Opt-in is not compliant.",
-        "present_required": present_required,
-        "missing_required": missing_required,
-        "prohibited_phrases_found": prohibited_found
-    }
-
-def check_privacy_compliance(text: str):
-    """
-    Checks privacy policy for compliance with required and prohibited phrases.
-    """
-    if not text.strip():
-        return {
-            "compliant": False,
-            "present_required": [],
-            "missing_required": required_privacy_phrases,
-            "prohibited_phrases_found": []
-        }
-
-    lower_text = text.lower()
-    present_required = [phrase for phrase in required_privacy_phrases if phrase in lower_text]
-    prohibited_found = [phrase for phrase in prohibited_privacy_phrases if phrase in lower_text]
-    missing_required = [phrase for phrase in required_privacy_phrases if phrase not in lower_text]
-
-    compliant = len(missing_required) == 0 and len(prohibited_found) == 0
-
-    return {
-        "compliant": compliant,
-        "present_required": present_required,
-        "missing_required": missing_required,
-        "prohibited_phrases_found": prohibited_found
-    }
+import metrics
+from errors import ExtractionError
+
+# With A2P_API_URL set, extraction runs on the shared API backend (api_server.py).
+USE_API = bool(os.environ.get("A2P_API_URL"))
+if USE_API:
+    from api_client import extract_text_from_images, extract_text_from_url
+else:
+    from utils import extract_text_from_images, extract_text_from_url, extract_and_check_url
+from incremental import IncrementalChecker
+from result_store import checked
+from compliance_logic import (
+    required_optin_phrases,
+    required_privacy_phrases,
+    check_opt_in_compliance,
+    check_privacy_compliance,
+    build_summary,
+    labels_by_source,
+    merge_sources,
+    stream_check,
+)
 
 # --- Streamlit Application UI ---
 
@@ -131,27 +37,125 @@ col1, col2 = st.columns(2)
 with col1:
     st.markdown("### Opt-in")
     optin_text = st.text_area("Paste Opt-in Language or Upload Image", height=100, label_visibility="collapsed", key="optin_text_area")
-    optin_image = st.file_uploader("Or upload Opt-in Screenshot", type=["png", "jpg", "jpeg"], label_visibility="visible", key="optin_uploader")
+    optin_images = st.file_uploader("Or upload Opt-in Screenshots (in flow order)", type=["png", "jpg", "jpeg"], accept_multiple_files=True, label_visibility="visible", key="optin_uploader")
 
 with col2:
     st.markdown("### Privacy Policy")
     privacy_text = st.text_area("Paste Privacy Policy Language or Upload Image / URL", height=100, label_visibility="collapsed", key="privacy_text_area")
-    privacy_image = st.file_uploader("Or upload Privacy Policy Screenshot", type=["png", "jpg", "jpeg"], label_visibility="visible", key="privacy_uploader")
+    privacy_images = st.file_uploader("Or upload Privacy Policy Screenshots or PDFs", type=["png", "jpg", "jpeg", "pdf"], accept_multiple_files=True, label_visibility="visible", key="privacy_uploader")
+
+fuzzy_matching = st.checkbox(
+    "🔎 OCR-tolerant matching (accept small misspellings and line breaks)",
+    value=bool(optin_images or privacy_images),
+    key="fuzzy_checkbox",
+)
+campaign_id = st.text_input("Campaign / brand ID (optional, keeps check history)", key="campaign_id").strip() or None
 
 # --- Logic to handle different input types ---
+def incremental_hits(rule_set, text):
+    """
+    Hits for pasted text, kept up to date across edits so a rerun only
+    rescans the edited part (see incremental.py).
+    """
+    key = f"{rule_set}_checker"
+    if key not in st.session_state:
+        st.session_state[key] = IncrementalChecker(rule_set)
+    return st.session_state[key].update(text)
+
+def reused_caption(cached_at):
+    """
+    Notes when a result came from the result store rather than a fresh check.
+    """
+    if cached_at:
+        st.caption(f"♻️ Same content as a check on {time.strftime('%Y-%m-%d %H:%M', time.localtime(cached_at))}; showing that result.")
+
+def extract_and_check_pdf(uploaded_file):
+    """
+    Reads a PDF page by page, checking each page as it arrives so progress
+    shows before the whole document is extracted. Returns (text, hits).
+    """
+    from pdf_extract import iter_pdf_text
+
+    status = st.empty()
+    parts, result = [], None
+    try:
+        for chunk, result in stream_check("privacy", iter_pdf_text(uploaded_file.getvalue())):
+            parts.append(chunk)
+            status.caption(f"📄 Reading PDF… {len(result['present_required'])}/{len(required_privacy_phrases)} required phrases found so far")
+    finally:
+        status.empty()
+    return "".join(parts), result["hits"] if result else None
+
+def extract_uploads(files, source):
+    """
+    Extracts text from uploaded screenshots (OCR'd in parallel) and PDFs and
+    merges it in upload order. Returns (text, spans) as `merge_sources` does;
+    files that fail are reported and contribute no text.
+    """
+    images = [f for f in files if not f.name.lower().endswith(".pdf")]
+    texts = []
+    with metrics.request_trace("streamlit_extract", source=source, files=len(files)):
+        image_results = iter(extract_text_from_images(images) if images else [])
+        for uploaded_file in files:
+            if uploaded_file.name.lower().endswith(".pdf"):
+                from pdf_extract import extract_text_from_pdf
+                try:
+                    text, error = extract_text_from_pdf(uploaded_file.getvalue()), None
+                except ExtractionError as e:
+                    text, error = None, e
+            else:
+                text, error = next(image_results)
+            if error:
+                st.error(f"{uploaded_file.name}: {error}")
+            texts.append(text or "")
+    return merge_sources(texts)
+
+def source_breakdown(rule_set, result, files, spans):
+    """
+    For multi-file uploads, lists the rules matched in each file.
+    """
+    if not spans or len(spans) < 2:
+        return
+    with st.expander("🖼️ Matches by File"):
+        for number, (uploaded_file, labels) in enumerate(zip(files, labels_by_source(rule_set, result["hits"], spans)), 1):
+            st.markdown(f"**{number}. {uploaded_file.name}:** {', '.join(labels) or 'no matches'}")
+
 processed_optin_text = ""
-if optin_image:
-    processed_optin_text = extract_text_from_image(optin_image)
+optin_hits = None
+optin_spans = None
+if optin_images:
+    processed_optin_text, optin_spans = extract_uploads(optin_images, "optin_images")
 elif optin_text:
     processed_optin_text = optin_text
+    optin_hits = incremental_hits("optin", optin_text)
 
 processed_privacy_text = ""
-if privacy_image:
-    processed_privacy_text = extract_text_from_image(privacy_image)
-elif privacy_text and privacy_text.startswith("http"):
-    processed_privacy_text = extract_text_from_url(privacy_text)
-elif privacy_text:
-    processed_privacy_text = privacy_text
+privacy_hits = None
+privacy_spans = None
+# Policy URLs get their own check history in the result store.
+privacy_source = None
+try:
+    if len(privacy_images) == 1 and privacy_images[0].name.lower().endswith(".pdf"):
+        with metrics.request_trace("streamlit_extract", source="privacy_pdf"):
+            processed_privacy_text, privacy_hits = extract_and_check_pdf(privacy_images[0])
+    elif privacy_images:
+        processed_privacy_text, privacy_spans = extract_uploads(privacy_images, "privacy_uploads")
+    elif privacy_text and privacy_text.startswith("http") and USE_API:
+        privacy_source = privacy_text.strip()
+        with metrics.request_trace("streamlit_extract", source="privacy_url", url=privacy_text):
+            processed_privacy_text = extract_text_from_url(privacy_text)
+    elif privacy_text and privacy_text.startswith("http"):
+        # Stops downloading once every privacy rule is resolved.
+        privacy_source = privacy_text.strip()
+        with metrics.request_trace("streamlit_extract", source="privacy_url", url=privacy_text):
+            processed_privacy_text, privacy_hits, _ = extract_and_check_url(privacy_text, "privacy")
+    elif privacy_text:
+        processed_privacy_text = privacy_text
+        privacy_hits = incremental_hits("privacy", privacy_text)
+except ExtractionError as e:
+    st.error(str(e))
+if getattr(processed_privacy_text, "truncated", False):
+    st.warning("⚠️ The policy page was cut off at the download limit; only its beginning was checked.")
 
 # Button to trigger compliance check
 if st.button("✅ Check Compliance", key="check_button"):
@@ -161,7 +165,21 @@ if st.button("✅ Check Compliance", key="check_button"):
 
     with col_optin:
         st.markdown("#### ✅ Opt-in Feedback")
-        optin_result = check_opt_in_compliance(processed_optin_text)
+        # Incremental hits are exact-only, so fuzzy mode rescans the text.
+        # Identical content checked before under the same rules reuses that result.
+        optin_result, optin_cached_at = checked(
+            "optin",
+            processed_optin_text,
+            lambda: check_opt_in_compliance(
+                processed_optin_text,
+                hits=None if fuzzy_matching else optin_hits,
+                fuzzy=fuzzy_matching,
+            ),
+            fuzzy=fuzzy_matching,
+            campaign=campaign_id,
+        )
+        reused_caption(optin_cached_at)
+        source_breakdown("optin", optin_result, optin_images, optin_spans)
         
         # New logic to handle empty opt-in and display errors line-by-line
         if not processed_optin_text.strip():
@@ -170,7 +188,9 @@ if st.button("✅ Check Compliance", key="check_button"):
             st.write(optin_result["message"])
             st.markdown("**Required Phrases:**")
             for p in required_optin_phrases:
-                if p in processed_optin_text.lower():
+                if p in optin_result["approximate"]:
+                    st.markdown(f"✔️ {p} *(approximate match)*")
+                elif p in optin_result["present_required"]:
                     st.markdown(f"✔️ {p}")
                 else:
                     st.markdown(f"❌ {p}")
@@ -182,7 +202,21 @@ if st.button("✅ Check Compliance", key="check_button"):
 
     with col_privacy:
         st.markdown("#### 📄 Privacy Policy Feedback")
-        privacy_result = check_privacy_compliance(processed_privacy_text)
+        # Streamed and incremental hits are exact-only, so fuzzy mode rescans the text.
+        privacy_result, privacy_cached_at = checked(
+            "privacy",
+            processed_privacy_text,
+            lambda: check_privacy_compliance(
+                processed_privacy_text,
+                hits=None if fuzzy_matching else privacy_hits,
+                fuzzy=fuzzy_matching,
+            ),
+            fuzzy=fuzzy_matching,
+            campaign=campaign_id,
+            source=privacy_source,
+        )
+        reused_caption(privacy_cached_at)
+        source_breakdown("privacy", privacy_result, privacy_images, privacy_spans)
         
         # Corrected logic to only show checkmarks if compliant
         if not processed_privacy_text.strip():
@@ -209,17 +243,7 @@ if st.button("✅ Check Compliance", key="check_button"):
     st.markdown("---")
     st.markdown("#### 🧾 Copy/Paste for Customer")
     with st.expander("📋 Click to Expand"):
-        # The f-string is now more carefully constructed to handle newlines and indentation
-        summary = f"""**Opt-in Compliance:** {'Compliant' if optin_result['compliant'] else 'Not Compliant'}
-- Required Phrases Present: {', '.join(optin_result['present_required']) if optin_result['present_required'] else 'None'}
-- Missing Required Phrases: {', '.join(optin_result['missing_required']) if optin_result['missing_required'] else 'None'}
-- Non-Compliant Phrases Found: {', '.join(optin_result['prohibited_phrases_found']) if optin_result['prohibited_phrases_found'] else 'None'}
-
-**Privacy Policy Compliance:** {'Compliant' if privacy_result['compliant'] else 'Not Compliant'}
-- Required Phrases Present: {', '.join(privacy_result['present_required']) if privacy_result['present_required'] else 'None'}
-- Missing Required Phrases: {', '.join(privacy_result['missing_required']) if privacy_result['missing_required'] else 'None'}
-- Non-Compliant Phrases Found: {', '.join(privacy_result['prohibited_phrases_found']) if privacy_result['prohibited_phrases_found'] else 'None'}
-"""
+        summary = build_summary(optin_result, privacy_result)
         st.code(summary, language="markdown")
 
 # Reference Section
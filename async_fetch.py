@@ -0,0 +1,290 @@
+"""
+Asynchronous bulk fetcher for privacy-policy URLs.
+
+Fetches many URLs at once over pooled keep-alive connections, with a cap on
+concurrent connections per host, retries with exponential backoff on
+transient failures, and conditional GETs (ETag / Last-Modified) against the
+extraction cache. Bodies are read under the same byte caps as
+`html_extract.stream_url_text`, and PDFs go to the PDF extractor, so results
+are the same text `utils.extract_text_from_url` returns, including the
+`truncated` flag of html_extract.PageText for HTML cut at the cap (such text
+is not cached). They stream back as they complete; failures are
+ExtractionErrors.
+
+Usage:
+    python async_fetch.py urls.txt > results.jsonl
+"""
+import argparse
+import asyncio
+import json
+import random
+import sys
+
+import aiohttp
+
+import metrics
+from errors import ExtractionError, error_reason
+from extract_cache import get_cache, url_key
+from html_extract import (
+    CHUNK_SIZE, DEFAULT_MAX_BYTES, DEFAULT_MAX_PDF_BYTES, PageText, html_to_text, is_pdf, read_pdf_body,
+)
+
+# Status codes worth retrying; everything else is final.
+TRANSIENT_STATUSES = {408, 425, 429, 500, 502, 503, 504}
+# Longest wait between retries, whatever a server's Retry-After asks for,
+# so one host can't stall a crawl.
+MAX_BACKOFF = 30
+
+class TransientError(Exception):
+    """
+    A failure that may succeed on retry (timeouts, resets, 5xx, 429).
+    """
+
+    def __init__(self, message, retry_after=None, status=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+        self.status = status
+
+def _retry_after(response):
+    value = response.headers.get("Retry-After")
+    try:
+        return float(value) if value else None
+    except ValueError:
+        return None
+
+def _conditional_headers(validators):
+    headers = {}
+    if "ETag" in validators:
+        headers["If-None-Match"] = validators["ETag"]
+    if "Last-Modified" in validators:
+        headers["If-Modified-Since"] = validators["Last-Modified"]
+    return headers
+
+class AsyncFetcher:
+    """
+    Pooled fetcher; use as an async context manager.
+
+    `cache` defaults to the shared extraction cache; pass `cache=False` to
+    disable it. `session` may be supplied (e.g. for tests against a stub
+    server), in which case the caller owns its lifetime. HTML bodies are
+    truncated at `max_bytes`; PDFs over `max_pdf_bytes` fail.
+    """
+
+    def __init__(self, per_host=4, max_connections=64, timeout=10, retries=3, backoff=0.5,
+                 max_in_flight=256, cache=None, session=None, max_bytes=DEFAULT_MAX_BYTES,
+                 max_pdf_bytes=DEFAULT_MAX_PDF_BYTES, max_backoff=MAX_BACKOFF):
+        self.per_host = per_host
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.max_in_flight = max_in_flight
+        self.max_bytes = max_bytes
+        self.max_pdf_bytes = max_pdf_bytes
+        self.cache = get_cache() if cache is None else (cache or None)
+        self.session = session
+        self._owns_session = session is None
+
+    async def __aenter__(self):
+        if self.session is None:
+            connector = aiohttp.TCPConnector(
+                limit=self.max_connections,
+                limit_per_host=self.per_host,
+                ttl_dns_cache=300,
+                keepalive_timeout=30,
+            )
+            self.session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+            )
+        return self
+
+    async def __aexit__(self, *exc):
+        if self._owns_session:
+            await self.session.close()
+
+    async def _get(self, url, headers):
+        try:
+            async with self.session.get(url, headers=headers) as response:
+                if response.status in TRANSIENT_STATUSES:
+                    raise TransientError(f"HTTP {response.status}", _retry_after(response), response.status)
+                if response.status == 304:
+                    return 304, None, {}
+                response.raise_for_status()
+                document = await self._read_body(response)
+                validators = {
+                    name: response.headers[name]
+                    for name in ("ETag", "Last-Modified")
+                    if name in response.headers
+                }
+                return response.status, document, validators
+        except (aiohttp.ClientConnectionError, aiohttp.ClientPayloadError, asyncio.TimeoutError) as e:
+            raise TransientError(f"{type(e).__name__}: {e}") from e
+
+    async def _read_body(self, response):
+        """
+        Reads a body in chunks up to its byte cap. Returns (data, pdf,
+        encoding, truncated).
+        """
+        content_type = response.headers.get("Content-Type")
+        body = bytearray()
+        pdf = None
+        # One byte past the cap tells "longer than the cap" from "exactly at it".
+        limit = max(self.max_bytes, self.max_pdf_bytes) + 1
+        async for chunk in response.content.iter_chunked(CHUNK_SIZE):
+            body += chunk
+            if pdf is None and len(body) >= 5:
+                pdf = is_pdf(content_type, body)
+                limit = (self.max_pdf_bytes if pdf else self.max_bytes) + 1
+            if len(body) >= limit:
+                break
+        if pdf is None:
+            pdf = is_pdf(content_type, body)
+        if pdf:
+            return read_pdf_body([bytes(body)], self.max_pdf_bytes), True, None, False
+        # Only trust an explicit charset; otherwise let the parser sniff <meta>.
+        return bytes(body[: self.max_bytes]), False, response.charset, len(body) > self.max_bytes
+
+    async def _get_with_retries(self, url, headers):
+        try:
+            for attempt in range(self.retries + 1):
+                try:
+                    return await self._get(url, headers)
+                except TransientError as e:
+                    if attempt == self.retries:
+                        raise
+                    metrics.inc("a2p_fetch_retries_total", reason=error_reason(e.__cause__ or e))
+                    delay = min(e.retry_after or self.backoff * (2 ** attempt), self.max_backoff)
+                    await asyncio.sleep(delay * random.uniform(0.8, 1.2))
+        except (TransientError, aiohttp.ClientError) as e:
+            reason = error_reason(e.__cause__ or e)
+            metrics.record_error("async_fetch", reason)
+            raise ExtractionError("extract_url", reason, f"Failed to fetch content from URL: {e}") from e
+
+    async def _extract(self, document):
+        data, pdf, encoding, truncated = document
+        try:
+            # Parsing is CPU-bound; keep it off the event loop.
+            metrics.record_size("async_fetch", "bytes", len(data))
+            loop = asyncio.get_running_loop()
+            if pdf:
+                from pdf_extract import extract_text_from_pdf
+                return PageText(await loop.run_in_executor(None, extract_text_from_pdf, data))
+            return PageText(await loop.run_in_executor(None, html_to_text, data, encoding), truncated)
+        except ExtractionError:
+            raise
+        except Exception as e:
+            metrics.record_error("async_fetch", error_reason(e))
+            raise ExtractionError("extract_url", error_reason(e), f"An error occurred during URL processing: {e}") from e
+
+    async def fetch(self, url):
+        """
+        Fetches one URL and returns its extracted text. Raises ExtractionError
+        on failure.
+        """
+        key = url_key(url)
+        if self.cache:
+            text = self.cache.get(key)
+            if text is not None:
+                return text
+            stale_text, validators = self.cache.get_stale(key)
+        else:
+            stale_text, validators = None, {}
+
+        headers = _conditional_headers(validators) if stale_text is not None else {}
+        status, document, new_validators = await self._get_with_retries(url, headers)
+        if status == 304:
+            text, new_validators = stale_text, validators
+        else:
+            text = await self._extract(document)
+
+        if self.cache and not getattr(text, "truncated", False):
+            self.cache.put(key, text, ttl=self.cache.url_ttl, validators=new_validators)
+        return text
+
+    async def revalidate(self, url, validators=None):
+        """
+        Conditionally refetches a URL against validators from an earlier
+        response, bypassing cache freshness. Returns (text, validators); text
+        is None when the server answered 304 Not Modified. Raises
+        ExtractionError on failure.
+        """
+        validators = validators or {}
+        status, document, new_validators = await self._get_with_retries(url, _conditional_headers(validators))
+        if status == 304:
+            return None, validators
+        text = await self._extract(document)
+        if self.cache and not text.truncated:
+            self.cache.put(url_key(url), text, ttl=self.cache.url_ttl, validators=new_validators)
+        return text, new_validators
+
+    async def fetch_many(self, urls):
+        """
+        Fetches URLs concurrently, yielding (url, text, error) in completion
+        order; exactly one of text and error (an ExtractionError) is None.
+
+        At most `max_in_flight` fetches are scheduled at a time, so an
+        arbitrarily long iterable of URLs is consumed lazily.
+        """
+        urls = iter(urls)
+        pending = {}
+
+        def schedule():
+            for url in urls:
+                pending[asyncio.ensure_future(self.fetch(url))] = url
+                if len(pending) >= self.max_in_flight:
+                    return
+
+        schedule()
+        try:
+            while pending:
+                done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    url = pending.pop(task)
+                    error = task.exception()
+                    if error is not None and not isinstance(error, ExtractionError):
+                        raise error
+                    yield url, None if error else task.result(), error
+                schedule()
+        finally:
+            # On an unexpected error (or the caller stopping early), don't
+            # leave fetches running against a session about to close.
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+
+async def _fetch_to_stream(urls, out, **options):
+    async with AsyncFetcher(**options) as fetcher:
+        async for url, text, error in fetcher.fetch_many(urls):
+            record = {"url": url, **error.to_dict()} if error else {"url": url, "text": text}
+            if getattr(text, "truncated", False):
+                record["truncated"] = True
+            out.write(json.dumps(record, ensure_ascii=False) + "\n")
+            out.flush()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fetch many privacy-policy URLs concurrently.")
+    parser.add_argument("urls", help="file with one URL per line ('-' for stdin)")
+    parser.add_argument("--per-host", type=int, default=4, help="concurrent connections per host")
+    parser.add_argument("--max-connections", type=int, default=64, help="total concurrent connections")
+    parser.add_argument("--retries", type=int, default=3)
+    parser.add_argument("--timeout", type=float, default=10)
+    parser.add_argument("--no-cache", action="store_true", help="bypass the extraction cache")
+    args = parser.parse_args(argv)
+
+    source = sys.stdin if args.urls == "-" else open(args.urls, encoding="utf-8")
+    with source:
+        urls = (line.strip() for line in source if line.strip())
+        asyncio.run(_fetch_to_stream(
+            urls,
+            sys.stdout,
+            per_host=args.per_host,
+            max_connections=args.max_connections,
+            retries=args.retries,
+            timeout=args.timeout,
+            cache=False if args.no_cache else None,
+        ))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,304 @@
+"""
+Headless batch checker.
+
+Streams campaigns from a CSV or JSONL file through text extraction and the
+opt-in / privacy compliance checks on a process pool, writing one result per
+campaign as it completes.
+
+Input columns (all optional): id, optin_text, optin_image, privacy_text,
+privacy_url, privacy_image. Image paths are resolved relative to --base-dir
+(defaults to the input file's directory). As in the UI, an uploaded image
+takes precedence over pasted text, and privacy text starting with "http" is
+fetched as a URL. A campaign whose image or URL can't be extracted gets
+"error", "error_stage" and "error_reason" instead of check results;
+"privacy_truncated" is true when the policy page was cut at the download cap.
+
+Checks go through the result store (see result_store.py): content already
+checked under the current rules reuses its stored result, and every row is
+added to the campaign's (the "id" column) and policy URL's history.
+
+Usage:
+    python batch_check.py campaigns.csv results.jsonl --workers 8
+    python batch_check.py campaigns.jsonl results.csv --unordered --resume
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import metrics
+from compliance_logic import check_opt_in_compliance, check_privacy_compliance, summary_fields
+from errors import error_reason
+from result_store import checked
+
+OUTPUT_FIELDS = [
+    "row",
+    "id",
+    "optin_compliance",
+    "optin_required_present",
+    "optin_required_missing",
+    "optin_noncompliant_found",
+    "privacy_compliance",
+    "privacy_required_present",
+    "privacy_required_missing",
+    "privacy_noncompliant_found",
+    "privacy_truncated",
+    "error",
+    "error_stage",
+    "error_reason",
+]
+
+# --- Input ---
+
+def _detect_format(path, override=None):
+    if override:
+        return override
+    return "csv" if path.lower().endswith(".csv") else "jsonl"
+
+def iter_rows(path, fmt=None):
+    """
+    Lazily yields (row_number, row_dict) from a CSV or JSONL file.
+    """
+    fmt = _detect_format(path, fmt)
+    with open(path, newline="", encoding="utf-8") as f:
+        if fmt == "csv":
+            for index, row in enumerate(csv.DictReader(f)):
+                yield index, row
+        else:
+            index = 0
+            for line in f:
+                if not line.strip():
+                    continue
+                yield index, json.loads(line)
+                index += 1
+
+# --- Worker ---
+
+def _resolve(path, base_dir):
+    if not path or os.path.isabs(path):
+        return path
+    return os.path.join(base_dir, path)
+
+def process_row(index, row, base_dir, fuzzy=False):
+    """
+    Extracts and checks a single campaign. Runs in a worker process.
+    """
+    # Imported here so the parent process never loads the OCR/HTML stack.
+    from utils import extract_text_from_image, extract_text_from_url
+
+    record = {"row": index, "id": row.get("id") or "", "error": "", "error_stage": "", "error_reason": ""}
+    with metrics.request_trace("batch_row", row=index, id=record["id"]):
+        try:
+            optin_image = _resolve(row.get("optin_image"), base_dir)
+            if optin_image:
+                optin_text = extract_text_from_image(optin_image)
+            else:
+                optin_text = row.get("optin_text") or ""
+
+            privacy_image = _resolve(row.get("privacy_image"), base_dir)
+            privacy_text = row.get("privacy_text") or ""
+            privacy_url = row.get("privacy_url") or (privacy_text if privacy_text.startswith("http") else "")
+            if privacy_image:
+                privacy_text = extract_text_from_image(privacy_image)
+            elif privacy_url:
+                privacy_text = extract_text_from_url(privacy_url)
+
+            campaign = record["id"] or None
+            optin_result, _ = checked(
+                "optin", optin_text, lambda: check_opt_in_compliance(optin_text, fuzzy=fuzzy),
+                fuzzy=fuzzy, campaign=campaign, source=optin_image or None,
+            )
+            privacy_result, _ = checked(
+                "privacy", privacy_text, lambda: check_privacy_compliance(privacy_text, fuzzy=fuzzy),
+                fuzzy=fuzzy, campaign=campaign, source=privacy_image or privacy_url or None,
+            )
+            record.update(summary_fields(optin_result, privacy_result))
+            record["privacy_truncated"] = getattr(privacy_text, "truncated", False)
+        except Exception as e:
+            record["error"] = f"{type(e).__name__}: {e}"
+            record["error_stage"] = getattr(e, "stage", "check")
+            record["error_reason"] = error_reason(e)
+    return record
+
+# --- Output ---
+
+class ResultWriter:
+    """
+    Appends result records to a JSONL or CSV file, flushing after every record.
+    """
+
+    def __init__(self, path, fmt=None, append=False):
+        self.fmt = _detect_format(path, fmt)
+        write_header = not (append and os.path.exists(path) and os.path.getsize(path) > 0)
+        self._file = open(path, "a" if append else "w", newline="", encoding="utf-8")
+        if self.fmt == "csv":
+            self._csv = csv.DictWriter(self._file, fieldnames=OUTPUT_FIELDS, extrasaction="ignore")
+            if write_header:
+                self._csv.writeheader()
+
+    def write(self, record):
+        if self.fmt == "csv":
+            self._csv.writerow(record)
+        else:
+            self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+class CompletedRows:
+    """
+    Tracks which input rows already have results, as a contiguous watermark
+    plus a sparse set, so resuming a large unordered run stays small.
+    """
+
+    def __init__(self):
+        self.watermark = 0
+        self.extra = set()
+
+    def add(self, row):
+        if row < self.watermark:
+            return
+        self.extra.add(row)
+        while self.watermark in self.extra:
+            self.extra.remove(self.watermark)
+            self.watermark += 1
+
+    def __contains__(self, row):
+        return row < self.watermark or row in self.extra
+
+def truncate_partial_record(path, fmt=None, block_size=64 * 1024):
+    """
+    Cuts a partially written last record (from a crash) off an output file,
+    so appended records start on a line of their own.
+    """
+    if not os.path.exists(path):
+        return
+    # csv.writer ends records with \r\n; a bare \n may sit inside a quoted field.
+    terminator = b"\r\n" if _detect_format(path, fmt) == "csv" else b"\n"
+    with open(path, "rb+") as f:
+        position = f.seek(0, os.SEEK_END)
+        while position > 0:
+            start = max(position - block_size, 0)
+            f.seek(start)
+            # Overlap by one byte so a terminator split across blocks is found.
+            block = f.read(position - start + len(terminator) - 1)
+            cut = block.rfind(terminator)
+            if cut != -1:
+                f.truncate(start + cut + len(terminator))
+                return
+            position = start
+        f.truncate(0)
+
+def load_completed(path, fmt=None):
+    """
+    Reads the row numbers already written to an existing output file.
+    """
+    done = CompletedRows()
+    if not os.path.exists(path):
+        return done
+    fmt = _detect_format(path, fmt)
+    with open(path, newline="", encoding="utf-8") as f:
+        if fmt == "csv":
+            rows = (r.get("row") for r in csv.DictReader(f))
+        else:
+            rows = (_json_row(line) for line in f if line.strip())
+        for row in rows:
+            try:
+                done.add(int(row))
+            except (TypeError, ValueError):
+                # A partially written last line from a crash; it will be redone.
+                continue
+    return done
+
+def _json_row(line):
+    try:
+        return json.loads(line).get("row")
+    except (ValueError, AttributeError):
+        return None
+
+# --- Driver ---
+
+def run_batch(input_path, output_path, workers=None, ordered=True, start=0, resume=False,
+              max_pending=None, base_dir=None, input_format=None, output_format=None, fuzzy=False):
+    """
+    Runs the batch and returns the number of records written.
+
+    At most `max_pending` campaigns are in flight (extracted text included),
+    which bounds memory regardless of input size.
+    """
+    workers = workers or os.cpu_count() or 1
+    max_pending = max_pending or workers * 4
+    base_dir = base_dir or os.path.dirname(os.path.abspath(input_path))
+    if resume:
+        truncate_partial_record(output_path, output_format)
+        done = load_completed(output_path, output_format)
+    else:
+        done = CompletedRows()
+
+    writer = ResultWriter(output_path, output_format, append=resume)
+    pending = deque()
+    written = 0
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            def drain(block_until):
+                nonlocal written
+                while len(pending) > block_until:
+                    if ordered:
+                        writer.write(pending.popleft().result())
+                        written += 1
+                    else:
+                        finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                        for future in finished:
+                            pending.remove(future)
+                            writer.write(future.result())
+                            written += 1
+
+            for index, row in iter_rows(input_path, input_format):
+                if index < start or index in done:
+                    continue
+                pending.append(pool.submit(process_row, index, row, base_dir, fuzzy))
+                drain(max_pending - 1)
+            drain(0)
+    finally:
+        writer.close()
+    return written
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Batch A2P/TFV compliance checker.")
+    parser.add_argument("input", help="CSV or JSONL file of campaigns")
+    parser.add_argument("output", help="CSV or JSONL results file")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument("--max-pending", type=int, default=None,
+                        help="campaigns in flight at once (default: 4 x workers)")
+    parser.add_argument("--unordered", action="store_true",
+                        help="write results as they finish instead of in input order")
+    parser.add_argument("--start", type=int, default=0, help="skip input rows before this offset")
+    parser.add_argument("--resume", action="store_true",
+                        help="append to OUTPUT, skipping rows it already contains")
+    parser.add_argument("--base-dir", default=None, help="directory image paths are relative to")
+    parser.add_argument("--fuzzy", action="store_true", help="OCR-tolerant approximate phrase matching")
+    parser.add_argument("--input-format", choices=["csv", "jsonl"], default=None)
+    parser.add_argument("--output-format", choices=["csv", "jsonl"], default=None)
+    args = parser.parse_args(argv)
+
+    written = run_batch(
+        args.input,
+        args.output,
+        workers=args.workers,
+        ordered=not args.unordered,
+        start=args.start,
+        resume=args.resume,
+        max_pending=args.max_pending,
+        base_dir=args.base_dir,
+        input_format=args.input_format,
+        output_format=args.output_format,
+        fuzzy=args.fuzzy,
+    )
+    print(f"Wrote {written} results to {args.output}", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""
+Deterministic synthetic corpus for the benchmarks.
+
+Builds short opt-in texts, privacy policies from a few KB up to several MB,
+screenshots of opt-in flows at phone and desktop resolutions, and HTML
+policy pages with realistic page chrome. The same seed always produces the
+same corpus, so results are comparable across runs and machines.
+
+Usage:
+    python benchmarks/corpus.py /tmp/a2p-corpus
+"""
+import json
+import os
+import random
+import sys
+
+from PIL import Image, ImageDraw, ImageFont
+
+POLICY_SIZES = {
+    "policy_10k": 10 * 1024,
+    "policy_100k": 100 * 1024,
+    "policy_1m": 1024 * 1024,
+    "policy_4m": 4 * 1024 * 1024,
+}
+SCREEN_SIZES = {
+    "phone": (1170, 2532),
+    "desktop": (1920, 1080),
+}
+OPTIN_COUNT = 500
+
+_FILLER = (
+    "we may update this policy from time to time and will post any changes on this page "
+    "our services are intended for adults and we do not knowingly collect data from children "
+    "cookies and similar technologies help us understand how visitors use the website "
+    "you can request a copy of the personal data we hold about you at any time "
+    "we retain records only for as long as necessary to provide the services "
+).split()
+
+_OPTIN_PARTS = [
+    "By checking this box you consent to receive messages from Acme Co.",
+    "I agree to receive recurring automated marketing texts.",
+    "Message and data rates may apply.",
+    "Message frequency may vary.",
+    "Reply STOP to unsubscribe.",
+    "Reply HELP for help.",
+    "See our privacy policy and terms of service.",
+    "We will not contact you without permission.",
+]
+
+_POLICY_SECTIONS = [
+    "How information is collected: we collect the information you provide when you sign up.",
+    "How information is used: we use it to deliver the messages you requested.",
+    "Third parties: no mobile information will be shared with third parties for marketing or promotional purposes.",
+    "Data security: we protect your data with industry standard safeguards.",
+    "How to opt-out: reply STOP at any time to opt out of messages.",
+    "Contact information: write to privacy@example.com with any questions.",
+]
+
+def _words(rng, count):
+    return " ".join(rng.choice(_FILLER) for _ in range(count))
+
+def optin_texts(rng, count=OPTIN_COUNT):
+    texts = []
+    for _ in range(count):
+        parts = rng.sample(_OPTIN_PARTS, rng.randint(2, len(_OPTIN_PARTS)))
+        texts.append(" ".join(parts))
+    return texts
+
+def policy_text(rng, size):
+    """
+    A policy of about `size` characters with the required sections spread through it.
+    """
+    paragraphs = []
+    length = 0
+    sections = list(_POLICY_SECTIONS)
+    rng.shuffle(sections)
+    while length < size:
+        paragraph = _words(rng, rng.randint(40, 120)) + "."
+        if sections and rng.random() < 0.3:
+            paragraph = sections.pop() + " " + paragraph
+        paragraphs.append(paragraph)
+        length += len(paragraph) + 2
+    paragraphs.extend(sections)
+    return "\n\n".join(paragraphs)
+
+def policy_html(text):
+    """
+    Wraps policy text in a page with the scripts and navigation real sites carry.
+    """
+    chrome_script = "<script>" + "var tracking = {event: 'view', data: [1,2,3]};" * 200 + "</script>"
+    nav = "<nav>" + "".join(f"<a href='/p{i}'>Menu item {i}</a>" for i in range(60)) + "</nav>"
+    body = "".join(f"<p>{paragraph}</p>\n" for paragraph in text.split("\n\n"))
+    return (
+        "<!doctype html><html><head><title>Privacy Policy</title>"
+        f"<style>{'.c{color:#333}' * 300}</style>{chrome_script}</head>"
+        f"<body><header>Acme Co.</header>{nav}<main><h1>Privacy Policy</h1>{body}</main>"
+        "<footer>&copy; Acme Co.</footer></body></html>"
+    )
+
+def _font(size):
+    try:
+        return ImageFont.load_default(size=size)
+    except TypeError:  # Pillow < 10.1 has no scalable default font.
+        return ImageFont.load_default()
+
+def screenshot(rng, size, lines):
+    """
+    Renders opt-in text as a UI-like screenshot at the given resolution.
+    """
+    width, height = size
+    image = Image.new("RGB", size, "white")
+    draw = ImageDraw.Draw(image)
+    font = _font(max(height // 60, 14))
+    y = height // 10
+    draw.rectangle((width // 12, y - 20, width - width // 12, y + height // 12), outline="#999", width=3)
+    y += height // 8
+    for line in lines:
+        draw.text((width // 12, y), line, fill="black", font=font)
+        y += int(font.size * 1.6) if hasattr(font, "size") else 20
+    return image
+
+def build_corpus(directory, seed=1234):
+    """
+    Writes the corpus to `directory` and returns its manifest.
+    """
+    rng = random.Random(seed)
+    os.makedirs(os.path.join(directory, "html"), exist_ok=True)
+    os.makedirs(os.path.join(directory, "images"), exist_ok=True)
+    manifest = {"seed": seed, "optins": "optins.json", "policies": {}, "html": {}, "images": {}}
+
+    with open(os.path.join(directory, "optins.json"), "w", encoding="utf-8") as f:
+        json.dump(optin_texts(rng), f)
+
+    for name, size in POLICY_SIZES.items():
+        text = policy_text(rng, size)
+        with open(os.path.join(directory, f"{name}.txt"), "w", encoding="utf-8") as f:
+            f.write(text)
+        manifest["policies"][name] = f"{name}.txt"
+        if size <= 1024 * 1024:
+            with open(os.path.join(directory, "html", f"{name}.html"), "w", encoding="utf-8") as f:
+                f.write(policy_html(text))
+            manifest["html"][name] = f"html/{name}.html"
+
+    for name, size in SCREEN_SIZES.items():
+        lines = rng.sample(_OPTIN_PARTS, 6)
+        path = os.path.join("images", f"optin_{name}.png")
+        screenshot(rng, size, lines).save(os.path.join(directory, path))
+        manifest["images"][name] = path
+
+    with open(os.path.join(directory, "manifest.json"), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+if __name__ == "__main__":
+    build_corpus(sys.argv[1] if len(sys.argv) > 1 else "a2p-corpus")
@@ -0,0 +1,370 @@
+"""
+Benchmarks for extraction and rule checking.
+
+Each stage runs in a fresh (spawned) process so its peak RSS is its own,
+and reports throughput, p50/p99 latency and peak RSS. Results can be saved
+as a JSON baseline and later runs compared against it. A stage is
+"skipped" when it doesn't apply here (its tool or optional module isn't
+installed) and an "error" when it fails. A run exits non-zero on any error,
+on any skip not allowed with --allow-skip, and, when comparing, on a stage
+that regresses beyond the tolerance or a baseline stage that no longer
+produces results. fuzzy_overhead also fails on its own when fuzzy checks get
+more than FUZZY_MAX_RATIO times slower than exact.
+
+benchmarks/baselines/reference.json is the committed reference; regenerate
+it with --save on the reference machine when a change moves the numbers on
+purpose, and record that in the commit. Absolute timings only compare
+between similar machines and full runs (--quick is too noisy); peak RSS and
+fuzzy_overhead's ratios travel.
+
+Usage:
+    python benchmarks/run_benchmarks.py --compare benchmarks/baselines/reference.json --allow-skip extract_image
+    python benchmarks/run_benchmarks.py --save benchmarks/baselines/reference.json
+    python benchmarks/run_benchmarks.py --stages check_privacy,extract_url --quick
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from corpus import build_corpus  # noqa: E402
+
+STAGES = [
+    "check_optin",
+    "check_privacy",
+    "check_privacy_fuzzy",
+    "check_many_rules",
+    "fuzzy_overhead",
+    "extract_html",
+    "extract_url",
+    "extract_image",
+]
+
+# fuzzy_overhead fails when a fuzzy privacy check is more than this many
+# times slower than the exact check of the same policy.
+FUZZY_MAX_RATIO = 6
+
+# check_many_rules scans each policy against this many synthetic literal
+# rules, so matching cost that grows with the rule count shows up.
+SYNTHETIC_RULES = 500
+
+# --- Stage definitions (run inside the child process) ---
+
+def _read(directory, path, mode="r"):
+    with open(os.path.join(directory, path), mode, **({} if "b" in mode else {"encoding": "utf-8"})) as f:
+        return f.read()
+
+def _synthetic_engine(count):
+    """
+    A registry of `count` literal rules: two- to four-word phrases drawn
+    from the words of the real rules.
+    """
+    import random
+    from rule_engine import RuleEngine, get_engine
+
+    words = sorted({
+        word for rule in get_engine().rules for literal in rule.get("literals", []) for word in literal.lower().split()
+    })
+    rnd = random.Random(1)
+    rules = [
+        {"id": f"synthetic_{i}", "set": "synthetic", "kind": "required", "label": f"synthetic {i}",
+         "literals": [" ".join(rnd.choice(words) for _ in range(rnd.randint(2, 4)))]}
+        for i in range(count)
+    ]
+    return RuleEngine({"rule_sets": {"synthetic": ""}, "rules": rules})
+
+def _items(stage, directory, manifest):
+    """
+    Returns [(label, size, callable)] for a stage; size is characters,
+    bytes or pixels depending on the stage.
+    """
+    from compliance_logic import check_opt_in_compliance, check_privacy_compliance
+
+    if stage == "check_optin":
+        texts = json.loads(_read(directory, manifest["optins"]))
+        return [(f"optin_{i}", len(t), lambda t=t: check_opt_in_compliance(t)) for i, t in enumerate(texts)]
+    if stage in ("check_privacy", "check_privacy_fuzzy"):
+        fuzzy = stage == "check_privacy_fuzzy"
+        items = []
+        for name, path in manifest["policies"].items():
+            text = _read(directory, path)
+            items.append((name, len(text), lambda text=text: check_privacy_compliance(text, fuzzy=fuzzy)))
+        return items
+    if stage == "check_many_rules":
+        engine = _synthetic_engine(SYNTHETIC_RULES)
+        items = []
+        for name, path in manifest["policies"].items():
+            text = _read(directory, path)
+            items.append((name, len(text), lambda text=text: engine.scan(text, "synthetic")))
+        return items
+    if stage == "extract_html":
+        from html_extract import html_to_text
+        items = []
+        for name, path in manifest["html"].items():
+            html = _read(directory, path, "rb")
+            items.append((name, len(html), lambda html=html: html_to_text(html)))
+        return items
+    if stage == "extract_url":
+        from utils import extract_text_from_url
+        base = _serve(os.path.join(directory))
+        return [
+            (name, os.path.getsize(os.path.join(directory, path)),
+             lambda url=f"{base}/{path}": extract_text_from_url(url))
+            for name, path in manifest["html"].items()
+        ]
+    if stage == "extract_image":
+        from PIL import Image
+        from utils import extract_text_from_image
+        items = []
+        for name, path in manifest["images"].items():
+            full = os.path.join(directory, path)
+            with Image.open(full) as image:
+                pixels = image.size[0] * image.size[1]
+            items.append((name, pixels, lambda full=full: extract_text_from_image(full)))
+        return items
+    raise ValueError(f"Unknown stage {stage}")
+
+def _serve(directory):
+    """
+    Serves the corpus over HTTP on a local port from a background thread.
+    """
+    import functools
+    import http.server
+    import threading
+
+    class QuietHandler(http.server.SimpleHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+    handler = functools.partial(QuietHandler, directory=directory)
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_address[1]}"
+
+def _percentile(sorted_values, fraction):
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+def _peak_rss_mb():
+    """
+    Peak RSS of this process. On Linux this reads VmHWM, because ru_maxrss
+    carries over the parent's peak across fork/exec.
+    """
+    try:
+        with open("/proc/self/status", encoding="ascii") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    import resource
+    # ru_maxrss is in bytes on macOS.
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 2**20, 1)
+
+def _best_time(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+def _fuzzy_overhead(directory, manifest, repeat):
+    """
+    Times fuzzy against exact privacy checks of each policy in one process
+    and reports fuzzy/exact ratios (best of at least three runs each).
+    """
+    from compliance_logic import check_privacy_compliance
+
+    ratios = {}
+    for name, path in manifest["policies"].items():
+        text = _read(directory, path)
+        exact, fuzzy = (
+            _best_time(lambda fuzzy=fuzzy: check_privacy_compliance(text, fuzzy=fuzzy), max(repeat, 3))
+            for fuzzy in (False, True)
+        )
+        ratios[name] = round(fuzzy / exact, 2)
+    return {
+        "ratios": ratios,
+        "ratio_max": max(ratios.values()),
+        "max_ratio": FUZZY_MAX_RATIO,
+        "peak_rss_mb": _peak_rss_mb(),
+    }
+
+def _run_stage(stage, directory, manifest, repeat, conn):
+    # Measure the work itself, not the extraction cache.
+    os.environ["A2P_CACHE_DISABLE"] = "1"
+    try:
+        if stage == "fuzzy_overhead":
+            conn.send(_fuzzy_overhead(directory, manifest, repeat))
+            return
+        items = _items(stage, directory, manifest)
+        # One untimed call so imports and lazy initialisation aren't measured.
+        items[0][2]()
+        latencies = []
+        total_size = 0
+        start = time.perf_counter()
+        for _ in range(repeat):
+            for _, size, fn in items:
+                t0 = time.perf_counter()
+                fn()
+                latencies.append(time.perf_counter() - t0)
+                total_size += size
+        elapsed = time.perf_counter() - start
+        latencies.sort()
+        conn.send({
+            "items": len(latencies),
+            "total_s": round(elapsed, 4),
+            "throughput_per_s": round(len(latencies) / elapsed, 2),
+            "throughput_units_per_s": round(total_size / elapsed, 1),
+            "p50_ms": round(_percentile(latencies, 0.50) * 1000, 3),
+            "p99_ms": round(_percentile(latencies, 0.99) * 1000, 3),
+            "peak_rss_mb": _peak_rss_mb(),
+        })
+    except ModuleNotFoundError as e:
+        conn.send({"skipped": f"{e.name} not installed"})
+    except Exception as e:
+        conn.send({"error": f"{type(e).__name__}: {e}"})
+
+def run_stage(stage, directory, manifest, repeat):
+    """
+    Runs one stage in a fresh process and returns its measurements.
+    """
+    if stage == "extract_image" and not shutil.which("tesseract"):
+        return {"skipped": "tesseract not installed"}
+    context = multiprocessing.get_context("spawn")
+    parent, child = context.Pipe(duplex=False)
+    process = context.Process(target=_run_stage, args=(stage, directory, manifest, repeat, child))
+    process.start()
+    # Drop our copy of the write end so recv() sees EOF if the child dies.
+    child.close()
+    try:
+        result = parent.recv()
+    except EOFError:
+        result = None
+    process.join()
+    return result or {"error": f"stage process exited with code {process.exitcode}"}
+
+# --- Baselines ---
+
+def compare(baseline, current, tolerance):
+    """
+    Returns a list of human-readable regressions of current vs baseline.
+    """
+    regressions = []
+    for stage, base in baseline["stages"].items():
+        if "skipped" in base or "error" in base:
+            continue
+        now = current["stages"].get(stage)
+        if now is None:
+            # Not selected with --stages this run.
+            continue
+        if "skipped" in now or "error" in now:
+            regressions.append(f"{stage}: no results ({now.get('error') or 'skipped: ' + now['skipped']})")
+            continue
+        for metric in ("p50_ms", "p99_ms", "peak_rss_mb", "ratio_max"):
+            if metric in base and now[metric] > base[metric] * (1 + tolerance):
+                regressions.append(f"{stage}.{metric}: {base[metric]} -> {now[metric]}")
+        if "throughput_per_s" in base and now["throughput_per_s"] < base["throughput_per_s"] * (1 - tolerance):
+            regressions.append(f"{stage}.throughput_per_s: {base['throughput_per_s']} -> {now['throughput_per_s']}")
+    return regressions
+
+def over_limit(results):
+    """
+    Returns stages whose ratio exceeds the stage's own limit, regardless of
+    any baseline.
+    """
+    return [
+        f"{stage}.ratio_max: {result['ratio_max']} > {result['max_ratio']}"
+        for stage, result in results["stages"].items()
+        if "max_ratio" in result and result["ratio_max"] > result["max_ratio"]
+    ]
+
+def unexpected_skips(results, allowed):
+    """
+    Returns stages that were skipped although not listed in `allowed`.
+    """
+    return [
+        f"{stage}: {result['skipped']}"
+        for stage, result in results["stages"].items()
+        if "skipped" in result and stage not in allowed
+    ]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark extraction and rule checking.")
+    parser.add_argument("--stages", default=",".join(STAGES), help="comma-separated stages to run")
+    parser.add_argument("--repeat", type=int, default=5, help="passes over each stage's items")
+    parser.add_argument("--quick", action="store_true", help="single pass, for smoke runs")
+    parser.add_argument("--corpus", default=None, help="reuse or create the corpus in this directory")
+    parser.add_argument("--save", default=None, help="write results as a JSON baseline")
+    parser.add_argument("--compare", default=None, help="compare against a JSON baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed relative regression")
+    parser.add_argument("--allow-skip", default="", help="comma-separated stages that may be skipped")
+    args = parser.parse_args(argv)
+
+    from rule_engine import get_engine
+
+    directory = args.corpus or tempfile.mkdtemp(prefix="a2p-corpus-")
+    manifest_path = os.path.join(directory, "manifest.json")
+    if os.path.exists(manifest_path):
+        with open(manifest_path, encoding="utf-8") as f:
+            manifest = json.load(f)
+    else:
+        manifest = build_corpus(directory)
+
+    repeat = 1 if args.quick else args.repeat
+    results = {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "rules_version": get_engine().version,
+            "rule_count": len(get_engine().rules),
+            "repeat": repeat,
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "stages": {},
+    }
+    for stage in args.stages.split(","):
+        result = run_stage(stage, directory, manifest, repeat)
+        results["stages"][stage] = result
+        if "error" in result:
+            print(f"{stage:22} ERROR {result['error']}")
+        elif "skipped" in result:
+            print(f"{stage:22} skipped ({result['skipped']})")
+        elif "ratio_max" in result:
+            ratios = "  ".join(f"{name} {ratio}x" for name, ratio in result["ratios"].items())
+            print(f"{stage:22} {ratios}  (limit {result['max_ratio']}x)")
+        else:
+            print(f"{stage:22} {result['throughput_per_s']:>10}/s  p50 {result['p50_ms']:>9} ms  "
+                  f"p99 {result['p99_ms']:>9} ms  peak {result['peak_rss_mb']:>7} MB")
+
+    if args.save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save)), exist_ok=True)
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    failed = any("error" in result for result in results["stages"].values())
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            regressions = compare(json.load(f), results, args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        failed = failed or bool(regressions)
+    for failure in over_limit(results):
+        print(f"OVER LIMIT {failure}")
+        failed = True
+    for skip in unexpected_skips(results, set(filter(None, args.allow_skip.split(",")))):
+        print(f"SKIPPED {skip}")
+        failed = True
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
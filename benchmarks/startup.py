@@ -0,0 +1,144 @@
+"""
+Cold-start measurements for the desktop app, each in a fresh process.
+
+    imports       importing the modules app.py loads at startup; the OCR,
+                  HTTP/HTML and PDF stacks must not be among them
+    first_render  first run of app.py through Streamlit's AppTest
+    server_ready  run_app.py launch until Streamlit's health check answers
+
+Every measurement has a target; the run exits non-zero when one is missed.
+Streamlit-dependent measurements are skipped when it isn't installed, which
+also fails the run unless they are listed in --allow-skip.
+
+Usage:
+    python benchmarks/startup.py
+    python benchmarks/startup.py --allow-skip first_render,server_ready
+    python benchmarks/startup.py --repeat 5 --save startup.json
+"""
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Seconds, measured on a reviewer laptop class machine.
+TARGETS = {
+    "imports": 0.15,
+    "first_render": 1.5,
+    "server_ready": 4.0,
+}
+# Modules app.py must not import before first use.
+HEAVY_MODULES = ["PIL", "requests", "lxml", "fitz", "pytesseract", "tesserocr", "aiohttp"]
+
+_IMPORTS_SNIPPET = """
+import json, sys, time
+start = time.perf_counter()
+import compliance_logic, errors, incremental, metrics, utils, api_client
+elapsed = time.perf_counter() - start
+print(json.dumps({"seconds": elapsed, "heavy": [m for m in %r if m in sys.modules]}))
+""" % (HEAVY_MODULES,)
+
+_RENDER_SNIPPET = """
+import json, time
+from streamlit.testing.v1 import AppTest
+start = time.perf_counter()
+AppTest.from_file("app.py", default_timeout=60).run()
+print(json.dumps({"seconds": time.perf_counter() - start}))
+"""
+
+def _python(snippet):
+    out = subprocess.run([sys.executable, "-c", snippet], cwd=ROOT, check=True,
+                         capture_output=True, text=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+def measure_imports():
+    result = _python(_IMPORTS_SNIPPET)
+    if result["heavy"]:
+        result["error"] = f"eagerly imported: {', '.join(result['heavy'])}"
+    return result
+
+def measure_first_render():
+    return _python(_RENDER_SNIPPET)
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def measure_server_ready(timeout=60):
+    port = _free_port()
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, os.path.join(ROOT, "run_app.py"), "--headless", "--port", str(port)],
+        cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        while time.perf_counter() - start < timeout:
+            if process.poll() is not None:
+                return {"error": f"launcher exited with {process.returncode}"}
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/_stcore/health", timeout=1) as response:
+                    if response.status == 200:
+                        return {"seconds": time.perf_counter() - start}
+            except OSError:
+                time.sleep(0.05)
+        return {"error": f"not ready after {timeout}s"}
+    finally:
+        process.terminate()
+        process.wait()
+
+MEASUREMENTS = {
+    "imports": measure_imports,
+    "first_render": measure_first_render,
+    "server_ready": measure_server_ready,
+}
+
+def _has_streamlit():
+    try:
+        import streamlit  # noqa: F401
+    except Exception:
+        return False
+    return True
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure app cold-start time against targets.")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per measurement; the median is reported")
+    parser.add_argument("--save", default=None, help="write results as JSON")
+    parser.add_argument("--allow-skip", default="", help="comma-separated measurements that may be skipped")
+    args = parser.parse_args(argv)
+    allowed = set(filter(None, args.allow_skip.split(",")))
+
+    streamlit = _has_streamlit()
+    results = {}
+    failed = False
+    for name, measure in MEASUREMENTS.items():
+        if name != "imports" and not streamlit:
+            results[name] = {"skipped": "streamlit not installed"}
+            print(f"{name:14} skipped (streamlit not installed)" + ("" if name in allowed else "  NOT ALLOWED"))
+            failed = failed or name not in allowed
+            continue
+        runs = [measure() for _ in range(args.repeat)]
+        errors = [r["error"] for r in runs if "error" in r]
+        timings = sorted(r["seconds"] for r in runs if "seconds" in r)
+        median = timings[len(timings) // 2] if timings else None
+        ok = not errors and median is not None and median <= TARGETS[name]
+        failed = failed or not ok
+        results[name] = {"median_s": median and round(median, 4), "target_s": TARGETS[name], "ok": ok}
+        if errors:
+            results[name]["error"] = errors[0]
+        shown = f"{median:.3f}s" if median is not None else "-"
+        print(f"{name:14} {shown:>9}  target {TARGETS[name]}s  {'ok' if ok else 'MISSED'}"
+              + (f"  ({errors[0]})" if errors else ""))
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
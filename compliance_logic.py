@@ -1,27 +1,146 @@
-def check_opt_in_compliance(text):
-    required_phrases = ["consent", "recurring messages", "message and data rates may apply"]
-    prohibited_phrases = ["free trial", "no charges", "anonymous"]
+from bisect import bisect_right
 
-    found = text.lower()
-    missing = [phrase for phrase in required_phrases if phrase not in found]
-    detected_prohibited = [phrase for phrase in prohibited_phrases if phrase in found]
+import metrics
+from rule_engine import get_engine
 
+# Compliance phrases come from the shared rule registry (rules.json).
+_engine = get_engine()
+required_optin_phrases = _engine.labels("optin", "required")
+prohibited_optin_phrases = _engine.labels("optin", "prohibited")
+required_privacy_phrases = _engine.labels("privacy", "required")
+prohibited_privacy_phrases = _engine.labels("privacy", "prohibited")
+
+def check_rule_set(rule_set, text: str, hits=None, fuzzy=False):
+    """
+    Evaluates one rule set against text. Pass `hits` from an earlier scan
+    of the same text (e.g. an IncrementalChecker's) to skip scanning.
+    `fuzzy` enables OCR-tolerant matching (see fuzzy.py).
+    """
+    with metrics.timed(f"check_{rule_set}"):
+        if hits is None:
+            hits = _engine.scan(text, rule_set, fuzzy=fuzzy)
+        return _engine.evaluate(rule_set, hits)
+
+def check_opt_in_compliance(text: str, hits=None, fuzzy=False):
+    """
+    Checks opt-in language for compliance with required and prohibited phrases.
+    """
+    if not text.strip():
+        return {
+            "compliant": False,
+            "message": "⚠️ No opt-in language provided.",
+            "present_required": [],
+            "missing_required": required_optin_phrases,
+            "prohibited_phrases_found": [],
+            "approximate": [],
+            "hits": []
+        }
+
+    result = check_rule_set("optin", text, hits, fuzzy)
+    result["message"] = "✅ Opt-in is compliant." if result["compliant"] else "❌ Opt-in is not compliant."
+    return result
+
+def check_privacy_compliance(text: str, hits=None, fuzzy=False):
+    """
+    Checks privacy policy for compliance with required and prohibited phrases.
+    """
+    if not text.strip():
+        return {
+            "compliant": False,
+            "present_required": [],
+            "missing_required": required_privacy_phrases,
+            "prohibited_phrases_found": [],
+            "approximate": [],
+            "hits": []
+        }
+
+    return check_rule_set("privacy", text, hits, fuzzy)
+
+def check_legacy_compliance(rule_set, text: str):
+    """
+    Checks text against one of the original phrase lists ("optin_legacy" or
+    "privacy_legacy"), returning their original result shape.
+    """
+    result = check_rule_set(rule_set, text)
     return {
-        "compliant": len(missing) == 0 and len(detected_prohibited) == 0,
-        "missing": missing,
-        "prohibited": detected_prohibited
+        "compliant": result["compliant"],
+        "missing": result["missing_required"],
+        "prohibited": result["prohibited_phrases_found"]
     }
 
-def check_privacy_compliance(text):
-    required_phrases = ["third parties", "contact information", "how data is collected", "how data is shared"]
-    prohibited_phrases = ["we sell your data", "no privacy", "no protection"]
+def stream_check(rule_set, chunks):
+    """
+    Checks text that arrives in chunks (e.g. PDF pages), yielding
+    (chunk, result) after each one. The last result is final.
+    """
+    scanner = _engine.stream(rule_set)
+    for chunk in chunks:
+        scanner.feed(chunk)
+        yield chunk, _engine.evaluate(rule_set, scanner.hits)
+
+# --- Multiple Sources ---
 
-    found = text.lower()
-    missing = [phrase for phrase in required_phrases if phrase not in found]
-    detected_prohibited = [phrase for phrase in prohibited_phrases if phrase in found]
+# Placed between texts from different sources (e.g. screenshots of one flow).
+SOURCE_SEPARATOR = "\n\n"
 
+def merge_sources(texts):
+    """
+    Joins texts in order with SOURCE_SEPARATOR. Returns (text, spans), where
+    spans[i] is the (start, end) of texts[i] in the merged text.
+    """
+    spans, offset = [], 0
+    for text in texts:
+        spans.append((offset, offset + len(text)))
+        offset += len(text) + len(SOURCE_SEPARATOR)
+    return SOURCE_SEPARATOR.join(texts), spans
+
+def labels_by_source(rule_set, hits, spans):
+    """
+    Attributes each hit of a result to the sources its span overlaps.
+    Returns one list of matched rule labels per source, in rule order.
+    """
+    starts = [start for start, _ in spans]
+    found = [set() for _ in spans]
+    for hit in hits:
+        first = max(bisect_right(starts, hit["start"]) - 1, 0)
+        last = max(bisect_right(starts, max(hit["end"] - 1, hit["start"])) - 1, first)
+        for index in range(first, last + 1):
+            found[index].add(hit["rule"])
+    rules = _engine.rules_in(rule_set)
+    return [[rule["label"] for rule in rules if rule["id"] in ids] for ids in found]
+
+# --- Customer Summary ---
+
+def _joined(phrases):
+    return ', '.join(phrases) if phrases else 'None'
+
+def summary_fields(optin_result, privacy_result):
+    """
+    Flattens both results into the fields shown in the "Copy/Paste for Customer" summary.
+    """
     return {
-        "compliant": len(missing) == 0 and len(detected_prohibited) == 0,
-        "missing": missing,
-        "prohibited": detected_prohibited
+        "optin_compliance": 'Compliant' if optin_result['compliant'] else 'Not Compliant',
+        "optin_required_present": _joined(optin_result['present_required']),
+        "optin_required_missing": _joined(optin_result['missing_required']),
+        "optin_noncompliant_found": _joined(optin_result['prohibited_phrases_found']),
+        "privacy_compliance": 'Compliant' if privacy_result['compliant'] else 'Not Compliant',
+        "privacy_required_present": _joined(privacy_result['present_required']),
+        "privacy_required_missing": _joined(privacy_result['missing_required']),
+        "privacy_noncompliant_found": _joined(privacy_result['prohibited_phrases_found']),
     }
+
+def build_summary(optin_result, privacy_result):
+    """
+    Renders the "Copy/Paste for Customer" markdown summary.
+    """
+    f = summary_fields(optin_result, privacy_result)
+    return f"""**Opt-in Compliance:** {f['optin_compliance']}
+- Required Phrases Present: {f['optin_required_present']}
+- Missing Required Phrases: {f['optin_required_missing']}
+- Non-Compliant Phrases Found: {f['optin_noncompliant_found']}
+
+**Privacy Policy Compliance:** {f['privacy_compliance']}
+- Required Phrases Present: {f['privacy_required_present']}
+- Missing Required Phrases: {f['privacy_required_missing']}
+- Non-Compliant Phrases Found: {f['privacy_noncompliant_found']}
+"""
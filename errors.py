@@ -0,0 +1,38 @@
+"""
+Structured errors for the extraction pipeline.
+"""
+
+class ExtractionError(Exception):
+    """
+    Raised when text can't be extracted from an image, PDF or URL.
+
+    `stage` names the pipeline stage that failed ("extract_image",
+    "extract_pdf", "extract_url") and `reason` is a short machine-readable
+    cause ("timeout", "http_404", ...); both are used as metric labels. The
+    message is the one shown to reviewers.
+    """
+
+    def __init__(self, stage, reason, message):
+        super().__init__(message)
+        self.stage = stage
+        self.reason = reason
+
+    def to_dict(self):
+        return {"error": str(self), "stage": self.stage, "reason": self.reason}
+
+def error_reason(exc):
+    """
+    Classifies an exception into a low-cardinality reason label.
+    """
+    if isinstance(exc, ExtractionError):
+        return exc.reason
+    response = getattr(exc, "response", None)
+    status = getattr(response, "status_code", None) or getattr(exc, "status", None)
+    if isinstance(status, int):
+        return f"http_{status}"
+    name = type(exc).__name__
+    if "Timeout" in name:
+        return "timeout"
+    if "Connect" in name:
+        return "connection"
+    return name
@@ -0,0 +1,264 @@
+"""
+Persistent cache for extracted text.
+
+OCR and PDF results are keyed by a hash of the file bytes and URL fetches by
+the normalized URL. Entries live in a small SQLite database (WAL mode) so every
+Streamlit session and batch worker on the machine shares them. The store is
+bounded by total size and evicts least-recently-used entries first; URL
+entries also expire after a TTL.
+
+Configuration (environment):
+    A2P_CACHE_DIR        cache directory (default ~/.cache/a2p-compliance)
+    A2P_CACHE_MAX_BYTES  size bound for cached text (default 256 MB)
+    A2P_CACHE_URL_TTL    seconds before a cached URL is refetched (default 6 h)
+    A2P_CACHE_DISABLE    set to 1 to bypass the cache
+
+Usage:
+    python extract_cache.py stats
+    python extract_cache.py clear [--kind image|pdf|url]
+    python extract_cache.py invalidate <url-or-file-path> ...
+"""
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import metrics
+
+DEFAULT_DIR = os.path.join(os.path.expanduser("~"), ".cache", "a2p-compliance")
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+DEFAULT_URL_TTL = 6 * 60 * 60
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    value TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created REAL NOT NULL,
+    accessed REAL NOT NULL,
+    expires REAL,
+    validators TEXT
+);
+CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed);
+CREATE TABLE IF NOT EXISTS counters (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+# --- Keys ---
+
+def image_key(data: bytes):
+    """
+    Cache key for an image: the SHA-256 of its bytes.
+    """
+    return "image:" + hashlib.sha256(data).hexdigest()
+
+def normalize_url(url: str):
+    """
+    Normalizes a URL so trivially different spellings share a cache entry.
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    port = parts.port
+    if port and not ((scheme == "http" and port == 80) or (scheme == "https" and port == 443)):
+        host = f"{host}:{port}"
+    path = parts.path or "/"
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    # Fragments never reach the server, so they are dropped.
+    return urlunsplit((scheme, host, path, query, ""))
+
+def url_key(url: str):
+    return "url:" + normalize_url(url)
+
+# --- Store ---
+
+class ExtractCache:
+    """
+    Size-bounded LRU store shared across processes.
+    """
+
+    def __init__(self, directory=None, max_bytes=None, url_ttl=None):
+        self.directory = directory or os.environ.get("A2P_CACHE_DIR", DEFAULT_DIR)
+        self.max_bytes = int(max_bytes or os.environ.get("A2P_CACHE_MAX_BYTES", DEFAULT_MAX_BYTES))
+        self.url_ttl = float(url_ttl or os.environ.get("A2P_CACHE_URL_TTL", DEFAULT_URL_TTL))
+        os.makedirs(self.directory, exist_ok=True)
+        self.path = os.path.join(self.directory, "extract_cache.sqlite3")
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+            columns = [row[1] for row in conn.execute("PRAGMA table_info(entries)")]
+            if "validators" not in columns:
+                conn.execute("ALTER TABLE entries ADD COLUMN validators TEXT")
+
+    def _connect(self):
+        # SQLite connections cannot be shared across threads; Streamlit runs
+        # each session in its own thread, so keep one connection per thread.
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _count(self, conn, name, amount=1):
+        conn.execute(
+            "INSERT INTO counters (name, value) VALUES (?, ?) "
+            "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+            (name, amount),
+        )
+
+    def get(self, key):
+        """
+        Returns the cached value for key, or None on a miss or expired entry.
+        """
+        kind = key.split(":", 1)[0]
+        now = time.time()
+        with self._connect() as conn:
+            row = conn.execute("SELECT value, expires FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is None or (row[1] is not None and row[1] < now):
+                # Expired rows are kept (until evicted) so get_stale can
+                # revalidate them with a conditional request.
+                self._count(conn, f"{kind}_misses")
+                metrics.inc("a2p_cache_requests_total", kind=kind, result="miss")
+                return None
+            conn.execute("UPDATE entries SET accessed = ? WHERE key = ?", (now, key))
+            self._count(conn, f"{kind}_hits")
+            metrics.inc("a2p_cache_requests_total", kind=kind, result="hit")
+            return row[0]
+
+    def get_stale(self, key):
+        """
+        Returns (value, validators) for key even if expired, or (None, {}).
+        Validators are the ETag / Last-Modified headers stored with a URL.
+        """
+        with self._connect() as conn:
+            row = conn.execute("SELECT value, validators FROM entries WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None, {}
+        return row[0], json.loads(row[1]) if row[1] else {}
+
+    def put(self, key, value, ttl=None, validators=None):
+        """
+        Stores value under key, evicting least-recently-used entries over the size bound.
+        """
+        kind = key.split(":", 1)[0]
+        now = time.time()
+        size = len(value.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        expires = now + ttl if ttl else None
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO entries (key, kind, value, size, created, accessed, expires, validators) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, kind, value, size, now, now, expires, json.dumps(validators) if validators else None),
+            )
+            self._evict(conn)
+
+    def _evict(self, conn):
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        conn.execute("DELETE FROM entries WHERE expires IS NOT NULL AND expires < ?", (time.time(),))
+        rows = conn.execute("SELECT key, size FROM entries ORDER BY accessed").fetchall()
+        total = sum(size for _, size in rows)
+        victims = []
+        for key, size in rows:
+            if total <= self.max_bytes:
+                break
+            victims.append((key,))
+            total -= size
+        conn.executemany("DELETE FROM entries WHERE key = ?", victims)
+        self._count(conn, "evictions", len(victims))
+
+    def invalidate(self, key):
+        with self._connect() as conn:
+            return conn.execute("DELETE FROM entries WHERE key = ?", (key,)).rowcount
+
+    def clear(self, kind=None):
+        with self._connect() as conn:
+            if kind:
+                return conn.execute("DELETE FROM entries WHERE kind = ?", (kind,)).rowcount
+            return conn.execute("DELETE FROM entries").rowcount
+
+    def stats(self):
+        """
+        Returns entry counts, sizes and hit/miss counters per kind.
+        """
+        with self._connect() as conn:
+            counters = dict(conn.execute("SELECT name, value FROM counters").fetchall())
+            stats = {"path": self.path, "max_bytes": self.max_bytes, "evictions": counters.get("evictions", 0)}
+            for kind in ("image", "pdf", "url"):
+                entries, size = conn.execute(
+                    "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries WHERE kind = ?", (kind,)
+                ).fetchone()
+                hits = counters.get(f"{kind}_hits", 0)
+                misses = counters.get(f"{kind}_misses", 0)
+                stats[kind] = {
+                    "entries": entries,
+                    "bytes": size,
+                    "hits": hits,
+                    "misses": misses,
+                    "hit_rate": round(hits / (hits + misses), 3) if hits + misses else None,
+                }
+            return stats
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_cache():
+    """
+    Returns the shared cache, or None when disabled via A2P_CACHE_DISABLE.
+    """
+    global _cache
+    if os.environ.get("A2P_CACHE_DISABLE") == "1":
+        return None
+    with _cache_lock:
+        if _cache is None:
+            try:
+                _cache = ExtractCache()
+            except (OSError, sqlite3.Error):
+                # An unwritable cache directory should never break extraction.
+                return None
+        return _cache
+
+# --- Command line ---
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Inspect or invalidate the extraction cache.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("stats", help="show entry counts and hit rates")
+    clear = sub.add_parser("clear", help="remove cached entries")
+    clear.add_argument("--kind", choices=["image", "pdf", "url"], default=None)
+    invalidate = sub.add_parser("invalidate", help="remove entries for URLs or image/PDF files")
+    invalidate.add_argument("targets", nargs="+")
+    args = parser.parse_args(argv)
+
+    cache = ExtractCache()
+    if args.command == "stats":
+        for name, value in cache.stats().items():
+            print(f"{name}: {value}")
+    elif args.command == "clear":
+        print(f"Removed {cache.clear(args.kind)} entries")
+    else:
+        removed = 0
+        for target in args.targets:
+            if os.path.exists(target):
+                with open(target, "rb") as f:
+                    digest = image_key(f.read()).split(":", 1)[1]
+                removed += cache.invalidate(f"image:{digest}") + cache.invalidate(f"pdf:{digest}")
+            else:
+                removed += cache.invalidate(url_key(target))
+        print(f"Removed {removed} entries")
+
+if __name__ == "__main__":
+    sys.exit(main())
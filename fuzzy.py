@@ -0,0 +1,183 @@
+"""
+OCR-tolerant approximate phrase matching.
+
+Text and phrases are normalized (lowercased, runs of whitespace and hyphens
+collapsed to one space), then each phrase is searched with an edit-distance
+budget using Myers' bit-parallel algorithm.
+
+To keep the cost close to exact matching, Myers only runs on small windows
+around candidates: a phrase split into k + 1 pieces that occurs with at most
+k edits must contain at least one piece exactly (the pigeonhole filter used
+by Wu-Manber style matchers), and those pieces are found with str.find.
+"""
+import re
+from bisect import bisect_right
+
+_SEPARATORS = re.compile(r"[\s\-‐‑‒–—\xad]+")
+# The same characters as a translate table (\s is str.isspace(), whose last
+# code point is U+3000), so texts are normalized in C: translate every
+# separator to a space, then collapse only the runs of two or more.
+_SEPARATOR_TABLE = str.maketrans(
+    {c: " " for c in range(0x3001) if chr(c).isspace()}
+    | dict.fromkeys("-‐‑‒–—\xad", " ")
+)
+_SPACE_RUNS = re.compile("  +")
+
+# Edit budget for phrases without an explicit max_distance: about one edit
+# per eight characters, never more than four.
+def default_budget(phrase):
+    return max(0, min(4, len(phrase) // 8))
+
+def normalize_phrase(phrase):
+    return _SEPARATORS.sub(" ", phrase.lower()).strip()
+
+class NormalizedText:
+    """
+    Normalized copy of a text plus a compact map from its offsets back to
+    the original (one entry per separator run that collapsing shortens).
+    """
+
+    def __init__(self, text):
+        spaced = text.lower().translate(_SEPARATOR_TABLE)
+        parts = []
+        # (normalized offset, original offset) at the start of each segment.
+        self._norm_starts = [0]
+        self._orig_starts = [0]
+        last = 0
+        removed = 0
+        for m in _SPACE_RUNS.finditer(spaced):
+            start, end = m.span()
+            parts.append(spaced[last:start + 1])
+            last = end
+            removed += end - start - 1
+            self._norm_starts.append(end - removed)
+            self._orig_starts.append(end)
+        parts.append(spaced[last:])
+        self.text = "".join(parts)
+
+    def original_offset(self, offset):
+        """
+        Maps a normalized offset to the original text. Offsets inside a
+        collapsed separator map to its first character.
+        """
+        i = bisect_right(self._norm_starts, offset) - 1
+        return self._orig_starts[i] + (offset - self._norm_starts[i])
+
+# --- Myers bit-parallel search ---
+
+def _peq(pattern):
+    peq = {}
+    for i, ch in enumerate(pattern):
+        peq[ch] = peq.get(ch, 0) | (1 << i)
+    return peq
+
+def myers_ends(pattern, text, k, start=0, end=None):
+    """
+    Yields (end, distance) for every position in text[start:end] where an
+    occurrence of pattern with at most k edits ends (end is exclusive).
+    """
+    m = len(pattern)
+    if m == 0:
+        return
+    end = len(text) if end is None else end
+    peq = _peq(pattern)
+    mask = (1 << m) - 1
+    high = 1 << (m - 1)
+    pv, mv, score = mask, 0, m
+    for j in range(start, end):
+        eq = peq.get(text[j], 0)
+        xv = eq | mv
+        xh = (((eq & pv) + pv) ^ pv) | eq
+        ph = mv | (~(xh | pv) & mask)
+        mh = pv & xh
+        if ph & high:
+            score += 1
+        elif mh & high:
+            score -= 1
+        # The pattern may start anywhere in the text, so no carry-in on ph.
+        ph = (ph << 1) & mask
+        mh = (mh << 1) & mask
+        pv = mh | (~(xv | ph) & mask)
+        mv = ph & xv
+        if score <= k:
+            yield j + 1, score
+
+def _best_start(pattern, text, end, k):
+    """
+    Finds where the best match ending at `end` starts, by searching the
+    reversed pattern backwards over a window of at most len(pattern) + k.
+    """
+    lo = max(0, end - len(pattern) - k)
+    window = text[lo:end][::-1]
+    best = None
+    for length, distance in myers_ends(pattern[::-1], window, k):
+        if best is None or distance < best[1]:
+            best = (length, distance)
+    return end - best[0] if best else end - len(pattern)
+
+def _pieces(pattern, k):
+    """
+    Splits pattern into k + 1 non-overlapping pieces as (offset, piece).
+    """
+    count = k + 1
+    size = len(pattern) // count
+    pieces = []
+    for i in range(count):
+        lo = i * size
+        hi = len(pattern) if i == count - 1 else lo + size
+        pieces.append((lo, pattern[lo:hi]))
+    return pieces
+
+def find_approximate(pattern, text, k):
+    """
+    Returns [(start, end, distance)] for non-overlapping occurrences of
+    pattern in text with at most k edits, each reported at its best distance.
+    """
+    m = len(pattern)
+    if m == 0:
+        return []
+    k = min(k, m - 1)
+    # Candidate windows from exact piece occurrences.
+    windows = []
+    for offset, piece in _pieces(pattern, k):
+        pos = text.find(piece)
+        while pos != -1:
+            lo = max(0, pos - offset - k)
+            hi = min(len(text), pos - offset + m + k)
+            windows.append((lo, hi))
+            pos = text.find(piece, pos + 1)
+    if not windows:
+        return []
+    windows.sort()
+    merged = [list(windows[0])]
+    for lo, hi in windows[1:]:
+        if lo <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], hi)
+        else:
+            merged.append([lo, hi])
+
+    matches = []
+    for lo, hi in merged:
+        run = None
+        for end, distance in myers_ends(pattern, text, k, lo, hi):
+            # Consecutive ends belong to the same occurrence; keep its best.
+            if run and end - run[0] <= k + 1:
+                if distance < run[1]:
+                    run[1], run[2] = distance, end
+                run[0] = end
+                continue
+            if run:
+                matches.append((run[2], run[1]))
+            run = [end, distance, end]
+        if run:
+            matches.append((run[2], run[1]))
+
+    results = []
+    for end, distance in matches:
+        start = _best_start(pattern, text, end, k)
+        if results and start < results[-1][1]:
+            if distance < results[-1][2]:
+                results[-1] = (start, end, distance)
+            continue
+        results.append((start, end, distance))
+    return results
@@ -0,0 +1,301 @@
+"""
+Streaming HTML text extraction.
+
+Pages are downloaded in chunks up to a hard byte cap and parsed
+incrementally (lxml's C parser when installed, else the stdlib parser)
+without building a document tree. Scripts, styles, navigation and other
+page chrome are dropped, so their text can't produce false phrase matches.
+Text is yielded as it is parsed, so a check can stop reading a page once
+its outcome can no longer change. A page cut at the byte cap is returned as
+a PageText with `truncated` set, so callers can say the verdict covers only
+the start of the document.
+"""
+import codecs
+import itertools
+import re
+import time
+from html.parser import HTMLParser
+
+import requests
+
+import metrics
+from errors import ExtractionError
+
+try:
+    from lxml import etree
+except ImportError:  # Optional; falls back to html.parser.
+    etree = None
+
+DEFAULT_MAX_BYTES = 5 * 1024 * 1024
+# PDFs can't be parsed from a prefix, and scanned policies embed page images.
+DEFAULT_MAX_PDF_BYTES = 50 * 1024 * 1024
+CHUNK_SIZE = 64 * 1024
+
+# Elements whose text is never policy content. (Not <form>: ASP.NET
+# WebForms pages wrap the whole body in one.)
+SKIP_TAGS = {
+    "script", "style", "noscript", "template", "svg", "canvas", "iframe", "head",
+    "nav", "aside", "button", "select",
+}
+# Page chrome at page level, but inside CONTENT_TAGS they hold section
+# headings such as "How information is collected".
+PAGE_CHROME_TAGS = {"header", "footer"}
+CONTENT_TAGS = {"article", "section", "main"}
+# Elements that start a new line of text.
+BLOCK_TAGS = {
+    "p", "div", "section", "article", "main", "li", "ul", "ol", "dl", "dt", "dd",
+    "table", "tr", "td", "th", "br", "hr", "blockquote", "pre", "address",
+    "h1", "h2", "h3", "h4", "h5", "h6", "title",
+}
+
+_WHITESPACE = re.compile(r"\s+")
+
+class TextCollector:
+    """
+    Parser target that collects visible text, one line per block element.
+    Works with both lxml's target interface and the stdlib adapter below.
+    """
+
+    def __init__(self):
+        self.pieces = []
+        # (tag, skipping) for each open element that may hide its text.
+        self._skip = []
+        self._content = 0
+        self._started = False
+        self._space = False
+        self._newline = False
+
+    def _tag(self, tag):
+        # lxml may report namespaced tags, e.g. "{http://www.w3.org/2000/svg}svg".
+        return tag.rsplit("}", 1)[-1].lower() if isinstance(tag, str) else ""
+
+    def start(self, tag, attrib=None):
+        tag = self._tag(tag)
+        skipping = bool(self._skip) and self._skip[-1][1]
+        if tag == "title":
+            # <title> sits inside <head> but is real page text.
+            self._skip.append((tag, False))
+        elif tag in PAGE_CHROME_TAGS:
+            self._skip.append((tag, skipping or not self._content))
+        elif tag in SKIP_TAGS:
+            self._skip.append((tag, True))
+        if tag in CONTENT_TAGS:
+            self._content += 1
+        if tag in BLOCK_TAGS:
+            self._newline = True
+
+    def end(self, tag):
+        tag = self._tag(tag)
+        if tag in CONTENT_TAGS and self._content:
+            self._content -= 1
+        if self._skip and (tag in SKIP_TAGS or tag in PAGE_CHROME_TAGS or tag == "title"):
+            # Pop back to the matching element; tolerates unclosed children.
+            for depth in range(len(self._skip) - 1, -1, -1):
+                if self._skip[depth][0] == tag:
+                    del self._skip[depth:]
+                    break
+        if tag in BLOCK_TAGS:
+            self._newline = True
+
+    def data(self, text):
+        if self._skip and self._skip[-1][1]:
+            return
+        text = _WHITESPACE.sub(" ", text)
+        stripped = text.strip()
+        if not stripped:
+            self._space = self._space or bool(text)
+            return
+        if self._started:
+            if self._newline:
+                self.pieces.append("\n")
+            elif self._space or text[0] == " ":
+                self.pieces.append(" ")
+        self.pieces.append(stripped)
+        self._started = True
+        self._newline = False
+        self._space = text[-1] == " "
+
+    def comment(self, text):
+        pass
+
+    def close(self):
+        return None
+
+    def drain(self):
+        """
+        Returns and clears the text collected since the last call.
+        """
+        text = "".join(self.pieces)
+        self.pieces = []
+        return text
+
+class _StdlibParser(HTMLParser):
+    """
+    Adapts html.parser callbacks to the TextCollector target interface and
+    accepts bytes like lxml's feed parser.
+    """
+
+    def __init__(self, target, encoding):
+        super().__init__(convert_charrefs=True)
+        self.target = target
+        self._decoder = codecs.getincrementaldecoder(encoding or "utf-8")(errors="replace")
+
+    def handle_starttag(self, tag, attrs):
+        self.target.start(tag, dict(attrs))
+
+    def handle_startendtag(self, tag, attrs):
+        self.target.start(tag, dict(attrs))
+        self.target.end(tag)
+
+    def handle_endtag(self, tag):
+        self.target.end(tag)
+
+    def handle_data(self, data):
+        self.target.data(data)
+
+    def feed(self, data):
+        super().feed(self._decoder.decode(data) if isinstance(data, bytes) else data)
+
+    def close(self):
+        super().feed(self._decoder.decode(b"", final=True))
+        super().close()
+
+def _make_parser(target, encoding=None):
+    if etree is not None:
+        return etree.HTMLParser(target=target, encoding=encoding, recover=True, no_network=True)
+    return _StdlibParser(target, encoding)
+
+def iter_html_text(chunks, encoding=None):
+    """
+    Parses an iterable of HTML byte (or str) chunks, yielding text as it is parsed.
+    """
+    collector = TextCollector()
+    parser = _make_parser(collector, encoding)
+    # Parse time excludes time spent waiting for chunks or in the caller.
+    parse_time = 0.0
+    chars = 0
+    try:
+        for chunk in chunks:
+            start = time.perf_counter()
+            parser.feed(chunk)
+            text = collector.drain()
+            parse_time += time.perf_counter() - start
+            if text:
+                chars += len(text)
+                yield text
+        start = time.perf_counter()
+        parser.close()
+        text = collector.drain()
+        parse_time += time.perf_counter() - start
+        if text:
+            chars += len(text)
+            yield text
+    finally:
+        metrics.record_duration("html_parse", parse_time)
+        metrics.record_size("html_parse", "chars", chars)
+
+def html_to_text(html, encoding=None):
+    """
+    Converts a complete HTML document (str or bytes) to text. For bytes,
+    `encoding` is the response's declared charset, if any.
+    """
+    if isinstance(html, str):
+        # Already decoded; re-encode so both parsers see the same bytes.
+        return "".join(iter_html_text([html.encode("utf-8")], "utf-8"))
+    return "".join(iter_html_text([html], encoding))
+
+class PageText(str):
+    """
+    Text extracted from a page; `truncated` is True when the body was cut at
+    the byte cap and the rest of the document is missing.
+    """
+
+    def __new__(cls, text, truncated=False):
+        self = super().__new__(cls, text)
+        self.truncated = truncated
+        return self
+
+def is_pdf(content_type, head: bytes):
+    """
+    True for a PDF response, by Content-Type or (for mislabeled ones) by the
+    magic bytes at the start of the body.
+    """
+    return "application/pdf" in (content_type or "") or head[:5] == b"%PDF-"
+
+def iter_url_chunks(response, max_bytes=DEFAULT_MAX_BYTES, chunk_size=CHUNK_SIZE):
+    """
+    Yields raw body chunks from a streamed response, stopping at max_bytes.
+    """
+    received = 0
+    wait_time = 0.0
+    body = iter(response.iter_content(chunk_size=chunk_size))
+    try:
+        while True:
+            start = time.perf_counter()
+            chunk = next(body, None)
+            wait_time += time.perf_counter() - start
+            if chunk is None:
+                return
+            if received + len(chunk) >= max_bytes:
+                chunk = chunk[: max_bytes - received]
+                received = max_bytes
+                yield chunk
+                return
+            received += len(chunk)
+            yield chunk
+    finally:
+        metrics.record_duration("http_download", wait_time)
+        metrics.record_size("http_download", "bytes", received)
+
+def cap_chunks(chunks, max_bytes, status=None):
+    """
+    Passes chunks through, truncating the stream at max_bytes. When bytes
+    past the cap are dropped, sets status["truncated"].
+    """
+    received = 0
+    for chunk in chunks:
+        if received + len(chunk) > max_bytes:
+            yield chunk[: max_bytes - received]
+            if status is not None:
+                status["truncated"] = True
+            return
+        received += len(chunk)
+        yield chunk
+
+def read_pdf_body(chunks, max_pdf_bytes=DEFAULT_MAX_PDF_BYTES):
+    """
+    Joins a PDF body, raising ExtractionError rather than returning a
+    truncated document when it is longer than max_pdf_bytes.
+    """
+    data = b"".join(chunks)
+    if len(data) > max_pdf_bytes:
+        raise ExtractionError(
+            "extract_pdf", "too_large", f"PDF is larger than {max_pdf_bytes // (1024 * 1024)} MB."
+        )
+    return data
+
+def stream_url_text(url, max_bytes=DEFAULT_MAX_BYTES, timeout=10, session=None,
+                    max_pdf_bytes=DEFAULT_MAX_PDF_BYTES, status=None):
+    """
+    Fetches a URL and yields its visible text as it downloads. HTML is read
+    up to max_bytes, and status["truncated"] is set if there was more; PDFs
+    are handed whole to the PDF extractor, up to max_pdf_bytes. The
+    connection is closed as soon as the caller stops iterating.
+    """
+    http = session or requests
+    with metrics.timed("http_connect"):
+        response = http.get(url, timeout=timeout, stream=True)
+    with response:
+        # Ensure the request was successful
+        response.raise_for_status()
+        # One byte past the cap tells "longer than the cap" from "exactly at it".
+        chunks = iter_url_chunks(response, max(max_bytes, max_pdf_bytes) + 1)
+        first = next(chunks, b"")
+        chunks = itertools.chain([first], chunks)
+        if is_pdf(response.headers.get("Content-Type"), first):
+            from pdf_extract import iter_pdf_text
+            yield from iter_pdf_text(read_pdf_body(chunks, max_pdf_bytes))
+            return
+        # Only trust an explicit charset; otherwise let the parser sniff <meta>.
+        encoding = response.encoding if "charset" in response.headers.get("Content-Type", "") else None
+        yield from iter_html_text(cap_chunks(chunks, max_bytes, status), encoding)
@@ -1,44 +1,23 @@
 # app.py (Updated layout and simplified compliance summary)
 
 import streamlit as st
-import base64
-import re
-from PIL import Image
+from incremental import IncrementalChecker
 
 # --- FUNCTIONS ---
-def check_opt_in_compliance(text):
-    issues = []
-
-    if not re.search(r"(?i)i\s+agree\s+to\s+receive|consent\s+to\s+receive", text):
-        issues.append("❌ Consent to receive messages")
-
-    if not re.search(r"(?i)message\s+frequency\s+may\s+vary", text):
-        issues.append("❌ Message frequency disclosed")
+# Checks are defined in rules.json (rule sets "optin_guidelines" and "privacy_guidelines").
+# Each text area keeps an IncrementalChecker across reruns, so an edit only
+# rescans the text around it.
+def _issues(rule_set, text):
+    key = f"{rule_set}_checker"
+    if key not in st.session_state:
+        st.session_state[key] = IncrementalChecker(rule_set)
+    return [f"❌ {label}" for label in st.session_state[key].check(text)["missing_required"]]
 
-    if not ("STOP" in text.upper() and "HELP" in text.upper()):
-        issues.append("❌ STOP/HELP instructions")
-
-    if not re.search(r"(?i)privacy\s+policy|terms\s+of\s+service", text):
-        issues.append("❌ Link to privacy policy or terms")
-
-    return issues
+def check_opt_in_compliance(text):
+    return _issues("optin_guidelines", text)
 
 def check_privacy_compliance(text):
-    issues = []
-
-    if not re.search(r"(?i)data (we )?collect|information you provide", text):
-        issues.append("❌ Data collection explained")
-
-    if not re.search(r"(?i)opt[- ]?out", text):
-        issues.append("❌ Opt-out process available")
-
-    if not re.search(r"(?i)third[- ]?part(y|ies)", text):
-        issues.append("❌ Data sharing practices disclosed")
-
-    if not re.search(r"(?i)no mobile information will be shared with third parties.*?promotional purposes", text):
-        issues.append("❌ SMS disclosure")
-
-    return issues
+    return _issues("privacy_guidelines", text)
 
 # --- UI LAYOUT ---
 st.set_page_config("A2P Compliance Assistant", layout="wide")
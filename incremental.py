@@ -0,0 +1,107 @@
+"""
+Incremental rule checking for text that is edited in place.
+
+An IncrementalChecker keeps the hits of the last text it saw. On each update
+it finds the edited span (common prefix and suffix with the previous text),
+keeps hits that can't reach the edit, shifts hits after it, and rescans only
+the edit plus each rule's maximum match length around it. Keep one checker
+per text area and rule set, e.g. in st.session_state, so a keystroke in a
+50 KB policy costs about as much as checking the edit itself.
+
+Matching is exact only; fuzzy checks still need a full `RuleEngine.scan`.
+"""
+import metrics
+from rule_engine import get_engine
+
+def _common_prefix(a, b):
+    """
+    Length of the common prefix, comparing slices so the work stays in C.
+    """
+    lo, hi = 0, min(len(a), len(b))
+    if a[:hi] == b[:hi]:
+        return hi
+    # Invariant: a[:lo] == b[:lo] and a[:hi + 1] != b[:hi + 1].
+    hi -= 1
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if a[lo:mid] == b[lo:mid]:
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+def _common_suffix(a, b, limit):
+    """
+    Length of the common suffix, at most `limit` characters.
+    """
+    lo, hi = 0, limit
+    if hi == 0 or a[len(a) - hi:] == b[len(b) - hi:]:
+        return hi
+    hi -= 1
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if a[len(a) - mid:len(a) - lo] == b[len(b) - mid:len(b) - lo]:
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+class IncrementalChecker:
+    """
+    Maintains exact hits of one rule set (default: every set) for one piece
+    of text across edits.
+    """
+
+    def __init__(self, rule_set=None, engine=None):
+        self.rule_set = rule_set
+        self.engine = engine or get_engine()
+        self.text = ""
+        self.hits = []
+        # True while hit offsets index the lowered text rather than the text
+        # itself (see RuleEngine.scan); they can't be shifted then.
+        self._drifted = False
+
+    def update(self, text: str):
+        """
+        Moves to the new text and returns its hits, sorted by start offset,
+        equal to `engine.scan(text, rule_set)`.
+        """
+        old = self.text
+        if text == old:
+            return self.hits
+        prefix = _common_prefix(old, text)
+        suffix = _common_suffix(old, text, min(len(old), len(text)) - prefix)
+        old_stop = len(old) - suffix
+        new_stop = len(text) - suffix
+        shift = new_stop - old_stop
+
+        metrics.record_size("incremental_scan", "chars", new_stop - prefix)
+        with metrics.timed("incremental_scan"):
+            engine = self.engine
+            # Hits that end reading before the edit are unchanged; hits
+            # starting after it only depend on the text from their start.
+            before = [h for h in self.hits if h["start"] < prefix - engine.max_length(h["rule"])]
+            window = None
+            # A kept hit reaching into the edit exceeds its declared
+            # max_length, so it may be stale: rescan everything.
+            if not self._drifted and all(h["end"] <= prefix for h in before):
+                window = engine.scan_window(text, prefix, new_stop, self.rule_set)
+            if window is None:
+                hits = engine.scan(text, self.rule_set)
+                self._drifted = len(text.lower()) != len(text)
+            else:
+                after = [
+                    dict(h, start=h["start"] + shift, end=h["end"] + shift)
+                    for h in self.hits if h["start"] >= old_stop
+                ]
+                hits = before + window + after
+                hits.sort(key=lambda h: (h["start"], h["end"]))
+        self.text = text
+        self.hits = hits
+        return hits
+
+    def check(self, text: str):
+        """
+        Updates to `text` and evaluates the checker's rule set, like `check_rule_set`.
+        """
+        return self.engine.evaluate(self.rule_set, self.update(text))
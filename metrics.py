@@ -0,0 +1,186 @@
+"""
+In-process metrics and per-request traces for the check pipeline.
+
+Stages record duration histograms, input sizes (bytes, pixels, characters),
+cache hits/misses and structured error counters. The API server exposes the
+registry at /metrics (Prometheus text format) and /metrics.json.
+
+With A2P_TRACE_LOG set to a file path, every traced request (API call,
+batch row, Streamlit check) also appends one JSON line with its stage
+timings, sizes and errors, so slow customers and pages can be found later.
+"""
+import contextlib
+import contextvars
+import json
+import os
+import threading
+import time
+import uuid
+
+DURATION_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+SIZE_BUCKETS = tuple(4 ** i for i in range(4, 14))  # 256 .. 64M
+
+_lock = threading.Lock()
+_counters = {}
+_histograms = {}
+_help = {
+    "a2p_stage_duration_seconds": "Time spent in each pipeline stage",
+    "a2p_stage_errors_total": "Pipeline errors by stage and reason",
+    "a2p_input_bytes": "Input size in bytes by stage",
+    "a2p_input_pixels": "Input size in pixels by stage",
+    "a2p_input_chars": "Input size in characters by stage",
+    "a2p_cache_requests_total": "Extraction cache lookups by kind and result",
+    "a2p_pdf_pages_total": "PDF pages read, by text layer or OCR",
+    "a2p_early_exit_total": "Downloads stopped once every rule had resolved",
+    "a2p_http_requests_total": "API requests by route and status",
+    "a2p_fetch_retries_total": "Async fetch retries by reason",
+    "a2p_result_store_requests_total": "Result store lookups by rule set and result",
+    "a2p_monitor_polls_total": "Policy monitor polls by result (unchanged, changed, error)",
+    "a2p_monitor_events_total": "Policy monitor events by type",
+}
+
+def _key(labels):
+    return tuple(sorted(labels.items()))
+
+# --- Recording ---
+
+def inc(name, amount=1, **labels):
+    """
+    Increments a counter.
+    """
+    with _lock:
+        series = _counters.setdefault(name, {})
+        series[_key(labels)] = series.get(_key(labels), 0) + amount
+
+def observe(name, value, buckets=DURATION_BUCKETS, **labels):
+    """
+    Records a value in a histogram.
+    """
+    with _lock:
+        series = _histograms.setdefault(name, {})
+        entry = series.get(_key(labels))
+        if entry is None:
+            entry = series[_key(labels)] = {"buckets": buckets, "counts": [0] * len(buckets), "sum": 0.0, "count": 0}
+        for i, bound in enumerate(entry["buckets"]):
+            if value <= bound:
+                entry["counts"][i] += 1
+                break
+        entry["sum"] += value
+        entry["count"] += 1
+    trace = _current_trace.get()
+    if trace is not None and name != "a2p_stage_duration_seconds":
+        trace["sizes"].append({"metric": name, "value": value, **labels})
+
+def record_size(stage, unit, value):
+    """
+    Records an input size; unit is "bytes", "pixels" or "chars".
+    """
+    observe(f"a2p_input_{unit}", value, SIZE_BUCKETS, stage=stage)
+
+def record_error(stage, reason):
+    inc("a2p_stage_errors_total", stage=stage, reason=reason)
+    trace = _current_trace.get()
+    if trace is not None:
+        trace["errors"].append({"stage": stage, "reason": reason})
+
+def record_duration(stage, seconds):
+    observe("a2p_stage_duration_seconds", seconds, stage=stage)
+    trace = _current_trace.get()
+    if trace is not None:
+        trace["spans"].append({"stage": stage, "ms": round(seconds * 1000, 3)})
+
+@contextlib.contextmanager
+def timed(stage):
+    """
+    Times a block as one stage. Exceptions are counted as errors of the
+    stage (by their `reason`, or their type name) and re-raised.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception as e:
+        record_error(stage, getattr(e, "reason", type(e).__name__))
+        raise
+    finally:
+        record_duration(stage, time.perf_counter() - start)
+
+# --- Traces ---
+
+_current_trace = contextvars.ContextVar("a2p_trace", default=None)
+_trace_lock = threading.Lock()
+
+@contextlib.contextmanager
+def request_trace(name, **attrs):
+    """
+    Collects stage spans, sizes and errors for one request and, when
+    A2P_TRACE_LOG is set, appends them to that file as a JSON line.
+    """
+    path = os.environ.get("A2P_TRACE_LOG")
+    if not path:
+        yield None
+        return
+    trace = {"id": uuid.uuid4().hex, "name": name, "start": time.time(), "attrs": attrs,
+             "spans": [], "sizes": [], "errors": []}
+    token = _current_trace.set(trace)
+    start = time.perf_counter()
+    try:
+        yield trace
+    finally:
+        _current_trace.reset(token)
+        trace["ms"] = round((time.perf_counter() - start) * 1000, 3)
+        line = json.dumps(trace, ensure_ascii=False, default=str)
+        with _trace_lock, open(path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+# --- Export ---
+
+def _label_text(labels, extra=()):
+    items = list(labels) + list(extra)
+    if not items:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in items)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(items, escaped)) + "}"
+
+def render_prometheus():
+    """
+    Renders the registry in the Prometheus text exposition format.
+    """
+    lines = []
+    with _lock:
+        for name, series in sorted(_counters.items()):
+            lines.append(f"# HELP {name} {_help.get(name, name)}")
+            lines.append(f"# TYPE {name} counter")
+            for labels, value in sorted(series.items()):
+                lines.append(f"{name}{_label_text(labels)} {value}")
+        for name, series in sorted(_histograms.items()):
+            lines.append(f"# HELP {name} {_help.get(name, name)}")
+            lines.append(f"# TYPE {name} histogram")
+            for labels, entry in sorted(series.items()):
+                cumulative = 0
+                for bound, count in zip(entry["buckets"], entry["counts"]):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{_label_text(labels, [('le', bound)])} {cumulative}")
+                lines.append(f"{name}_bucket{_label_text(labels, [('le', '+Inf')])} {entry['count']}")
+                lines.append(f"{name}_sum{_label_text(labels)} {entry['sum']}")
+                lines.append(f"{name}_count{_label_text(labels)} {entry['count']}")
+    return "\n".join(lines) + "\n"
+
+def snapshot():
+    """
+    Returns the registry as plain data for JSON export.
+    """
+    with _lock:
+        return {
+            "counters": {
+                name: [{"labels": dict(labels), "value": value} for labels, value in sorted(series.items())]
+                for name, series in _counters.items()
+            },
+            "histograms": {
+                name: [
+                    {"labels": dict(labels), "count": e["count"], "sum": e["sum"],
+                     "buckets": dict(zip(map(str, e["buckets"]), e["counts"]))}
+                    for labels, e in sorted(series.items())
+                ]
+                for name, series in _histograms.items()
+            },
+        }
@@ -0,0 +1,364 @@
+"""
+OCR backend.
+
+Keeps Tesseract loaded in-process (via tesserocr, when installed) in a small
+pool of engines that are reused across calls, instead of pytesseract's temp
+file + new `tesseract` process per image. Images are preprocessed first:
+JPEGs are decoded at reduced size, oversized screenshots are downscaled (by
+pixel count, never narrower than MIN_SHORT_SIDE, so tall scrolling
+screenshots keep legible text), and
+everything is converted to grayscale and binarized (dark-mode screenshots are
+inverted to dark-on-light). With in-process engines, recognition can be
+restricted to detected text bands so blank areas are never analysed.
+
+Without tesserocr the same preprocessing is applied and pytesseract is used,
+with recognition cropped to the content bounding box.
+
+Usage (compare against the legacy path, each run in a fresh process):
+    python ocr_engine.py bench screenshot1.png screenshot2.jpg --repeat 5
+"""
+import argparse
+import io
+import json
+import os
+import queue
+import subprocess
+import sys
+import threading
+import time
+
+from PIL import Image, ImageOps
+
+import metrics
+
+try:
+    from tesserocr import PSM, PyTessBaseAPI
+except ImportError:  # Optional; falls back to pytesseract.
+    PyTessBaseAPI = None
+
+# Pixel count that screenshots are scaled down to (a 2000 x 2000 area).
+DEFAULT_MAX_PIXELS = 2000 * 2000
+# Downscaling never takes the short side below this, which keeps phone and
+# desktop UI text above Tesseract's preferred x-height; a tall scrolling
+# screenshot stays over DEFAULT_MAX_PIXELS rather than losing its text.
+MIN_SHORT_SIDE = 1000
+
+def target_size(width, height, max_pixels=DEFAULT_MAX_PIXELS, min_short_side=MIN_SHORT_SIDE):
+    """
+    Returns the (width, height) an image is downscaled to for OCR; the
+    original size when it is within max_pixels.
+    """
+    pixels = width * height
+    if not max_pixels or pixels <= max_pixels:
+        return width, height
+    scale = (max_pixels / pixels) ** 0.5
+    scale = max(scale, min(min_short_side / min(width, height), 1.0))
+    if scale >= 1.0:
+        return width, height
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+# --- Preprocessing ---
+
+def _otsu_threshold(histogram):
+    total = sum(histogram)
+    sum_all = sum(i * count for i, count in enumerate(histogram))
+    sum_bg = weight_bg = 0
+    best, threshold = -1, 127
+    for i, count in enumerate(histogram):
+        weight_bg += count
+        if weight_bg == 0:
+            continue
+        weight_fg = total - weight_bg
+        if weight_fg == 0:
+            break
+        sum_bg += i * count
+        mean_bg = sum_bg / weight_bg
+        mean_fg = (sum_all - sum_bg) / weight_fg
+        between = weight_bg * weight_fg * (mean_bg - mean_fg) ** 2
+        if between > best:
+            best, threshold = between, i
+    return threshold
+
+def load_image(source, max_pixels=DEFAULT_MAX_PIXELS):
+    """
+    Opens bytes, a path or a file-like object, decoding JPEGs at reduced size
+    when they are far larger than their OCR target size.
+    """
+    if isinstance(source, (bytes, bytearray)):
+        source = io.BytesIO(source)
+    image = Image.open(source)
+    size = target_size(*image.size, max_pixels)
+    if size != image.size:
+        # JPEG-only: decode directly at a 1/2, 1/4 or 1/8 scale (never below
+        # the target size), which cuts both decode time and peak memory. A
+        # no-op for other formats.
+        image.draft("L", size)
+    return image
+
+def _draft_scale(width, height, size):
+    # The reduction Image.draft picks for a JPEG: the largest of 8, 4, 2, 1
+    # that keeps both sides at or above the requested size.
+    fits = min(width // size[0], height // size[1])
+    return next(scale for scale in (8, 4, 2, 1) if scale <= fits or scale == 1)
+
+def estimate_memory(data, max_pixels=DEFAULT_MAX_PIXELS):
+    """
+    Estimates the peak bytes `OcrEngine.image_to_string` needs for an image,
+    from its header alone (nothing is decoded).
+    """
+    with Image.open(io.BytesIO(data)) as image:
+        width, height = image.size
+        mode, fmt = image.mode, image.format
+    size = target_size(width, height, max_pixels)
+    if fmt == "JPEG" and size != (width, height):
+        # Mirrors load_image's draft mode: grayscale at a 1/2, 1/4 or 1/8 scale.
+        scale = _draft_scale(width, height, size)
+        width, height = -(-width // scale), -(-height // scale)
+        decoded = width * height
+    else:
+        decoded = width * height * Image.getmodebands(mode)
+    pixels = width * height
+    if mode in ("RGBA", "LA", "P"):
+        # Flattening goes through RGBA and RGB copies.
+        decoded += pixels * 7
+    # Grayscale copy plus, after downscaling, the inverted/binarized copies.
+    scaled = min(pixels, size[0] * size[1])
+    return len(data) + decoded + pixels + int(scaled * 3)
+
+def preprocess(image, max_pixels=DEFAULT_MAX_PIXELS, binarize=True):
+    """
+    Downscales, grayscales and (optionally) binarizes an image for OCR.
+    Returns a mode "L" image with dark text on a light background.
+    """
+    if image.mode in ("RGBA", "LA", "P"):
+        # Flatten transparency onto white so it doesn't turn black.
+        background = Image.new("RGB", image.size, "white")
+        background.paste(image.convert("RGBA"), mask=image.convert("RGBA").getchannel("A"))
+        image = background
+    image = image.convert("L")
+    size = target_size(*image.size, max_pixels)
+    if size != image.size:
+        image = image.resize(size, Image.LANCZOS)
+
+    histogram = image.histogram()
+    pixels = image.size[0] * image.size[1]
+    mean = sum(i * count for i, count in enumerate(histogram)) / max(pixels, 1)
+    if mean < 110:
+        # Dark-mode UI: Tesseract expects dark text on light.
+        image = ImageOps.invert(image)
+        histogram = histogram[::-1]
+    if binarize:
+        threshold = _otsu_threshold(histogram)
+        image = image.point(lambda value: 255 if value > threshold else 0)
+    return image
+
+def detect_text_regions(image, min_gap=12, padding=6):
+    """
+    Finds horizontal bands containing ink in a preprocessed image.
+
+    Returns (left, top, width, height) boxes, top to bottom. Row ink density
+    comes from a 1-pixel-wide BOX resize, so this runs in C.
+    """
+    width, height = image.size
+    inverted = ImageOps.invert(image)
+    rows = list(inverted.resize((1, height), Image.BOX).getdata())
+    boxes = []
+    start = last_ink = None
+    for y, ink in enumerate(rows + [0] * (min_gap + 1)):
+        if ink > 2:
+            if start is None:
+                start = y
+            last_ink = y
+        elif start is not None and y - last_ink > min_gap:
+            top = max(start - padding, 0)
+            bottom = min(last_ink + padding + 1, height)
+            bbox = inverted.crop((0, top, width, bottom)).getbbox()
+            if bbox:
+                left = max(bbox[0] - padding, 0)
+                right = min(bbox[2] + padding, width)
+                boxes.append((left, top, right - left, bottom - top))
+            start = None
+    return boxes
+
+# --- Engines ---
+
+class OcrEngine:
+    """
+    Thread-safe OCR entry point backed by a pool of in-process engines.
+    """
+
+    def __init__(self, pool_size=None, lang="eng", max_pixels=DEFAULT_MAX_PIXELS, binarize=True, regions=True):
+        self.lang = lang
+        self.max_pixels = max_pixels
+        self.binarize = binarize
+        self.regions = regions
+        self.pool_size = pool_size or min(4, os.cpu_count() or 1)
+        self.in_process = PyTessBaseAPI is not None
+        self._idle = queue.Queue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    def _acquire(self):
+        while True:
+            try:
+                return self._idle.get_nowait()
+            except queue.Empty:
+                pass
+            with self._lock:
+                reserved = self._created < self.pool_size
+                if reserved:
+                    self._created += 1
+            if reserved:
+                try:
+                    return PyTessBaseAPI(lang=self.lang, psm=PSM.AUTO)
+                except BaseException:
+                    # Give the slot back, or callers would wait on an engine
+                    # that will never exist.
+                    with self._lock:
+                        self._created -= 1
+                    raise
+            try:
+                # Wake now and then to retake a slot freed by a failed load.
+                return self._idle.get(timeout=1)
+            except queue.Empty:
+                continue
+
+    def warm_up(self):
+        """
+        Loads one engine (and its language model) ahead of the first request.
+        """
+        if self.in_process:
+            self._idle.put(self._acquire())
+
+    def image_to_string(self, source):
+        """
+        OCRs bytes, a path, a file-like object or a PIL image.
+        """
+        with metrics.timed("ocr_preprocess"):
+            image = source if isinstance(source, Image.Image) else load_image(source, self.max_pixels)
+            # Decoded pixels; JPEGs may already be reduced by draft mode.
+            metrics.record_size("ocr", "pixels", image.size[0] * image.size[1])
+            image = preprocess(image, self.max_pixels, self.binarize)
+        with metrics.timed("ocr_recognize"):
+            if self.in_process:
+                return self._recognize_in_process(image)
+            return self._recognize_subprocess(image)
+
+    def _recognize_in_process(self, image):
+        api = self._acquire()
+        try:
+            api.SetImage(image)
+            if not self.regions:
+                api.SetPageSegMode(PSM.AUTO)
+                return api.GetUTF8Text()
+            api.SetPageSegMode(PSM.SINGLE_BLOCK)
+            parts = []
+            for left, top, width, height in detect_text_regions(image):
+                api.SetRectangle(left, top, width, height)
+                parts.append(api.GetUTF8Text().strip())
+            return "\n".join(part for part in parts if part)
+        finally:
+            api.Clear()
+            self._idle.put(api)
+
+    def _recognize_subprocess(self, image):
+        import pytesseract
+
+        if self.regions:
+            # One process per band would be slower than one full pass, so
+            # only trim the margins here.
+            bbox = ImageOps.invert(image).getbbox()
+            if bbox is None:
+                return ""
+            image = image.crop(bbox)
+        return pytesseract.image_to_string(image, lang=self.lang)
+
+_engine = None
+_engine_lock = threading.Lock()
+
+def get_ocr_engine():
+    """
+    Returns the shared OCR engine.
+    """
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = OcrEngine()
+        return _engine
+
+# --- Benchmark ---
+
+def _peak_rss_mb():
+    # VmHWM is per-process on Linux; ru_maxrss would include the parent's
+    # peak, inherited across fork/exec.
+    try:
+        with open("/proc/self/status", encoding="ascii") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    import resource
+    # ru_maxrss is in bytes on macOS.
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 2**20, 1)
+
+def _bench_one(path, mode, repeat):
+    with open(path, "rb") as f:
+        data = f.read()
+    timings = []
+    if mode == "legacy":
+        import pytesseract
+        for _ in range(repeat):
+            start = time.perf_counter()
+            pytesseract.image_to_string(Image.open(io.BytesIO(data)))
+            timings.append(time.perf_counter() - start)
+    else:
+        engine = OcrEngine()
+        engine.warm_up()
+        for _ in range(repeat):
+            start = time.perf_counter()
+            engine.image_to_string(data)
+            timings.append(time.perf_counter() - start)
+    timings.sort()
+    return {
+        "mode": mode,
+        "image": path,
+        "median_s": round(timings[len(timings) // 2], 4),
+        "min_s": round(timings[0], 4),
+        "peak_rss_mb": _peak_rss_mb(),
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="OCR engine utilities.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    bench = sub.add_parser("bench", help="compare latency and peak RSS against the legacy pytesseract path")
+    bench.add_argument("images", nargs="+")
+    bench.add_argument("--repeat", type=int, default=3)
+    one = sub.add_parser("bench-one", help=argparse.SUPPRESS)
+    one.add_argument("image")
+    one.add_argument("--mode", choices=["legacy", "engine"], required=True)
+    one.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    if args.command == "bench-one":
+        print(json.dumps(_bench_one(args.image, args.mode, args.repeat)))
+        return
+
+    print(f"in-process engine: {'tesserocr' if PyTessBaseAPI else 'unavailable, using pytesseract'}")
+    for path in args.images:
+        results = {}
+        for mode in ("legacy", "engine"):
+            # Fresh process per run so peak RSS is attributable to one path.
+            out = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "bench-one", path, "--mode", mode,
+                 "--repeat", str(args.repeat)],
+                check=True, capture_output=True, text=True,
+            ).stdout
+            results[mode] = json.loads(out)
+        legacy, engine = results["legacy"], results["engine"]
+        speedup = legacy["median_s"] / engine["median_s"] if engine["median_s"] else float("inf")
+        print(f"{path}: legacy {legacy['median_s']}s / {legacy['peak_rss_mb']} MB, "
+              f"engine {engine['median_s']}s / {engine['peak_rss_mb']} MB ({speedup:.1f}x faster)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+PDF text extraction with PyMuPDF.
+
+Pages with an embedded text layer are read directly. Only image-only pages
+are rendered and OCR'd, on a thread pool so several run at once. Pages are
+yielded in order as soon as each is ready, so callers can feed them to the
+rule checker without materializing the whole document first.
+"""
+import hashlib
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import fitz  # PyMuPDF
+from PIL import Image
+
+import metrics
+from errors import ExtractionError, error_reason
+from extract_cache import get_cache
+from ocr_engine import get_ocr_engine
+
+# Pages with fewer extractable characters than this are treated as scans.
+MIN_TEXT_CHARS = 20
+OCR_DPI = 200
+
+def pdf_key(data: bytes):
+    """
+    Cache key for a PDF: the SHA-256 of its bytes.
+    """
+    return "pdf:" + hashlib.sha256(data).hexdigest()
+
+def _render_page(page, dpi=OCR_DPI):
+    pixmap = page.get_pixmap(dpi=dpi, colorspace=fitz.csGRAY, alpha=False)
+    return Image.frombytes("L", (pixmap.width, pixmap.height), pixmap.samples)
+
+def iter_pdf_pages(data: bytes, ocr_workers=None, lookahead=None):
+    """
+    Yields (page_number, text) for every page, in page order.
+
+    Image-only pages are rendered here (PyMuPDF documents are not safe to
+    share across threads) and OCR'd on `ocr_workers` threads. At most
+    `lookahead` pages are pending at once, which bounds memory for long
+    scanned documents.
+    """
+    ocr_workers = ocr_workers or min(4, os.cpu_count() or 1)
+    lookahead = lookahead or ocr_workers * 2
+    engine = get_ocr_engine()
+    pending = deque()
+
+    with fitz.open(stream=data, filetype="pdf") as doc, ThreadPoolExecutor(max_workers=ocr_workers) as pool:
+        for number, page in enumerate(doc, start=1):
+            with metrics.timed("pdf_page_text"):
+                text = page.get_text("text")
+            if len(text.strip()) >= MIN_TEXT_CHARS:
+                metrics.inc("a2p_pdf_pages_total", source="text")
+                pending.append((number, text, None))
+            else:
+                metrics.inc("a2p_pdf_pages_total", source="ocr")
+                with metrics.timed("pdf_render"):
+                    image = _render_page(page)
+                pending.append((number, None, pool.submit(engine.image_to_string, image)))
+            while pending and (pending[0][2] is None or pending[0][2].done() or len(pending) >= lookahead):
+                number_ready, text_ready, future = pending.popleft()
+                yield number_ready, text_ready if future is None else future.result()
+        while pending:
+            number_ready, text_ready, future = pending.popleft()
+            yield number_ready, text_ready if future is None else future.result()
+
+def iter_pdf_text(data: bytes, **options):
+    """
+    Yields page texts in order, separated by newlines, reading through the
+    extraction cache. Chunks concatenate to `extract_text_from_pdf`'s result.
+    Raises ExtractionError if the PDF can't be read.
+    """
+    cache = get_cache()
+    key = pdf_key(data)
+    cached = cache.get(key) if cache else None
+    if cached is not None:
+        yield cached
+        return
+    metrics.record_size("extract_pdf", "bytes", len(data))
+    pages = []
+    try:
+        for number, text in iter_pdf_pages(data, **options):
+            chunk = text if number == 1 else "\n" + text
+            pages.append(chunk)
+            yield chunk
+    except Exception as e:
+        metrics.record_error("extract_pdf", error_reason(e))
+        raise ExtractionError("extract_pdf", error_reason(e), f"Failed to extract text from PDF: {e}") from e
+    if cache:
+        cache.put(key, "".join(pages))
+
+def extract_text_from_pdf(data: bytes, **options):
+    """
+    Returns the full text of a PDF.
+    """
+    return "".join(iter_pdf_text(data, **options))
@@ -0,0 +1,457 @@
+"""
+Change monitoring for registered privacy-policy URLs.
+
+Each registered policy is polled when it falls due with a conditional GET
+against the ETag / Last-Modified of its last response, so an unchanged page
+costs one 304 and no parsing. The next poll is scheduled at the policy's
+interval plus or minus a random jitter, so a registry imported at once
+spreads out instead of polling in bursts; failed polls back off from
+RETRY_BASE up to the interval.
+
+Bodies are read through AsyncFetcher, which applies the byte caps and PDF
+routing of `html_extract.stream_url_text`. When a page comes back changed,
+its text (one line per block element, as html_extract emits it, or per PDF
+page line) is compared with the last snapshot. Pages whose text
+is the same as the rule engine sees it are only rescheduled; otherwise the
+sections are diffed and the policy is re-checked with
+check_privacy_compliance through the result store, so it also appears in
+`result_store.py history --source <url>`. A policy last checked under other
+rules (rules.json or rule_engine.MATCHER_VERSION has changed since) is
+re-checked from its snapshot even when the page is unchanged, emitting only
+regressions.
+
+A poll that fails for any reason, not only an extraction error, counts as a
+failed check for that policy; the rest of the round carries on.
+
+Events are dicts passed to a callback (the CLI writes them as JSON lines):
+    regression   a required rule went missing or a prohibited phrase appeared
+                 since the last check (newly_missing, newly_prohibited)
+    changed      the text changed without a new failure (resolved lists any
+                 rules that now pass)
+    unreachable  UNREACHABLE_AFTER consecutive polls failed
+Content events carry the added and removed sections. The first successful
+poll of a policy sets its baseline and emits nothing.
+
+The registry is SQLite (WAL) indexed on the due time, with snapshots stored
+compressed, so tens of thousands of policies fit in one file and a
+scheduling pass only reads due rows. Due rows are claimed with a lease, so
+several monitor processes can share a registry.
+
+Usage:
+    python policy_monitor.py add https://example.com/privacy --campaign CMP123
+    python policy_monitor.py import policies.csv          # url[,campaign] per line
+    python policy_monitor.py run --events events.jsonl
+    python policy_monitor.py run --once
+    python policy_monitor.py list [--failing]
+    python policy_monitor.py remove https://example.com/privacy
+"""
+import argparse
+import asyncio
+import csv
+import difflib
+import json
+import os
+import random
+import sqlite3
+import sys
+import threading
+import time
+import zlib
+
+import metrics
+from compliance_logic import check_privacy_compliance
+from errors import ExtractionError, error_reason
+from extract_cache import normalize_url
+from result_store import DEFAULT_DIR, checked, content_hash
+from rule_engine import get_engine
+
+DEFAULT_INTERVAL = 24 * 60 * 60
+DEFAULT_JITTER = 0.1
+RETRY_BASE = 5 * 60
+UNREACHABLE_AFTER = 3
+# Seconds a claimed policy stays reserved while its poll is in flight.
+LEASE = 15 * 60
+# Sections listed per event, each cut to SECTION_CHARS.
+EVENT_SECTIONS = 20
+SECTION_CHARS = 500
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS policies (
+    url TEXT PRIMARY KEY,
+    campaign TEXT,
+    interval REAL NOT NULL,
+    next_check REAL NOT NULL,
+    validators TEXT,
+    text_hash TEXT,
+    snapshot BLOB,
+    compliant INTEGER,
+    missing TEXT,
+    prohibited TEXT,
+    checked_at REAL,
+    changed_at REAL,
+    failures INTEGER NOT NULL DEFAULT 0,
+    last_error TEXT,
+    rules_version TEXT
+);
+CREATE INDEX IF NOT EXISTS policies_due ON policies (next_check);
+"""
+
+def sections(text: str):
+    """
+    Splits extracted text into its non-empty lines.
+    """
+    return [line.strip() for line in text.splitlines() if line.strip()]
+
+def diff_sections(old, new):
+    """
+    Returns (added, removed) sections between two section lists.
+    """
+    matcher = difflib.SequenceMatcher(None, old, new, autojunk=False)
+    added, removed = [], []
+    for op, i1, i2, j1, j2 in matcher.get_opcodes():
+        if op in ("replace", "delete"):
+            removed.extend(old[i1:i2])
+        if op in ("replace", "insert"):
+            added.extend(new[j1:j2])
+    return added, removed
+
+def _excerpt(items):
+    return [item[:SECTION_CHARS] for item in items[:EVENT_SECTIONS]]
+
+class PolicyMonitor:
+    """
+    Registry of monitored policy URLs and the polling loop over it.
+
+    `on_event` receives each event dict; it runs on a worker thread.
+    """
+
+    def __init__(self, directory=None, on_event=None, jitter=DEFAULT_JITTER, batch_size=1000,
+                 concurrency=64):
+        self.directory = directory or os.environ.get("A2P_RESULTS_DIR", DEFAULT_DIR)
+        os.makedirs(self.directory, exist_ok=True)
+        self.path = os.path.join(self.directory, "monitor.sqlite3")
+        self.on_event = on_event
+        self.jitter = jitter
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+            columns = [row[1] for row in conn.execute("PRAGMA table_info(policies)")]
+            if "rules_version" not in columns:
+                conn.execute("ALTER TABLE policies ADD COLUMN rules_version TEXT")
+
+    def _connect(self):
+        # One connection per thread, as in extract_cache.
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _next(self, interval, now):
+        return now + interval * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+    # --- Registry ---
+
+    def add(self, url, campaign=None, interval=DEFAULT_INTERVAL):
+        """
+        Registers a policy URL, due immediately. Re-adding a URL updates its
+        campaign and interval and keeps its snapshot.
+        """
+        url = normalize_url(url)
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO policies (url, campaign, interval, next_check) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (url) DO UPDATE SET campaign = excluded.campaign, interval = excluded.interval",
+                (url, campaign, interval, time.time()),
+            )
+        return url
+
+    def remove(self, url):
+        with self._connect() as conn:
+            return conn.execute("DELETE FROM policies WHERE url = ?", (normalize_url(url),)).rowcount > 0
+
+    def policies(self, failing=False):
+        """
+        Returns the registered policies with their last verdict, by URL.
+        """
+        where = "WHERE compliant = 0 " if failing else ""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT url, campaign, next_check, compliant, missing, prohibited, checked_at, "
+                f"changed_at, failures, last_error FROM policies {where}ORDER BY url"
+            ).fetchall()
+        return [
+            {"url": row[0], "campaign": row[1], "next_check": row[2],
+             "compliant": None if row[3] is None else bool(row[3]),
+             "missing": json.loads(row[4] or "[]"), "prohibited": json.loads(row[5] or "[]"),
+             "checked_at": row[6], "changed_at": row[7], "failures": row[8], "last_error": row[9]}
+            for row in rows
+        ]
+
+    def claim_due(self, now=None, limit=None):
+        """
+        Returns up to `limit` due policies and leases them for LEASE seconds.
+        """
+        now = now or time.time()
+        conn = self._connect()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            rows = conn.execute(
+                "SELECT url, campaign, interval, validators, failures FROM policies "
+                "WHERE next_check <= ? ORDER BY next_check LIMIT ?",
+                (now, limit or self.batch_size),
+            ).fetchall()
+            conn.executemany("UPDATE policies SET next_check = ? WHERE url = ?",
+                             [(now + LEASE, row[0]) for row in rows])
+        return [
+            {"url": row[0], "campaign": row[1], "interval": row[2],
+             "validators": json.loads(row[3] or "{}"), "failures": row[4]}
+            for row in rows
+        ]
+
+    def next_due(self):
+        with self._connect() as conn:
+            return conn.execute("SELECT MIN(next_check) FROM policies").fetchone()[0]
+
+    # --- Polling ---
+
+    def _emit(self, event):
+        metrics.inc("a2p_monitor_events_total", type=event["type"])
+        if self.on_event:
+            self.on_event(event)
+
+    def _unchanged(self, policy, now, validators=None):
+        metrics.inc("a2p_monitor_polls_total", result="unchanged")
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE policies SET next_check = ?, validators = COALESCE(?, validators), "
+                "failures = 0, last_error = NULL WHERE url = ?",
+                (self._next(policy["interval"], now), json.dumps(validators) if validators else None, policy["url"]),
+            )
+
+    def _failed(self, policy, error, now):
+        metrics.inc("a2p_monitor_polls_total", result="error")
+        failures = policy["failures"] + 1
+        delay = min(policy["interval"], RETRY_BASE * 2 ** (failures - 1))
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE policies SET next_check = ?, failures = ?, last_error = ? WHERE url = ?",
+                (self._next(delay, now), failures, str(error), policy["url"]),
+            )
+        if failures == UNREACHABLE_AFTER:
+            self._emit({"type": "unreachable", "url": policy["url"], "campaign": policy["campaign"],
+                        "failures": failures, **error.to_dict(), "at": now})
+
+    def _changed(self, policy, text, validators, now):
+        """
+        Diffs new text against the snapshot and re-checks it when it differs,
+        or when the policy was last checked under other rules. `text` is None
+        for a 304, which only re-checks the snapshot if the rules changed.
+        """
+        url = policy["url"]
+        rules_version = get_engine().verdict_version
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT text_hash, snapshot, missing, prohibited, rules_version FROM policies WHERE url = ?",
+                (url,),
+            ).fetchone()
+        if row is None:  # Removed while in flight.
+            return
+        old_hash, snapshot, old_missing, old_prohibited, old_version = row
+        old_text = zlib.decompress(snapshot).decode("utf-8", "surrogatepass") if snapshot else None
+        if text is None:
+            if old_text is None or old_version == rules_version:
+                self._unchanged(policy, now, validators)
+                return
+            text = old_text
+        digest = content_hash(text)
+        rules_changed = old_version != rules_version
+        if digest == old_hash and not rules_changed:
+            # New bytes, same text (markup, scripts, a rotated nonce...).
+            self._unchanged(policy, now, validators)
+            return
+
+        metrics.inc("a2p_monitor_polls_total", result="changed" if digest != old_hash else "rechecked")
+        result, _ = checked("privacy", text, lambda: check_privacy_compliance(text),
+                            campaign=policy["campaign"], source=url)
+        missing, prohibited = result["missing_required"], result["prohibited_phrases_found"]
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE policies SET next_check = ?, validators = COALESCE(?, validators), text_hash = ?, "
+                "snapshot = ?, compliant = ?, missing = ?, prohibited = ?, checked_at = ?, "
+                "changed_at = CASE WHEN text_hash IS ? THEN changed_at ELSE ? END, "
+                "failures = 0, last_error = NULL, rules_version = ? WHERE url = ?",
+                (self._next(policy["interval"], now), json.dumps(validators) if validators else None, digest,
+                 zlib.compress(text.encode("utf-8", "surrogatepass")), int(result["compliant"]),
+                 json.dumps(missing), json.dumps(prohibited), now, digest, now, rules_version, url),
+            )
+        if old_hash is None:
+            return
+
+        old_missing, old_prohibited = json.loads(old_missing or "[]"), json.loads(old_prohibited or "[]")
+        added, removed = diff_sections(sections(old_text or ""), sections(text))
+        newly_missing = [label for label in missing if label not in old_missing]
+        newly_prohibited = [label for label in prohibited if label not in old_prohibited]
+        if digest == old_hash and not (newly_missing or newly_prohibited):
+            # Re-checked under new rules without a new failure.
+            return
+        event = {
+            "type": "regression" if newly_missing or newly_prohibited else "changed",
+            "url": url,
+            "campaign": policy["campaign"],
+            "compliant": result["compliant"],
+            "newly_missing": newly_missing,
+            "newly_prohibited": newly_prohibited,
+            "resolved": [label for label in old_missing + old_prohibited
+                         if label not in missing and label not in prohibited],
+            "sections": {"added": _excerpt(added), "removed": _excerpt(removed),
+                         "added_count": len(added), "removed_count": len(removed)},
+            # Cut at the download cap: sections past it show as removed.
+            "truncated": getattr(text, "truncated", False),
+            "at": now,
+        }
+        self._emit(event)
+
+    async def _poll(self, fetcher, policy, limit):
+        async with limit:
+            try:
+                text, validators = await fetcher.revalidate(policy["url"], policy["validators"])
+            except Exception as e:
+                # Anything a single URL raises is that policy's failed check.
+                if not isinstance(e, ExtractionError):
+                    e = ExtractionError("extract_url", error_reason(e), f"Failed to poll URL: {type(e).__name__}: {e}")
+                outcome = (self._failed, policy, e, time.time())
+            else:
+                outcome = (self._changed, policy, text, validators, time.time())
+        # Diffing, checking and SQLite writes are blocking; keep them off the loop.
+        loop = asyncio.get_running_loop()
+        try:
+            await loop.run_in_executor(None, *outcome)
+        except Exception as e:  # One bad policy must not stop the monitor; its lease expires.
+            metrics.record_error("policy_monitor", type(e).__name__)
+            print(f"Polling {policy['url']} failed: {type(e).__name__}: {e}", file=sys.stderr)
+
+    async def poll_due(self, fetcher):
+        """
+        Polls every policy due now, at most `concurrency` at a time. Returns
+        the number polled.
+        """
+        limit = asyncio.Semaphore(self.concurrency)
+        total = 0
+        while True:
+            batch = self.claim_due()
+            if not batch:
+                return total
+            results = await asyncio.gather(
+                *(self._poll(fetcher, policy, limit) for policy in batch), return_exceptions=True
+            )
+            for policy, result in zip(batch, results):
+                if isinstance(result, Exception):
+                    metrics.record_error("policy_monitor", type(result).__name__)
+                    print(f"Polling {policy['url']} failed: {type(result).__name__}: {result}", file=sys.stderr)
+            total += len(batch)
+
+    async def run(self, fetcher, stop=None, idle=60):
+        """
+        Polls due policies until `stop` (an asyncio.Event) is set, sleeping
+        until the next one falls due, or at most `idle` seconds so newly
+        added policies are picked up.
+        """
+        stop = stop or asyncio.Event()
+        while not stop.is_set():
+            await self.poll_due(fetcher)
+            next_due = self.next_due()
+            wait = idle if next_due is None else min(idle, max(0.0, next_due - time.time()))
+            try:
+                await asyncio.wait_for(stop.wait(), timeout=wait)
+            except asyncio.TimeoutError:
+                pass
+
+# --- Command line ---
+
+def _when(timestamp):
+    return time.strftime("%Y-%m-%d %H:%M", time.localtime(timestamp)) if timestamp else "-"
+
+async def _run(monitor, once, **fetcher_options):
+    from async_fetch import AsyncFetcher
+
+    # The monitor keeps its own snapshots and validators; don't churn the extraction cache.
+    async with AsyncFetcher(cache=False, **fetcher_options) as fetcher:
+        if once:
+            return await monitor.poll_due(fetcher)
+        await monitor.run(fetcher)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Monitor privacy-policy URLs for compliance regressions.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    add = sub.add_parser("add", help="register a policy URL")
+    add.add_argument("url")
+    add.add_argument("--campaign")
+    add.add_argument("--interval", type=float, default=DEFAULT_INTERVAL, help="seconds between polls")
+    imp = sub.add_parser("import", help="register url[,campaign] lines from a file ('-' for stdin)")
+    imp.add_argument("file")
+    imp.add_argument("--interval", type=float, default=DEFAULT_INTERVAL, help="seconds between polls")
+    remove = sub.add_parser("remove", help="stop monitoring a URL")
+    remove.add_argument("url")
+    listing = sub.add_parser("list", help="show registered policies and their last verdict")
+    listing.add_argument("--failing", action="store_true", help="only non-compliant policies")
+    run = sub.add_parser("run", help="poll policies as they fall due")
+    run.add_argument("--once", action="store_true", help="poll what is due now, then exit")
+    run.add_argument("--events", default="-", help="append events as JSON lines here (default stdout)")
+    run.add_argument("--jitter", type=float, default=DEFAULT_JITTER, help="fraction of the interval")
+    run.add_argument("--concurrency", type=int, default=64, help="polls in flight")
+    run.add_argument("--per-host", type=int, default=4, help="concurrent connections per host")
+    run.add_argument("--timeout", type=float, default=10)
+    args = parser.parse_args(argv)
+
+    if args.command == "add":
+        print(PolicyMonitor().add(args.url, args.campaign, args.interval))
+    elif args.command == "import":
+        monitor = PolicyMonitor()
+        source = sys.stdin if args.file == "-" else open(args.file, encoding="utf-8", newline="")
+        count = 0
+        with source:
+            for row in csv.reader(source):
+                if row and row[0].strip() and not row[0].startswith("#"):
+                    campaign = row[1].strip() if len(row) > 1 and row[1].strip() else None
+                    monitor.add(row[0].strip(), campaign, args.interval)
+                    count += 1
+        print(f"Registered {count} policies")
+    elif args.command == "remove":
+        if not PolicyMonitor().remove(args.url):
+            print(f"Not registered: {args.url}", file=sys.stderr)
+            return 1
+    elif args.command == "list":
+        for policy in PolicyMonitor().policies(args.failing):
+            verdict = {None: "-", True: "Compliant", False: "Not Compliant"}[policy["compliant"]]
+            missing = ", ".join(policy["missing"] + policy["prohibited"]) or "-"
+            print(f"{verdict:13}  checked {_when(policy['checked_at'])}  next {_when(policy['next_check'])}  "
+                  f"{policy['url']}  {policy['campaign'] or ''}  issues: {missing}"
+                  + (f"  (failing x{policy['failures']}: {policy['last_error']})" if policy["failures"] else ""))
+    else:
+        out = sys.stdout if args.events == "-" else open(args.events, "a", encoding="utf-8")
+        lock = threading.Lock()
+
+        def write(event):
+            with lock:
+                out.write(json.dumps(event, ensure_ascii=False) + "\n")
+                out.flush()
+
+        monitor = PolicyMonitor(on_event=write, jitter=args.jitter, concurrency=args.concurrency)
+        try:
+            polled = asyncio.run(_run(monitor, args.once, per_host=args.per_host,
+                                      max_connections=args.concurrency, timeout=args.timeout))
+            if args.once:
+                print(f"Polled {polled} policies", file=sys.stderr)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            if out is not sys.stdout:
+                out.close()
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,306 @@
+"""
+Persistent store of compliance check results.
+
+Results are keyed by a hash of the checked content plus the rule set, the
+rules.json version, the matcher code version (rule_engine.MATCHER_VERSION)
+and the fuzzy flag, so resubmitting unchanged content returns the earlier
+verdict without re-checking, and editing rules.json or the matching code
+invalidates every stored verdict at once. The content hash is taken over the
+lowered text, which is exactly what the rule engine matches against, so a
+shared entry can never differ from a fresh check.
+
+Every check made for a campaign or source (the policy URL, or file in batch
+runs), fresh or not, is also appended to its history, and each missing
+required or found prohibited rule to a failures table indexed on
+(rule_id, checked_at), so questions like "which policies failed 'third parties' this week" are
+index range scans even over millions of rows.
+
+The database is SQLite in WAL mode so app sessions, batch workers and the
+API can write concurrently.
+
+Configuration (environment):
+    A2P_RESULTS_DIR      directory for results.sqlite3 (default ~/.local/share/a2p-compliance)
+    A2P_RESULTS_DISABLE  set to 1 to bypass the store
+
+Usage:
+    python result_store.py stats
+    python result_store.py failing "third parties" --days 7
+    python result_store.py history --campaign CMP123
+    python result_store.py history --source https://example.com/privacy
+"""
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+
+import metrics
+from rule_engine import get_engine
+
+DEFAULT_DIR = os.path.join(os.path.expanduser("~"), ".local", "share", "a2p-compliance")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    id INTEGER PRIMARY KEY,
+    content_hash TEXT NOT NULL,
+    rule_set TEXT NOT NULL,
+    rules_version TEXT NOT NULL,
+    fuzzy INTEGER NOT NULL,
+    compliant INTEGER NOT NULL,
+    result TEXT NOT NULL,
+    created REAL NOT NULL,
+    UNIQUE (content_hash, rule_set, rules_version, fuzzy)
+);
+CREATE TABLE IF NOT EXISTS checks (
+    id INTEGER PRIMARY KEY,
+    result_id INTEGER NOT NULL REFERENCES results (id),
+    rule_set TEXT NOT NULL,
+    compliant INTEGER NOT NULL,
+    campaign TEXT,
+    source TEXT,
+    checked_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS checks_campaign ON checks (campaign, checked_at) WHERE campaign IS NOT NULL;
+CREATE INDEX IF NOT EXISTS checks_source ON checks (source, checked_at) WHERE source IS NOT NULL;
+CREATE TABLE IF NOT EXISTS failures (
+    check_id INTEGER NOT NULL REFERENCES checks (id),
+    rule_id TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    campaign TEXT,
+    source TEXT,
+    checked_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS failures_rule_time ON failures (rule_id, checked_at);
+"""
+
+def content_hash(text: str):
+    """
+    Hash of the text as the rule engine sees it (lowered).
+    """
+    return hashlib.sha256(text.lower().encode("utf-8", "surrogatepass")).hexdigest()
+
+class ResultStore:
+    """
+    Deduplicating result store with check history, shared across processes.
+    """
+
+    def __init__(self, directory=None, engine=None):
+        self.directory = directory or os.environ.get("A2P_RESULTS_DIR", DEFAULT_DIR)
+        self.engine = engine or get_engine()
+        os.makedirs(self.directory, exist_ok=True)
+        self.path = os.path.join(self.directory, "results.sqlite3")
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+
+    def _connect(self):
+        # One connection per thread, as in extract_cache.
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _rule_id(self, rule_set, label):
+        for rule in self.engine.rules_in(rule_set):
+            if rule["label"] == label:
+                return rule["id"]
+        return label
+
+    def lookup(self, rule_set, text, fuzzy=False):
+        """
+        Returns (result, created) stored for identical content, or (None, None).
+        """
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT result, created FROM results "
+                "WHERE content_hash = ? AND rule_set = ? AND rules_version = ? AND fuzzy = ?",
+                (content_hash(text), rule_set, self.engine.verdict_version, int(fuzzy)),
+            ).fetchone()
+        metrics.inc("a2p_result_store_requests_total", rule_set=rule_set, result="hit" if row else "miss")
+        if row is None:
+            return None, None
+        return json.loads(row[0]), row[1]
+
+    def record(self, rule_set, text, result, fuzzy=False, campaign=None, source=None):
+        """
+        Stores a result (unless identical content already has one) and, when
+        a campaign or source is given, adds the check to the history. Returns
+        the check id, or None for an anonymous check.
+        """
+        now = time.time()
+        digest = content_hash(text)
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR IGNORE INTO results "
+                "(content_hash, rule_set, rules_version, fuzzy, compliant, result, created) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (digest, rule_set, self.engine.verdict_version, int(fuzzy), int(result["compliant"]),
+                 json.dumps(result, ensure_ascii=False), now),
+            )
+            result_id = conn.execute(
+                "SELECT id FROM results "
+                "WHERE content_hash = ? AND rule_set = ? AND rules_version = ? AND fuzzy = ?",
+                (digest, rule_set, self.engine.verdict_version, int(fuzzy)),
+            ).fetchone()[0]
+            if campaign is None and source is None:
+                # Nothing to attribute it to; history would only pile up.
+                return None
+            check_id = conn.execute(
+                "INSERT INTO checks (result_id, rule_set, compliant, campaign, source, checked_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (result_id, rule_set, int(result["compliant"]), campaign, source, now),
+            ).lastrowid
+            failures = [("missing", label) for label in result["missing_required"]]
+            failures += [("prohibited", label) for label in result["prohibited_phrases_found"]]
+            conn.executemany(
+                "INSERT INTO failures (check_id, rule_id, kind, campaign, source, checked_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [(check_id, self._rule_id(rule_set, label), kind, campaign, source, now)
+                 for kind, label in failures],
+            )
+        return check_id
+
+    def check(self, rule_set, text, compute, fuzzy=False, campaign=None, source=None):
+        """
+        Returns (result, cached_at). For content already checked under the
+        current rules, the stored result and the time it was first computed;
+        otherwise compute() is called and its result stored, with cached_at
+        None. Either way a check for a campaign or source is added to its
+        history.
+        """
+        result, cached_at = self.lookup(rule_set, text, fuzzy)
+        if result is None:
+            result = compute()
+        self.record(rule_set, text, result, fuzzy, campaign, source)
+        return result, cached_at
+
+    def history(self, campaign=None, source=None, limit=50):
+        """
+        Returns the most recent checks for a campaign or a source, newest first.
+        """
+        if (campaign is None) == (source is None):
+            raise ValueError("Pass exactly one of campaign or source")
+        column, value = ("campaign", campaign) if campaign is not None else ("source", source)
+        with self._connect() as conn:
+            rows = conn.execute(
+                f"SELECT c.id, c.rule_set, c.compliant, c.campaign, c.source, c.checked_at, r.result "
+                f"FROM checks c JOIN results r ON r.id = c.result_id "
+                f"WHERE c.{column} = ? ORDER BY c.checked_at DESC LIMIT ?",
+                (value, limit),
+            ).fetchall()
+        return [
+            {"check_id": row[0], "rule_set": row[1], "compliant": bool(row[2]), "campaign": row[3],
+             "source": row[4], "checked_at": row[5], "result": json.loads(row[6])}
+            for row in rows
+        ]
+
+    def failing(self, rule, since, until=None, limit=1000):
+        """
+        Returns the sources and campaigns that failed a rule (by id or label)
+        between `since` and `until`, one row per source, most recent failure first.
+        """
+        rule_ids = {rule} if rule in self.engine.rules_by_id else {
+            r["id"] for r in self.engine.rules if r["label"] == rule
+        }
+        if not rule_ids:
+            raise ValueError(f"Unknown rule {rule!r}")
+        until = until or time.time()
+        placeholders = ",".join("?" * len(rule_ids))
+        with self._connect() as conn:
+            rows = conn.execute(
+                f"SELECT rule_id, kind, COALESCE(source, campaign) AS subject, campaign, source, "
+                f"MAX(checked_at) AS last, COUNT(*) "
+                f"FROM failures WHERE rule_id IN ({placeholders}) AND checked_at >= ? AND checked_at < ? "
+                f"AND COALESCE(source, campaign) IS NOT NULL "
+                f"GROUP BY rule_id, subject ORDER BY last DESC LIMIT ?",
+                (*sorted(rule_ids), since, until, limit),
+            ).fetchall()
+        return [
+            {"rule": row[0], "kind": row[1], "campaign": row[3], "source": row[4],
+             "last_failed_at": row[5], "failures": row[6]}
+            for row in rows
+        ]
+
+    def stats(self):
+        with self._connect() as conn:
+            results, checks, failures = (
+                conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+                for table in ("results", "checks", "failures")
+            )
+        return {"path": self.path, "rules_version": self.engine.verdict_version,
+                "results": results, "checks": checks, "failures": failures}
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_store():
+    """
+    Returns the shared store, or None when disabled via A2P_RESULTS_DISABLE.
+    """
+    global _store
+    if os.environ.get("A2P_RESULTS_DISABLE") == "1":
+        return None
+    with _store_lock:
+        if _store is None:
+            try:
+                _store = ResultStore()
+            except (OSError, sqlite3.Error):
+                # An unwritable results directory should never break checking.
+                return None
+        return _store
+
+def checked(rule_set, text, compute, fuzzy=False, campaign=None, source=None):
+    """
+    Runs a check through the shared store when it is available. Returns
+    (result, cached_at) like `ResultStore.check`; empty text is never stored.
+    """
+    store = get_store() if text.strip() else None
+    if store is None:
+        return compute(), None
+    try:
+        return store.check(rule_set, text, compute, fuzzy, campaign, source)
+    except sqlite3.Error:
+        return compute(), None
+
+# --- Command line ---
+
+def _when(timestamp):
+    return time.strftime("%Y-%m-%d %H:%M", time.localtime(timestamp))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Query stored compliance results.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("stats", help="show row counts")
+    failing = sub.add_parser("failing", help="sources failing a rule (id or label) recently")
+    failing.add_argument("rule")
+    failing.add_argument("--days", type=float, default=7)
+    failing.add_argument("--limit", type=int, default=1000)
+    history = sub.add_parser("history", help="recent checks of a campaign or source")
+    group = history.add_mutually_exclusive_group(required=True)
+    group.add_argument("--campaign")
+    group.add_argument("--source")
+    history.add_argument("--limit", type=int, default=50)
+    args = parser.parse_args(argv)
+
+    store = ResultStore()
+    if args.command == "stats":
+        for name, value in store.stats().items():
+            print(f"{name}: {value}")
+    elif args.command == "failing":
+        for row in store.failing(args.rule, time.time() - args.days * 86400, limit=args.limit):
+            print(f"{_when(row['last_failed_at'])}  {row['kind']:10}  x{row['failures']:<4} "
+                  f"{row['source'] or ''}  {row['campaign'] or ''}")
+    else:
+        for row in store.history(args.campaign, args.source, args.limit):
+            verdict = "Compliant" if row["compliant"] else "Not Compliant"
+            missing = ", ".join(row["result"]["missing_required"]) or "-"
+            print(f"{_when(row['checked_at'])}  {row['rule_set']:8}  {verdict:13}  missing: {missing}")
+
+if __name__ == "__main__":
+    sys.exit(main())
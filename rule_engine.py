@@ -0,0 +1,436 @@
+"""
+Compiled compliance rule engine.
+
+All rules live in rules.json. A scan covers one rule set (or every set):
+the literals of the set are located in one pass over the lowered text with
+an Aho-Corasick automaton (pyahocorasick), or with one str.find pass per
+literal when it isn't installed, and each regex rule with its own compiled
+pattern, so the per-character work stays in C.
+"""
+import hashlib
+import json
+import os
+import re
+
+try:
+    import ahocorasick
+except ImportError:  # Optional; literals fall back to str.find per literal.
+    ahocorasick = None
+
+import metrics
+from fuzzy import NormalizedText, default_budget, find_approximate, normalize_phrase
+
+RULES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "rules.json")
+
+# Longest match assumed for regex rules without a "max_length"; the same
+# bound StreamScanner uses for pattern matches across chunk boundaries.
+DEFAULT_PATTERN_MAX_LENGTH = 1000
+
+# Stored verdicts are keyed on this next to the rules.json hash (see
+# RuleEngine.verdict_version). Bump it with any change to matching or
+# evaluation code, here or in fuzzy.py and compliance_logic.py, that can
+# change a verdict for the same rules.
+MATCHER_VERSION = 1
+
+# ".*", ".+" and ".{n,}": a match could run past any declared max_length.
+_UNBOUNDED_WILDCARD = re.compile(r"(?<!\\)\.(?:[*+]|\{\d*,\})")
+
+# --- Matching ---
+
+def _find_literals(literals, text, offset=0, after=0):
+    """
+    Yields (start, end, rule index, literal) for every occurrence of every
+    literal in text, overlapping ones included, that ends after `after`.
+    offset is added to reported positions.
+    """
+    find = text.find
+    for literal, index in literals:
+        length = len(literal)
+        pos = find(literal, max(0, after - length + 1))
+        while pos != -1:
+            yield offset + pos, offset + pos + length, index, literal
+            pos = find(literal, pos + 1)
+
+class _Literals:
+    """
+    The (lowered literal, rule index) pairs of a rule set. With pyahocorasick
+    they are compiled into one automaton, so finding them costs one pass over
+    the text however many rules there are.
+    """
+
+    def __init__(self, literals):
+        self.literals = literals
+        self.max_length = max((len(literal) for literal, _ in literals), default=0)
+        self._automaton = None
+        if ahocorasick is not None and literals:
+            indexes = {}
+            for literal, index in literals:
+                indexes.setdefault(literal, []).append(index)
+            automaton = ahocorasick.Automaton()
+            for literal, found in indexes.items():
+                automaton.add_word(literal, (literal, tuple(found)))
+            automaton.make_automaton()
+            self._automaton = automaton
+
+    def find(self, text, offset=0, after=0):
+        """
+        Same contract as _find_literals.
+        """
+        if self._automaton is None:
+            yield from _find_literals(self.literals, text, offset, after)
+            return
+        for last, (literal, indexes) in self._automaton.iter(text, max(0, after - self.max_length + 1)):
+            end = last + 1
+            if end <= after:
+                continue
+            start = end - len(literal)
+            for index in indexes:
+                yield offset + start, offset + end, index, literal
+
+def _find_pattern(regex, text, pos=0):
+    """
+    Yields the match starting at each position from `pos` where the regex
+    matches, overlapping ones included.
+    """
+    search = regex.search
+    m = search(text, pos)
+    while m:
+        yield m
+        m = search(text, m.start() + 1)
+
+# --- Rules ---
+
+def _load_rules(path):
+    with open(path, encoding="utf-8") as f:
+        raw = f.read()
+    data = json.loads(raw)
+    version = hashlib.sha256(raw.encode("utf-8")).hexdigest()[:12]
+    return data, version
+
+class RuleEngine:
+    """
+    Holds every rule set from the registry, compiled once.
+    """
+
+    def __init__(self, data, version=""):
+        self.version = version
+        self.rule_sets = data.get("rule_sets", {})
+        self.rules = []
+        self.rules_by_id = {}
+
+        for index, rule in enumerate(data["rules"]):
+            rule = dict(rule)
+            rule.setdefault("match", "any")
+            if rule["kind"] not in ("required", "prohibited"):
+                raise ValueError(f"Rule {rule['id']}: unknown kind {rule['kind']!r}")
+            if rule["set"] not in self.rule_sets:
+                raise ValueError(f"Rule {rule['id']}: unknown rule set {rule['set']!r}")
+            if "pattern" in rule:
+                compiled = re.compile(rule["pattern"], re.IGNORECASE)
+                if compiled.match(""):
+                    raise ValueError(f"Rule {rule['id']}: pattern matches the empty string")
+                if _UNBOUNDED_WILDCARD.search(rule["pattern"]):
+                    raise ValueError(f"Rule {rule['id']}: unbounded wildcard; use .{{0,N}} and set max_length")
+                rule["_regex"] = compiled
+            # Longest text a match of this rule can span (or need to look at).
+            rule["_max_length"] = max(
+                [len(literal) for literal in rule.get("literals", [])]
+                + ([rule.get("max_length", DEFAULT_PATTERN_MAX_LENGTH)] if "pattern" in rule else [])
+            )
+            # (literal, normalized literal, edit budget) for fuzzy mode.
+            # Prohibited phrases default to no edits: one edit turns "we do
+            # not sell your data" into "we sell your data" or "will now" into
+            # "will not", so they only tolerate whitespace and hyphenation.
+            rule["_fuzzy"] = [
+                (literal.lower(), normalize_phrase(literal),
+                 rule.get("max_distance",
+                          default_budget(normalize_phrase(literal)) if rule["kind"] == "required" else 0))
+                for literal in rule.get("literals", [])
+            ]
+            self.rules.append(rule)
+            self.rules_by_id[rule["id"]] = rule
+
+        self._sets = {name: self._compile_set(name) for name in [None, *self.rule_sets]}
+
+    def _compile_set(self, rule_set):
+        indexes = [i for i, rule in enumerate(self.rules) if rule_set is None or rule["set"] == rule_set]
+        literals = _Literals([(literal.lower(), i) for i in indexes for literal in self.rules[i].get("literals", [])])
+        patterns = [i for i in indexes if "pattern" in self.rules[i]]
+        return {
+            "literals": literals,
+            "patterns": patterns,
+            "max_literal": literals.max_length,
+            "max_pattern": max((self.rules[i]["_max_length"] for i in patterns), default=0),
+        }
+
+    def _compiled(self, rule_set):
+        try:
+            return self._sets[rule_set]
+        except KeyError:
+            raise ValueError(f"Unknown rule set {rule_set!r}") from None
+
+    @classmethod
+    def from_file(cls, path=RULES_PATH):
+        data, version = _load_rules(path)
+        return cls(data, version)
+
+    @property
+    def verdict_version(self):
+        """
+        What a verdict depends on besides the text: the rules and the code
+        applying them.
+        """
+        return f"{self.version}.m{MATCHER_VERSION}"
+
+    def rules_in(self, rule_set, kind=None):
+        """
+        Returns the rules of one rule set, optionally filtered by kind, in registry order.
+        """
+        return [r for r in self.rules if r["set"] == rule_set and (kind is None or r["kind"] == kind)]
+
+    def labels(self, rule_set, kind):
+        return [r["label"] for r in self.rules_in(rule_set, kind)]
+
+    def _hit(self, index, start, end, matched, distance=0):
+        rule = self.rules[index]
+        return {"rule": rule["id"], "label": rule["label"], "start": start, "end": end,
+                "text": matched, "distance": distance}
+
+    def scan(self, text: str, rule_set=None, fuzzy=False):
+        """
+        Finds every hit of the rules in `rule_set` (default: every set).
+
+        Returns hit dicts sorted by start offset. Offsets index into `text`
+        (into its lowered form in the rare case lowering changes its length).
+        With `fuzzy`, literals without an exact hit are also searched
+        approximately within each rule's edit budget (whitespace and
+        hyphenation only, for prohibited rules); those hits carry their edit
+        distance.
+        """
+        metrics.record_size("rule_scan", "chars", len(text))
+        with metrics.timed("rule_scan"):
+            scanner = self.stream(rule_set)
+            scanner.feed(text)
+            hits = scanner.finish()
+        if fuzzy:
+            with metrics.timed("fuzzy_scan"):
+                hits.extend(self._fuzzy_hits(text, hits, rule_set))
+            hits.sort(key=lambda h: (h["start"], h["end"]))
+        return hits
+
+    def _fuzzy_hits(self, text, exact_hits, rule_set=None):
+        found = {(h["rule"], h["text"]) for h in exact_hits}
+        normalized = None
+        hits = []
+        for index, rule in enumerate(self.rules):
+            if rule_set is not None and rule["set"] != rule_set:
+                continue
+            for literal, phrase, budget in rule["_fuzzy"]:
+                if (rule["id"], literal) in found:
+                    continue
+                if normalized is None:
+                    normalized = NormalizedText(text)
+                for start, end, distance in find_approximate(phrase, normalized.text, budget):
+                    hits.append(self._hit(
+                        index,
+                        normalized.original_offset(start),
+                        normalized.original_offset(end),
+                        literal,
+                        distance,
+                    ))
+        return hits
+
+    def max_length(self, rule_id):
+        """
+        Longest text a match of the rule can span: its longest literal, or
+        the pattern's "max_length" (DEFAULT_PATTERN_MAX_LENGTH if unset).
+        """
+        return self.rules_by_id[rule_id]["_max_length"]
+
+    def scan_window(self, text: str, start, stop, rule_set=None):
+        """
+        Returns, sorted, every exact hit that could read text[start:stop]:
+        hits of each rule starting in [start - max_length, stop). Only the
+        surrounding text those hits can reach is lowered and scanned.
+
+        Returns None if lowering changes the window's length, since offsets
+        would then drift, or if a pattern match exceeds its rule's max_length;
+        callers should fall back to `scan`.
+        """
+        compiled = self._compiled(rule_set)
+        hits = []
+        reach = compiled["max_literal"]
+        lo = max(0, start - reach)
+        window = text[lo:stop + reach]
+        lower = window.lower()
+        if len(lower) != len(window):
+            return None
+        for a, b, index, literal in compiled["literals"].find(lower, lo):
+            if start - self.rules[index]["_max_length"] <= a < stop:
+                hits.append(self._hit(index, a, b, literal))
+
+        if compiled["patterns"]:
+            reach = compiled["max_pattern"]
+            lo = max(0, start - reach)
+            window = text[lo:stop + reach]
+            lower = window.lower()
+            if len(lower) != len(window):
+                return None
+            for index in compiled["patterns"]:
+                rule = self.rules[index]
+                for m in _find_pattern(rule["_regex"], lower, max(0, start - rule["_max_length"] - lo)):
+                    a = lo + m.start()
+                    if a >= stop:
+                        break
+                    if m.end() - m.start() > rule["_max_length"]:
+                        # Longer than declared, so the window may have cut it short.
+                        return None
+                    hits.append(self._hit(index, a, lo + m.end(), m.group(0)))
+        hits.sort(key=lambda h: (h["start"], h["end"]))
+        return hits
+
+    def stream(self, rule_set=None, pattern_window=DEFAULT_PATTERN_MAX_LENGTH):
+        """
+        Returns a StreamScanner over `rule_set` for text that arrives in chunks.
+        """
+        return StreamScanner(self, rule_set, pattern_window)
+
+    def satisfied(self, rule, texts):
+        """
+        True if a rule with hits whose matched texts are `texts` is met;
+        "all" rules need every one of their literals.
+        """
+        if rule["match"] == "all" and "pattern" not in rule:
+            return all(literal.lower() in texts for literal in rule["literals"])
+        return bool(texts)
+
+    def matched_rules(self, hits):
+        """
+        Returns the ids of rules satisfied by the given hits.
+        """
+        seen = {}
+        for hit in hits:
+            seen.setdefault(hit["rule"], set()).add(hit["text"])
+        return {rule_id for rule_id, texts in seen.items() if self.satisfied(self.rules_by_id[rule_id], texts)}
+
+    def evaluate(self, rule_set, hits):
+        """
+        Splits a rule set into present / missing required and found prohibited labels.
+        """
+        matched = self.matched_rules(hits)
+        exact = self.matched_rules([h for h in hits if not h.get("distance")])
+        present, missing, prohibited = [], [], []
+        for rule in self.rules_in(rule_set):
+            if rule["kind"] == "required":
+                (present if rule["id"] in matched else missing).append(rule["label"])
+            elif rule["id"] in matched:
+                prohibited.append(rule["label"])
+        return {
+            "compliant": not missing and not prohibited,
+            "present_required": present,
+            "missing_required": missing,
+            "prohibited_phrases_found": prohibited,
+            # Rules satisfied only through approximate (fuzzy) hits.
+            "approximate": [r["label"] for r in self.rules_in(rule_set) if r["id"] in matched - exact],
+            "hits": [h for h in hits if self.rules_by_id[h["rule"]]["set"] == rule_set],
+        }
+
+class StreamScanner:
+    """
+    Scans text fed in chunks, producing the same hits as `RuleEngine.scan`
+    over the concatenated text.
+
+    The last (longest literal - 1) characters are searched again with each
+    chunk, so literals split over a chunk boundary are found. Regex rules are
+    re-run over a tail of the last `pattern_window` characters, so pattern
+    matches up to that length are found across boundaries too.
+    """
+
+    def __init__(self, engine, rule_set=None, pattern_window=DEFAULT_PATTERN_MAX_LENGTH):
+        self.engine = engine
+        self.rule_set = rule_set
+        self.pattern_window = pattern_window
+        self.hits = []
+        self.length = 0
+        self._compiled = engine._compiled(rule_set)
+        self._literal_tail = ""
+        self._tail = ""
+        self._tail_start = 0
+        self._pattern_from = 0
+        self._seen_patterns = set()
+        self._texts = {}
+
+    def _add(self, index, start, end, matched):
+        hit = self.engine._hit(index, start, end, matched)
+        self.hits.append(hit)
+        self._texts.setdefault(hit["rule"], set()).add(hit["text"])
+        return hit
+
+    def feed(self, chunk: str):
+        """
+        Scans the next chunk and returns the hits it produced.
+        """
+        engine = self.engine
+        compiled = self._compiled
+        lower = chunk.lower()
+        offset = self.length
+        new_hits = []
+
+        # Only occurrences ending in the new chunk are new.
+        carried = self._literal_tail
+        buffer = carried + lower
+        for start, end, index, literal in compiled["literals"].find(
+                buffer, offset - len(carried), len(carried)):
+            new_hits.append(self._add(index, start, end, literal))
+        keep = compiled["max_literal"] - 1
+        self._literal_tail = buffer[-keep:] if keep > 0 else ""
+        self.length += len(lower)
+
+        if compiled["patterns"]:
+            buffer = self._tail + lower
+            base = self._tail_start
+            for index in compiled["patterns"]:
+                for m in _find_pattern(engine.rules[index]["_regex"], buffer, self._pattern_from - base):
+                    pos = m.start()
+                    if (index, base + pos) in self._seen_patterns:
+                        continue
+                    self._seen_patterns.add((index, base + pos))
+                    new_hits.append(self._add(index, base + pos, base + m.end(), m.group(0)))
+            # Matches starting before the window could not have been cut off
+            # by the chunk boundary; everything after it is rescanned next time.
+            keep = buffer[-self.pattern_window:] if self.pattern_window else ""
+            self._tail_start = base + len(buffer) - len(keep)
+            self._tail = keep
+            self._pattern_from = self._tail_start
+            self._seen_patterns = {seen for seen in self._seen_patterns if seen[1] >= self._tail_start}
+        return new_hits
+
+    def resolved(self, rule_set):
+        """
+        True once every rule of the set has matched, i.e. more text cannot
+        change the rule set's outcome.
+        """
+        if self.rule_set is not None and rule_set != self.rule_set:
+            raise ValueError(f"Scanner covers rule set {self.rule_set!r}, not {rule_set!r}")
+        return all(
+            self.engine.satisfied(rule, self._texts.get(rule["id"], ()))
+            for rule in self.engine.rules_in(rule_set)
+        )
+
+    def finish(self):
+        """
+        Returns all hits sorted by start offset.
+        """
+        self.hits.sort(key=lambda h: (h["start"], h["end"]))
+        return self.hits
+
+_engine = None
+
+def get_engine():
+    """
+    Returns the shared engine compiled from rules.json.
+    """
+    global _engine
+    if _engine is None:
+        _engine = RuleEngine.from_file()
+    return _engine
@@ -1,11 +1,72 @@
+"""
+Desktop launcher: runs the Streamlit server in this process (no shell), so
+the packaged app starts one interpreter instead of two.
+
+By default a background thread loads the rule engine, the extractors and the
+OCR model shortly after the server starts, so the first check doesn't pay for
+them; the UI itself never waits on it. Disable with --no-warm-up or
+A2P_WARMUP=0.
+
+Usage:
+    python run_app.py [--port 8501] [--headless] [--no-warm-up]
+"""
+import argparse
 import os
 import sys
+import threading
+import time
 
 # Adjust for PyInstaller
 if getattr(sys, 'frozen', False):
     base_path = sys._MEIPASS
-    app_path = os.path.join(base_path, "app.py")
 else:
-    app_path = os.path.join(os.path.dirname(__file__), "app.py")
+    base_path = os.path.dirname(os.path.abspath(__file__))
+app_path = os.path.join(base_path, "app.py")
+
+def warm_up(delay=1.0):
+    """
+    Imports the extraction stack and loads the OCR model. Runs after `delay`
+    seconds so it doesn't compete with the server's own startup.
+    """
+    def ocr():
+        from ocr_engine import get_ocr_engine
+        get_ocr_engine().warm_up()
+
+    time.sleep(delay)
+    steps = [
+        lambda: __import__("compliance_logic"),  # compiles rules.json
+        lambda: __import__("html_extract"),
+        ocr,
+        lambda: __import__("pdf_extract"),
+    ]
+    for step in steps:
+        try:
+            step()
+        except Exception as e:  # Best effort; extractors still load on first use.
+            print(f"Warm-up step skipped: {type(e).__name__}: {e}", file=sys.stderr)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Launch the A2P/TFV compliance app.")
+    parser.add_argument("--port", type=int, default=None)
+    parser.add_argument("--headless", action="store_true", help="don't open a browser window")
+    parser.add_argument("--no-warm-up", action="store_true", help="load extractors on first use only")
+    parser.add_argument("--warm-up-delay", type=float, default=1.0, help="seconds before warming up")
+    args = parser.parse_args(argv)
+
+    if base_path not in sys.path:
+        sys.path.insert(0, base_path)
+    if not args.no_warm_up and os.environ.get("A2P_WARMUP", "1") != "0":
+        threading.Thread(target=warm_up, args=(args.warm_up_delay,), name="a2p-warm-up", daemon=True).start()
+
+    from streamlit.web import cli as stcli
+
+    flags = ["--global.developmentMode=false"]
+    if args.port:
+        flags.append(f"--server.port={args.port}")
+    if args.headless:
+        flags.append("--server.headless=true")
+    sys.argv = ["streamlit", "run", app_path, *flags]
+    sys.exit(stcli.main())
 
-os.system(f"streamlit run '{app_path}'")
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+import json
+import threading
+import time
+import urllib.error
+import urllib.request
+
+import pytest
+
+import api_server
+
+
+@pytest.fixture
+def server(monkeypatch):
+    monkeypatch.setenv("A2P_RESULTS_DISABLE", "1")
+    server = api_server.make_server(port=0, workers=1, queue_size=0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.app.pool.shutdown()
+    server.server_close()
+
+
+def _post(server, path, body):
+    url = f"http://127.0.0.1:{server.server_address[1]}{path}"
+    request = urllib.request.Request(url, data=json.dumps(body).encode(), method="POST")
+    try:
+        with urllib.request.urlopen(request, timeout=10) as response:
+            return response.status, json.load(response)
+    except urllib.error.HTTPError as e:
+        return e.code, json.load(e)
+
+
+def test_non_object_body_is_rejected(server):
+    status, body = _post(server, "/v1/check/optin", ["reply stop"])
+    assert status == 400 and "JSON object" in body["error"]
+
+
+def test_check_runs_on_worker_pool(server):
+    status, body = _post(server, "/v1/check/privacy", {"text": "We do not sell your data."})
+    assert status == 200 and "cached_at" in body
+
+    release = threading.Event()
+    server.app.pool.submit(release.wait)
+    try:
+        status, body = _post(server, "/v1/check/optin", {"text": "Reply STOP to opt out."})
+        assert status == 429
+    finally:
+        release.set()
+
+
+@pytest.mark.parametrize("path, body", [
+    ("/v1/check/optin", {"text": 42}),
+    ("/v1/check/privacy", {"text": ["We do not sell your data."]}),
+    ("/v1/check", {"privacy_text": {"url": "https://example.com"}}),
+    ("/v1/check", {"optin_text": "Reply STOP", "campaign_id": 7}),
+    ("/v1/extract/url", {"url": ["https://example.com"]}),
+])
+def test_non_string_fields_are_rejected(server, path, body):
+    status, response = _post(server, path, body)
+    assert status == 400 and "must be a string" in response["error"]
+
+
+class _SlowRelease(threading.BoundedSemaphore):
+    def release(self, n=1):
+        # Widens the window between finishing the work and freeing its slot.
+        time.sleep(0.05)
+        super().release(n)
+
+
+def test_slot_is_free_once_the_result_is_visible():
+    pool = api_server.WorkerPool(workers=1, queue_size=0)
+    pool._slots = _SlowRelease(1)
+    try:
+        for i in range(5):
+            assert pool.submit(lambda i=i: i).result(timeout=5) == i
+    finally:
+        pool.shutdown()
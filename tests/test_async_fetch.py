@@ -0,0 +1,183 @@
+import asyncio
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+pytest.importorskip("aiohttp")
+
+import async_fetch  # noqa: E402
+from async_fetch import AsyncFetcher  # noqa: E402
+from errors import ExtractionError  # noqa: E402
+from extract_cache import ExtractCache, url_key  # noqa: E402
+
+PAGE = b"<html><body><p>We never share data with third parties.</p></body></html>"
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """
+    /slow/<n>   answers after a short delay, tracking concurrent requests
+    /flaky/<n>  fails with 503 the first n times
+    /busy       always 503 with a huge Retry-After
+    /etag       200 with an ETag, or 304 when it is sent back
+    """
+
+    def log_message(self, *args):
+        pass
+
+    def _page(self, status=200, headers=None, body=PAGE):
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        stub = self.server.stub
+        with stub.lock:
+            stub.requests.append((self.path, dict(self.headers)))
+        if self.path.startswith("/slow/"):
+            with stub.lock:
+                stub.active += 1
+                stub.peak = max(stub.peak, stub.active)
+            time.sleep(0.05)
+            with stub.lock:
+                stub.active -= 1
+            return self._page()
+        if self.path.startswith("/flaky/"):
+            with stub.lock:
+                attempt = sum(1 for path, _ in stub.requests if path == self.path)
+            if attempt <= int(self.path.rsplit("/", 1)[1]):
+                return self._page(503, {"Retry-After": "0"}, b"")
+            return self._page()
+        if self.path == "/busy":
+            return self._page(503, {"Retry-After": "3600"}, b"")
+        if self.path == "/etag":
+            if self.headers.get("If-None-Match") == '"v1"':
+                return self._page(304, {"ETag": '"v1"'}, b"")
+            return self._page(headers={"ETag": '"v1"'})
+        self._page(404, body=b"")
+
+
+class Stub:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = []
+        self.active = self.peak = 0
+
+
+@pytest.fixture
+def stub():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    server.daemon_threads = True
+    server.stub = Stub()
+    server.stub.base = f"http://127.0.0.1:{server.server_address[1]}"
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server.stub
+    server.shutdown()
+    server.server_close()
+
+
+async def _fetch_all(urls, **options):
+    async with AsyncFetcher(cache=False, **options) as fetcher:
+        return [item async for item in fetcher.fetch_many(urls)]
+
+
+def test_per_host_cap(stub):
+    urls = [f"{stub.base}/slow/{i}" for i in range(12)]
+    results = asyncio.run(_fetch_all(urls, per_host=3))
+    assert sorted(url for url, _, _ in results) == sorted(urls)
+    assert all(text == "We never share data with third parties." for _, text, _ in results)
+    assert 1 < stub.peak <= 3
+
+
+def test_retries_transient_errors_then_succeeds(stub):
+    [(url, text, error)] = asyncio.run(_fetch_all([f"{stub.base}/flaky/2"], backoff=0.01))
+    assert error is None and "third parties" in text
+    assert [path for path, _ in stub.requests] == ["/flaky/2"] * 3
+
+
+def test_gives_up_after_retries(stub):
+    [(url, text, error)] = asyncio.run(_fetch_all([f"{stub.base}/flaky/9"], retries=2, backoff=0.01))
+    assert text is None and isinstance(error, ExtractionError) and error.reason == "http_503"
+    assert len(stub.requests) == 3
+
+
+def test_html_cut_at_max_bytes_is_flagged_and_not_cached(stub, tmp_path):
+    cache = ExtractCache(str(tmp_path))
+    url = f"{stub.base}/slow/0"
+
+    async def fetch(max_bytes):
+        async with AsyncFetcher(cache=cache, max_bytes=max_bytes) as fetcher:
+            return await fetcher.fetch(url)
+
+    text = asyncio.run(fetch(40))
+    assert text.truncated and "third parties" not in text
+    assert cache.get(url_key(url)) is None
+    text = asyncio.run(fetch(len(PAGE)))
+    assert not text.truncated and cache.get(url_key(url)) == text
+
+
+def test_retry_after_is_clamped(stub):
+    start = time.monotonic()
+    [(_, _, error)] = asyncio.run(_fetch_all([f"{stub.base}/busy"], retries=2, max_backoff=0.05))
+    assert error is not None and time.monotonic() - start < 5
+
+
+def test_revalidate_sends_etag_and_handles_304(stub):
+    async def run():
+        async with AsyncFetcher(cache=False) as fetcher:
+            first = await fetcher.revalidate(f"{stub.base}/etag")
+            second = await fetcher.revalidate(f"{stub.base}/etag", first[1])
+        return first, second
+
+    (text, validators), (unchanged, kept) = asyncio.run(run())
+    assert "third parties" in text and validators == {"ETag": '"v1"'}
+    assert unchanged is None and kept == validators
+    assert stub.requests[1][1].get("If-None-Match") == '"v1"'
+
+
+def test_stale_cache_entry_is_revalidated(stub, tmp_path):
+    cache = ExtractCache(str(tmp_path))
+    url = f"{stub.base}/etag"
+    cache.put(url_key(url), "cached text", ttl=-1, validators={"ETag": '"v1"'})
+
+    async def run():
+        async with AsyncFetcher(cache=cache) as fetcher:
+            return await fetcher.fetch(url)
+
+    assert asyncio.run(run()) == "cached text"
+    assert stub.requests[0][1].get("If-None-Match") == '"v1"'
+    # The 304 refreshed the entry, so it is fresh again.
+    assert cache.get(url_key(url)) == "cached text"
+
+
+def test_unexpected_error_cancels_sibling_fetches(monkeypatch):
+    started, cancelled = [], []
+
+    async def fetch(self, url):
+        if url == "boom":
+            await asyncio.sleep(0.01)
+            raise RuntimeError("unexpected")
+        started.append(url)
+        try:
+            await asyncio.sleep(60)
+        except asyncio.CancelledError:
+            cancelled.append(url)
+            raise
+
+    monkeypatch.setattr(async_fetch.AsyncFetcher, "fetch", fetch)
+
+    async def run():
+        fetcher = AsyncFetcher(cache=False, session=object())
+        with pytest.raises(RuntimeError):
+            async for _ in fetcher.fetch_many(["a", "boom", "b"]):
+                pass
+        # Checked before asyncio.run's own cleanup could cancel them.
+        return sorted(cancelled)
+
+    assert asyncio.run(run()) == sorted(started) == ["a", "b"]
@@ -0,0 +1,46 @@
+import csv
+import json
+
+from batch_check import ResultWriter, load_completed, truncate_partial_record
+
+
+def test_resume_skips_truncated_jsonl_line(tmp_path):
+    path = tmp_path / "out.jsonl"
+    lines = "".join(json.dumps({"row": i}) + "\n" for i in range(5))
+    path.write_text(lines + '{"row": 5, "id": "c', encoding="utf-8")
+    assert 4 in load_completed(str(path)) and 5 not in load_completed(str(path))
+
+    truncate_partial_record(str(path))
+    assert path.read_text(encoding="utf-8") == lines
+    writer = ResultWriter(str(path), append=True)
+    writer.write({"row": 5})
+    writer.close()
+    assert [json.loads(line)["row"] for line in path.open(encoding="utf-8")] == [0, 1, 2, 3, 4, 5]
+
+
+def test_resume_truncates_partial_csv_row(tmp_path):
+    path = tmp_path / "out.csv"
+    writer = ResultWriter(str(path))
+    for row in range(3):
+        # A quoted newline inside a field is not a record boundary.
+        writer.write({"row": row, "error": "line one\nline two"})
+    writer.close()
+    with path.open("a", encoding="utf-8", newline="") as f:
+        f.write('3,c3,"partial\nerr')
+
+    truncate_partial_record(str(path))
+    done = load_completed(str(path))
+    assert 2 in done and 3 not in done
+    writer = ResultWriter(str(path), append=True)
+    writer.write({"row": 3})
+    writer.close()
+    rows = list(csv.DictReader(path.open(encoding="utf-8", newline="")))
+    assert [r["row"] for r in rows] == ["0", "1", "2", "3"]
+    assert rows[0]["error"] == "line one\nline two"
+
+
+def test_truncate_without_any_complete_record(tmp_path):
+    path = tmp_path / "out.jsonl"
+    path.write_text('{"row": 0', encoding="utf-8")
+    truncate_partial_record(str(path), block_size=4)
+    assert path.read_bytes() == b""
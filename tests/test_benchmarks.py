@@ -0,0 +1,61 @@
+import json
+import os
+import sys
+
+BENCHMARKS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks")
+sys.path.insert(0, BENCHMARKS)
+
+from run_benchmarks import STAGES, compare, over_limit, unexpected_skips  # noqa: E402
+
+def _stage(p50=10.0, p99=20.0, rss=50.0, throughput=100.0):
+    return {"p50_ms": p50, "p99_ms": p99, "peak_rss_mb": rss, "throughput_per_s": throughput}
+
+def _results(**stages):
+    return {"stages": stages}
+
+def test_compare_allows_changes_within_tolerance():
+    baseline = _results(check_privacy=_stage())
+    current = _results(check_privacy=_stage(p50=12.4, rss=62.0, throughput=76.0))
+    assert compare(baseline, current, 0.25) == []
+
+def test_compare_flags_slower_fatter_or_lower_throughput():
+    baseline = _results(check_privacy=_stage())
+    current = _results(check_privacy=_stage(p50=12.6, rss=63.0, throughput=74.0))
+    assert compare(baseline, current, 0.25) == [
+        "check_privacy.p50_ms: 10.0 -> 12.6",
+        "check_privacy.peak_rss_mb: 50.0 -> 63.0",
+        "check_privacy.throughput_per_s: 100.0 -> 74.0",
+    ]
+
+def test_compare_flags_a_baseline_stage_that_no_longer_runs():
+    baseline = _results(check_privacy=_stage(), extract_url=_stage())
+    current = _results(check_privacy={"error": "RuntimeError: boom"}, extract_url={"skipped": "aiohttp not installed"})
+    assert compare(baseline, current, 0.25) == [
+        "check_privacy: no results (RuntimeError: boom)",
+        "extract_url: no results (skipped: aiohttp not installed)",
+    ]
+
+def test_compare_ignores_stages_missing_on_either_side():
+    baseline = _results(check_privacy=_stage(), extract_image={"skipped": "tesseract not installed"})
+    current = _results(extract_image=_stage(p50=1000.0))
+    assert compare(baseline, current, 0.25) == []
+
+def test_ratio_stages_gate_on_their_own_limit():
+    ratio = {"ratios": {"a": 7.0}, "ratio_max": 7.0, "max_ratio": 6, "peak_rss_mb": 50.0}
+    assert over_limit(_results(fuzzy_overhead=ratio)) == ["fuzzy_overhead.ratio_max: 7.0 > 6"]
+    assert over_limit(_results(fuzzy_overhead=dict(ratio, ratio_max=5.0))) == []
+    baseline = _results(fuzzy_overhead=dict(ratio, ratio_max=2.0))
+    assert compare(baseline, _results(fuzzy_overhead=dict(ratio, ratio_max=3.0)), 0.25) == [
+        "fuzzy_overhead.ratio_max: 2.0 -> 3.0"
+    ]
+
+def test_skips_fail_unless_allowed():
+    results = _results(check_privacy=_stage(), extract_image={"skipped": "tesseract not installed"})
+    assert unexpected_skips(results, set()) == ["extract_image: tesseract not installed"]
+    assert unexpected_skips(results, {"extract_image"}) == []
+
+def test_reference_baseline_covers_every_stage():
+    with open(os.path.join(BENCHMARKS, "baselines", "reference.json"), encoding="utf-8") as f:
+        baseline = json.load(f)
+    assert set(baseline["stages"]) == set(STAGES)
+    assert not [stage for stage, result in baseline["stages"].items() if "error" in result]
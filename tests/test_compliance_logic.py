@@ -0,0 +1,61 @@
+import random
+
+import pytest
+
+from compliance_logic import check_legacy_compliance, check_privacy_compliance, labels_by_source, merge_sources
+
+# The phrase lists compliance_logic.py shipped with before rules.json.
+LEGACY = {
+    "optin_legacy": (
+        ["consent", "recurring messages", "message and data rates may apply"],
+        ["free trial", "no charges", "anonymous"],
+    ),
+    "privacy_legacy": (
+        ["third parties", "contact information", "how data is collected", "how data is shared"],
+        ["we sell your data", "no privacy", "no protection"],
+    ),
+}
+
+
+def _original(rule_set, text):
+    required, prohibited = LEGACY[rule_set]
+    found = text.lower()
+    missing = [phrase for phrase in required if phrase not in found]
+    detected = [phrase for phrase in prohibited if phrase in found]
+    return {"compliant": not missing and not detected, "missing": missing, "prohibited": detected}
+
+
+@pytest.mark.parametrize("rule_set", sorted(LEGACY))
+def test_legacy_rule_sets_match_original_lists(rule_set):
+    rng = random.Random(rule_set)
+    phrases = [phrase for group in LEGACY[rule_set] for phrase in group]
+    texts = [""] + [
+        " filler ".join(p.upper() if rng.random() < 0.3 else p for p in rng.sample(phrases, rng.randint(1, len(phrases))))
+        for _ in range(200)
+    ]
+    for text in texts:
+        assert check_legacy_compliance(rule_set, text) == _original(rule_set, text)
+
+
+def test_merge_sources_spans_index_the_merged_text():
+    texts = ["first file", "", "third file"]
+    merged, spans = merge_sources(texts)
+    assert [merged[start:end] for start, end in spans] == texts
+
+
+def test_hits_are_attributed_to_every_source_they_span():
+    # Fuzzy matching reads "third\n\nparties" as "third parties", so the hit
+    # runs across the boundary between the two screenshots.
+    texts = ["We share data with third", "parties and affiliates. This explains how information is used."]
+    merged, spans = merge_sources(texts)
+    result = check_privacy_compliance(merged, fuzzy=True)
+    labels = labels_by_source("privacy", result["hits"], spans)
+    assert "third parties" in labels[0] and "third parties" in labels[1]
+    assert "how information is used" not in labels[0] and "how information is used" in labels[1]
+
+
+def test_hits_inside_one_source_stay_there():
+    texts = ["No match here.", "We do not share data with third parties.", "Nor here."]
+    merged, spans = merge_sources(texts)
+    hits = [{"rule": "privacy.third_parties", "start": merged.index("third"), "end": merged.index("third") + 13}]
+    assert labels_by_source("privacy", hits, spans) == [[], ["third parties"], []]
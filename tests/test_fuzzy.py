@@ -0,0 +1,67 @@
+import random
+import re
+
+import pytest
+
+from compliance_logic import check_opt_in_compliance, check_privacy_compliance
+from fuzzy import NormalizedText, default_budget, find_approximate, normalize_phrase
+
+def test_normalize_collapses_whitespace_and_hyphens():
+    assert normalize_phrase("  How to\nOpt - Out ") == "how to opt out"
+
+def test_normalized_offsets_map_back_to_the_original():
+    text = "Reply  STOP\n\nto unsubscribe"
+    normalized = NormalizedText(text)
+    assert normalized.text == "reply stop to unsubscribe"
+    start = normalized.text.index("to unsubscribe")
+    assert text[normalized.original_offset(start):] == "to unsubscribe"
+
+def test_normalized_text_matches_a_per_character_reference():
+    # Every separator run collapses to one space, and offsets inside a run
+    # map to its first character.
+    rng = random.Random(0)
+    for _ in range(500):
+        text = "".join(rng.choice("ab \n\t-\u2014\xa0\u3000\xadZ") for _ in range(rng.randint(0, 30)))
+        expected, offsets = [], []
+        for m in re.finditer(r"[\s\-\u2010-\u2014\xad]+|[^\s\-\u2010-\u2014\xad]", text):
+            expected.append(" " if m.end() - m.start() > 1 or not m.group().isalnum() else m.group().lower())
+            offsets.append(m.start())
+        normalized = NormalizedText(text)
+        assert normalized.text == "".join(expected)
+        assert [normalized.original_offset(i) for i in range(len(offsets))] == offsets
+
+
+def test_default_budget_scales_with_length():
+    assert default_budget("stop") == 0
+    assert default_budget("message and data rates may apply") == 4
+
+@pytest.mark.parametrize("text, distance", [
+    ("message and data rates may apply", 0),
+    ("message and data rates rnay apply", 2),
+    ("message and dala rates rnay apply", 3),
+])
+def test_find_approximate_reports_best_distance(text, distance):
+    matches = find_approximate("message and data rates may apply", text, 4)
+    assert [(start, end, found) for start, end, found in matches] == [(0, len(text), distance)]
+
+def test_find_approximate_respects_the_budget():
+    assert find_approximate("reply stop to unsubscribe", "reply sotp ot unsbuscribe", 1) == []
+
+def test_required_phrases_tolerate_ocr_errors():
+    result = check_opt_in_compliance("Msg: Message and data rates rnay apply. Reply ST0P to unsubscribe.", fuzzy=True)
+    assert "message and data rates may apply" in result["present_required"]
+    assert "message and data rates may apply" in result["approximate"]
+
+# One edit flips the meaning of a prohibited phrase, so fuzzy mode must not
+# report these (regressions: they were flagged as prohibited).
+@pytest.mark.parametrize("check, text", [
+    (check_privacy_compliance, "We do not sell your data to anyone."),
+    (check_opt_in_compliance, "After signing up we will now contact you by text."),
+    (check_opt_in_compliance, "Once confirmed, you will now receive any messages you subscribed to."),
+])
+def test_negations_are_not_prohibited_in_fuzzy_mode(check, text):
+    assert check(text, fuzzy=True)["prohibited_phrases_found"] == []
+
+def test_prohibited_phrases_still_match_across_line_breaks():
+    result = check_privacy_compliance("Note: we sell your\ndata to partners.", fuzzy=True)
+    assert result["prohibited_phrases_found"] == ["we sell your data"]
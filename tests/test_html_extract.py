@@ -0,0 +1,101 @@
+import pytest
+
+from errors import ExtractionError
+from html_extract import html_to_text, is_pdf, stream_url_text
+
+
+def test_skips_scripts_and_page_chrome():
+    html = (
+        "<html><head><title>Privacy</title><style>p{}</style></head><body>"
+        "<header><nav>Home</nav>Acme</header><p>We never sell data.</p>"
+        "<script>var sell = 1;</script><footer>Contact us</footer></body></html>"
+    )
+    assert html_to_text(html) == "Privacy\nWe never sell data."
+
+
+def test_keeps_webforms_body():
+    html = '<body><form id="aspnetForm"><p>We share data with third parties.</p></form></body>'
+    assert html_to_text(html) == "We share data with third parties."
+
+
+def test_keeps_headers_inside_content():
+    html = (
+        "<body><header>Acme</header><main><section>"
+        "<header><h2>How information is collected</h2></header><p>Via forms.</p>"
+        "<footer>Last updated 2024</footer></section></main></body>"
+    )
+    assert html_to_text(html) == "How information is collected\nVia forms.\nLast updated 2024"
+
+
+def test_is_pdf():
+    assert is_pdf("application/pdf; charset=binary", b"")
+    assert is_pdf("text/html", b"%PDF-1.7\n")
+    assert not is_pdf(None, b"<html>")
+
+
+class _Response:
+    def __init__(self, body, content_type):
+        self.body = body
+        self.headers = {"Content-Type": content_type}
+        self.encoding = "utf-8"
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def raise_for_status(self):
+        pass
+
+    def iter_content(self, chunk_size):
+        for i in range(0, len(self.body), chunk_size):
+            yield self.body[i:i + chunk_size]
+
+
+class _Session:
+    def __init__(self, response):
+        self.response = response
+
+    def get(self, url, **kwargs):
+        return self.response
+
+
+def test_html_capped_at_max_bytes():
+    body = b"<p>" + b"a" * 1000 + b"</p><p>tail</p>"
+    session = _Session(_Response(body, "text/html; charset=utf-8"))
+    status = {}
+    text = "".join(stream_url_text("http://x", max_bytes=500, session=session, status=status))
+    assert text == "a" * 497 and status == {"truncated": True}
+
+
+def test_body_exactly_at_cap_is_not_truncated():
+    body = b"<p>" + b"a" * 100 + b"</p>"
+    session = _Session(_Response(body, "text/html; charset=utf-8"))
+    status = {}
+    text = "".join(stream_url_text("http://x", max_bytes=len(body), session=session, status=status))
+    assert text == "a" * 100 and status == {}
+
+
+def test_pdf_not_truncated_by_html_cap(monkeypatch):
+    import sys
+    import types
+
+    seen = []
+    fake = types.ModuleType("pdf_extract")
+    fake.iter_pdf_text = lambda data: (seen.append(data), iter(["pdf text"]))[1]
+    monkeypatch.setitem(sys.modules, "pdf_extract", fake)
+    body = b"%PDF-1.7\n" + b"x" * 1000
+    session = _Session(_Response(body, "application/octet-stream"))
+    text = "".join(stream_url_text("http://x", max_bytes=100, session=session, max_pdf_bytes=10_000))
+    assert text == "pdf text" and seen == [body]
+
+    session = _Session(_Response(body, "application/pdf"))
+    with pytest.raises(ExtractionError) as info:
+        "".join(stream_url_text("http://x", max_bytes=100, session=session, max_pdf_bytes=500))
+    assert info.value.reason == "too_large"
+
+    # A PDF exactly at the limit is still accepted.
+    seen.clear()
+    text = "".join(stream_url_text("http://x", max_bytes=100, session=session, max_pdf_bytes=len(body)))
+    assert text == "pdf text" and seen == [body]
@@ -0,0 +1,67 @@
+import random
+
+import pytest
+
+from incremental import IncrementalChecker, _common_prefix, _common_suffix
+from rule_engine import RuleEngine, get_engine
+
+ENGINE = get_engine()
+
+POLICY = (
+    "Privacy Policy. This page explains how information is collected and how information is used. "
+    "Data we collect is never sold. No mobile information will be shared with third parties or "
+    "affiliates for marketing or promotional purposes. Learn how to opt-out or contact information "
+    "for data security questions. I agree to receive messages; message frequency may vary. "
+    "Reply STOP or HELP. See our privacy policy. "
+)
+INSERTS = ["", "x", " third parties ", "opt out", "promotional purposes", "stop help", "İ", "\n", "we sell your data"]
+
+def _key(hits):
+    return [(h["rule"], h["start"], h["end"], h["text"]) for h in hits]
+
+def test_common_prefix_and_suffix():
+    assert _common_prefix("abcdef", "abcxef") == 3
+    assert _common_suffix("abcdef", "abcxef", 3) == 2
+    assert _common_prefix("abc", "abc") == 3
+    assert _common_suffix("abc", "xbc", 0) == 0
+
+@pytest.mark.parametrize("rule_set", [None, *ENGINE.rule_sets])
+def test_random_edits_match_a_full_scan(rule_set):
+    rnd = random.Random(rule_set or "all")
+    checker = IncrementalChecker(rule_set)
+    text = POLICY * 3
+    for _ in range(300):
+        start = rnd.randrange(len(text) + 1)
+        stop = min(len(text), start + rnd.randint(0, 40))
+        text = text[:start] + rnd.choice(INSERTS) + text[stop:]
+        assert _key(checker.update(text)) == _key(ENGINE.scan(text, rule_set))
+
+def test_long_line_sms_disclosure_is_not_kept_after_its_ending_is_edited():
+    # Regression: an unbounded pattern matched across more than the assumed
+    # max length, and the stale hit survived the edit.
+    text = ("no mobile information will be shared with third parties " + "and " * 400
+            + "for promotional purposes. done")
+    checker = IncrementalChecker("privacy_guidelines")
+    checker.update(text)
+    edited = text.replace("promotional purposes", "other uses")
+    assert _key(checker.update(edited)) == _key(ENGINE.scan(edited, "privacy_guidelines"))
+    assert "SMS disclosure" in checker.check(edited)["missing_required"]
+
+def test_matches_longer_than_declared_fall_back_to_a_full_scan():
+    engine = RuleEngine({
+        "rule_sets": {"s": ""},
+        "rules": [{"id": "p", "set": "s", "kind": "required", "label": "p",
+                   "pattern": "begin\\s+end", "max_length": 12}],
+    })
+    text = "begin" + " " * 50 + "end tail"
+    checker = IncrementalChecker("s", engine)
+    checker.update(text)
+    edited = text.replace("end tail", "fin tail")
+    assert _key(checker.update(edited)) == _key(engine.scan(edited, "s")) == []
+
+def test_unbounded_wildcards_are_rejected():
+    with pytest.raises(ValueError):
+        RuleEngine({
+            "rule_sets": {"s": ""},
+            "rules": [{"id": "p", "set": "s", "kind": "required", "label": "p", "pattern": "a.*?b"}],
+        })
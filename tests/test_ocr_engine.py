@@ -0,0 +1,66 @@
+import io
+import threading
+
+import pytest
+from PIL import Image, ImageDraw
+
+import ocr_engine
+
+
+class _FlakyApi:
+    failures = 0
+
+    def __init__(self, **kwargs):
+        if _FlakyApi.failures:
+            _FlakyApi.failures -= 1
+            raise RuntimeError("Failed to init API, possibly an invalid tessdata path")
+
+
+def test_failed_engine_load_frees_its_slot(monkeypatch):
+    monkeypatch.setattr(ocr_engine, "PyTessBaseAPI", _FlakyApi)
+    monkeypatch.setattr(ocr_engine, "PSM", type("PSM", (), {"AUTO": 3}), raising=False)
+    engine = ocr_engine.OcrEngine(pool_size=2)
+    _FlakyApi.failures = 3
+    for _ in range(3):
+        with pytest.raises(RuntimeError):
+            engine._acquire()
+    assert engine._created == 0
+
+    acquired = []
+    thread = threading.Thread(target=lambda: acquired.append(engine._acquire()))
+    thread.start()
+    thread.join(timeout=5)
+    assert not thread.is_alive() and isinstance(acquired[0], _FlakyApi)
+    assert engine._created == 1
+
+
+def _image_bytes(size, fmt, color="white"):
+    buffer = io.BytesIO()
+    Image.new("RGB", size, color).save(buffer, fmt)
+    return buffer.getvalue()
+
+
+def test_tall_screenshots_keep_a_legible_width():
+    tall = Image.new("RGB", (1170, 12000), "white")
+    ImageDraw.Draw(tall).text((40, 40), "Reply STOP to unsubscribe", fill="black")
+    image = ocr_engine.preprocess(tall)
+    assert image.size == (ocr_engine.MIN_SHORT_SIDE, round(12000 * ocr_engine.MIN_SHORT_SIDE / 1170))
+    # Already within the pixel budget: left alone.
+    assert ocr_engine.preprocess(Image.new("RGB", (1170, 2532), "white")).size == (1170, 2532)
+
+
+def test_large_images_are_scaled_to_the_pixel_budget():
+    width, height = ocr_engine.target_size(6000, 4000)
+    assert abs(width * height - ocr_engine.DEFAULT_MAX_PIXELS) < 10_000
+    assert round(width / height, 2) == 1.5
+
+
+@pytest.mark.parametrize("size", [(8000, 6000), (1170, 12000), (4000, 3000), (12000, 6000)])
+def test_estimate_memory_mirrors_jpeg_draft(size):
+    data = _image_bytes(size, "JPEG")
+    target = ocr_engine.target_size(*size)
+    drafted = ocr_engine.load_image(data).size
+    scale = ocr_engine._draft_scale(*size, target)
+    assert drafted == (-(-size[0] // scale), -(-size[1] // scale))
+    assert drafted[0] >= target[0] and drafted[1] >= target[1]
+    assert ocr_engine.estimate_memory(data) >= drafted[0] * drafted[1] + target[0] * target[1] * 3
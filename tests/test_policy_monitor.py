@@ -0,0 +1,137 @@
+import asyncio
+
+import pytest
+
+import policy_monitor
+from errors import ExtractionError
+from policy_monitor import PolicyMonitor, diff_sections
+
+URL = "https://example.com/privacy"
+COMPLIANT = "\n".join([
+    "How information is collected: forms.",
+    "How information is used: to send messages.",
+    "How to opt-out: reply STOP.",
+    "Third parties: none.",
+    "Data security: encrypted.",
+    "Contact information: privacy@example.com.",
+])
+
+
+class StubFetcher:
+    """
+    Answers revalidate() from a per-URL queue of responses: a string is a
+    200 body, None a 304 and an exception is raised.
+    """
+
+    def __init__(self):
+        self.responses = {}
+        self.requests = []
+
+    async def revalidate(self, url, validators=None):
+        self.requests.append((url, validators))
+        response = self.responses[url].pop(0)
+        if isinstance(response, BaseException):
+            raise response
+        if response is None:
+            return None, validators
+        return response, {"ETag": f'"{len(self.requests)}"'}
+
+
+@pytest.fixture
+def monitor(tmp_path, monkeypatch):
+    monkeypatch.setenv("A2P_RESULTS_DISABLE", "1")
+    events = []
+    monitor = PolicyMonitor(str(tmp_path), on_event=events.append, jitter=0)
+    monitor.events = events
+    return monitor
+
+
+def poll(monitor, fetcher):
+    # Make every policy due again, then run one round.
+    with monitor._connect() as conn:
+        conn.execute("UPDATE policies SET next_check = 0")
+    return asyncio.run(monitor.poll_due(fetcher))
+
+
+def test_diff_sections():
+    assert diff_sections(["a", "b", "c"], ["a", "x", "c", "d"]) == (["x", "d"], ["b"])
+
+
+def test_regression_and_change_events(monitor):
+    monitor.add(URL, campaign="CMP1")
+    fetcher = StubFetcher()
+    fetcher.responses[URL] = [
+        COMPLIANT,
+        COMPLIANT.replace("Third parties: none.", "Third parties: we sell your data."),
+        COMPLIANT + "\nUpdated 2026.",
+    ]
+    poll(monitor, fetcher)
+    assert monitor.events == []  # The first poll sets the baseline.
+    assert monitor.policies()[0]["compliant"] is True
+
+    poll(monitor, fetcher)
+    event = monitor.events[-1]
+    assert event["type"] == "regression" and event["campaign"] == "CMP1"
+    assert "we sell your data" in event["newly_prohibited"]
+    assert event["newly_missing"] == []
+    assert event["sections"]["added"] == ["Third parties: we sell your data."]
+    assert event["sections"]["removed"] == ["Third parties: none."]
+    # Validators from the last response are sent on the next poll.
+    assert fetcher.requests[-1][1] == {"ETag": '"1"'}
+
+    poll(monitor, fetcher)
+    event = monitor.events[-1]
+    assert event["type"] == "changed" and "we sell your data" in event["resolved"]
+    assert event["sections"]["added"] == ["Third parties: none.", "Updated 2026."]
+
+
+def test_unchanged_page_emits_nothing(monitor):
+    monitor.add(URL)
+    fetcher = StubFetcher()
+    # A 304, then a 200 whose markup changed but whose text did not.
+    fetcher.responses[URL] = [COMPLIANT, None, COMPLIANT]
+    for _ in range(3):
+        poll(monitor, fetcher)
+    assert monitor.events == []
+    assert monitor.policies()[0]["failures"] == 0
+
+
+def test_rules_change_rechecks_the_snapshot(monitor):
+    monitor.add(URL)
+    fetcher = StubFetcher()
+    text = COMPLIANT.replace("Data security: encrypted.\n", "")
+    fetcher.responses[URL] = [text, None, None]
+    poll(monitor, fetcher)
+    # Pretend the verdict was stored under older rules that passed it.
+    with monitor._connect() as conn:
+        conn.execute("UPDATE policies SET rules_version = 'old', missing = '[]', compliant = 1")
+    poll(monitor, fetcher)
+    event = monitor.events[-1]
+    assert event["type"] == "regression" and event["newly_missing"] == ["data security"]
+    assert event["sections"]["added_count"] == event["sections"]["removed_count"] == 0
+
+    # Re-checked under the current rules now, so a 304 is just a 304.
+    poll(monitor, fetcher)
+    assert len(monitor.events) == 1
+
+
+def test_one_failing_url_does_not_stop_the_round(monitor):
+    urls = [monitor.add(f"https://example.com/{name}") for name in ("os", "value", "ok")]
+    fetcher = StubFetcher()
+    fetcher.responses[urls[0]] = [OSError("connection reset")] * policy_monitor.UNREACHABLE_AFTER
+    fetcher.responses[urls[1]] = [ValueError("bad header")]
+    fetcher.responses[urls[2]] = [COMPLIANT]
+    assert poll(monitor, fetcher) == 3
+
+    by_url = {policy["url"]: policy for policy in monitor.policies()}
+    assert by_url[urls[0]]["failures"] == 1 and "connection reset" in by_url[urls[0]]["last_error"]
+    assert by_url[urls[1]]["failures"] == 1
+    assert by_url[urls[2]]["compliant"] is True
+
+    for _ in range(policy_monitor.UNREACHABLE_AFTER - 1):
+        fetcher.responses[urls[1]] = [ExtractionError("extract_url", "http_404", "gone")]
+        fetcher.responses[urls[2]] = [None]
+        poll(monitor, fetcher)
+    unreachable = [event for event in monitor.events if event["type"] == "unreachable"]
+    assert {event["url"] for event in unreachable} == {urls[0], urls[1]}
+    assert next(e for e in unreachable if e["url"] == urls[0])["reason"] == "OSError"
@@ -0,0 +1,31 @@
+import time
+
+from compliance_logic import check_privacy_compliance
+from result_store import ResultStore
+
+TEXT = "We may share contact information with partners."
+
+
+def test_anonymous_checks_are_cached_but_not_in_history(tmp_path):
+    store = ResultStore(str(tmp_path))
+    compute = lambda: check_privacy_compliance(TEXT)  # noqa: E731
+    result, cached_at = store.check("privacy", TEXT, compute)
+    assert cached_at is None
+    again, cached_at = store.check("privacy", TEXT, lambda: 1 / 0)
+    assert again == result and cached_at is not None
+    assert store.stats()["checks"] == 0 and store.stats()["failures"] == 0
+
+    store.check("privacy", TEXT, compute, source="https://example.com/privacy")
+    assert store.stats()["checks"] == 1
+    failing = store.failing(result["missing_required"][0], since=time.time() - 60)
+    assert [row["source"] for row in failing] == ["https://example.com/privacy"]
+
+
+def test_matcher_version_change_invalidates_verdicts(tmp_path, monkeypatch):
+    import rule_engine
+
+    store = ResultStore(str(tmp_path))
+    store.check("privacy", TEXT, lambda: check_privacy_compliance(TEXT))
+    assert store.lookup("privacy", TEXT)[0] is not None
+    monkeypatch.setattr(rule_engine, "MATCHER_VERSION", rule_engine.MATCHER_VERSION + 1)
+    assert store.lookup("privacy", TEXT) == (None, None)
@@ -0,0 +1,100 @@
+import random
+
+import pytest
+
+import rule_engine
+from rule_engine import RuleEngine, get_engine
+
+ENGINE = get_engine()
+
+POLICY = (
+    "Privacy Policy\n"
+    "This section explains how information is collected and how information is used. "
+    "We do not share data with third parties. Learn how to opt-out at any time. "
+    "Data security matters to us; see our contact information below.\n"
+    "No mobile information will be shared with third parties or affiliates for marketing or promotional purposes.\n"
+)
+
+def _key(hits):
+    return [(h["rule"], h["start"], h["end"], h["text"]) for h in hits]
+
+def test_scan_covers_only_the_requested_rule_set():
+    hits = ENGINE.scan(POLICY, "privacy")
+    assert hits
+    assert {ENGINE.rules_by_id[h["rule"]]["set"] for h in hits} == {"privacy"}
+
+def test_scan_of_all_sets_is_the_union_of_each_set():
+    everything = sorted(_key(ENGINE.scan(POLICY)))
+    by_set = sorted(hit for rule_set in ENGINE.rule_sets for hit in _key(ENGINE.scan(POLICY, rule_set)))
+    assert everything == by_set
+
+def test_literal_hits_match_substring_search():
+    lower = POLICY.lower()
+    for rule in ENGINE.rules_in("privacy"):
+        for literal in rule.get("literals", []):
+            expected = [i for i in range(len(lower)) if lower.startswith(literal, i)]
+            found = [h["start"] for h in ENGINE.scan(POLICY, "privacy") if h["text"] == literal]
+            assert found == expected, literal
+
+def test_overlapping_literals_are_all_reported():
+    engine = RuleEngine({
+        "rule_sets": {"s": ""},
+        "rules": [
+            {"id": "a", "set": "s", "kind": "required", "label": "a", "literals": ["aa"]},
+            {"id": "b", "set": "s", "kind": "required", "label": "b", "literals": ["aab"]},
+        ],
+    })
+    assert _key(engine.scan("aaab", "s")) == [("a", 0, 2, "aa"), ("a", 1, 3, "aa"), ("b", 1, 4, "aab")]
+
+def _many_rules(count, seed=3):
+    rnd = random.Random(seed)
+    words = "data share third party opt out consent message rates apply reply stop help".split()
+    rules = []
+    for i in range(count):
+        phrase = " ".join(rnd.choice(words) for _ in range(rnd.randint(1, 3)))
+        rules.append({"id": f"r{i}", "set": "s", "kind": "required", "label": phrase, "literals": [phrase]})
+    text = " ".join(rnd.choice(words) for _ in range(3000))
+    return {"rule_sets": {"s": ""}, "rules": rules}, text
+
+def test_automaton_matches_per_literal_search(monkeypatch):
+    pytest.importorskip("ahocorasick")
+    data, text = _many_rules(400)
+    automaton = RuleEngine(data)
+    monkeypatch.setattr(rule_engine, "ahocorasick", None)
+    fallback = RuleEngine(data)
+    assert _key(automaton.scan(text, "s")) == _key(fallback.scan(text, "s"))
+    assert _key(automaton.scan_window(text, 5000, 6000, "s")) == _key(fallback.scan_window(text, 5000, 6000, "s"))
+    scanner = automaton.stream("s")
+    for pos in range(0, len(text), 37):
+        scanner.feed(text[pos:pos + 37])
+    assert _key(scanner.finish()) == _key(fallback.scan(text, "s"))
+
+def test_patterns_report_a_match_at_every_start():
+    engine = RuleEngine({
+        "rule_sets": {"s": ""},
+        "rules": [{"id": "p", "set": "s", "kind": "required", "label": "p", "pattern": "ab+"}],
+    })
+    assert _key(engine.scan("xabbab", "s")) == [("p", 1, 4, "abb"), ("p", 4, 6, "ab")]
+
+@pytest.mark.parametrize("rule_set", [None, *ENGINE.rule_sets])
+def test_stream_matches_scan_for_any_chunking(rule_set):
+    text = POLICY * 20
+    rnd = random.Random(7)
+    for _ in range(20):
+        scanner = ENGINE.stream(rule_set)
+        pos = 0
+        while pos < len(text):
+            size = rnd.randint(1, 200)
+            scanner.feed(text[pos:pos + size])
+            pos += size
+        assert _key(scanner.finish()) == _key(ENGINE.scan(text, rule_set))
+
+def test_unknown_rule_set_is_rejected():
+    with pytest.raises(ValueError):
+        ENGINE.scan(POLICY, "nope")
+
+def test_evaluate_reports_missing_and_prohibited():
+    result = ENGINE.evaluate("privacy", ENGINE.scan(POLICY + " We sell your data.", "privacy"))
+    assert result["missing_required"] == []
+    assert result["prohibited_phrases_found"] == ["we sell your data"]
+    assert not result["compliant"]
@@ -0,0 +1,76 @@
+import threading
+import time
+
+import pytest
+
+import utils
+from errors import ExtractionError
+
+
+class _Upload:
+    def __init__(self, data):
+        self.data = data
+
+    def getvalue(self):
+        return self.data
+
+
+@pytest.fixture
+def fake_ocr(monkeypatch):
+    """
+    Replaces OCR with a stub: b"fail..." raises, anything else sleeps for
+    its length in milliseconds and returns itself as text. Records the
+    budget each call was given.
+    """
+    monkeypatch.setenv("A2P_CACHE_DISABLE", "1")
+    budgets = []
+    lock = threading.Lock()
+
+    def ocr(data, budget=None):
+        with lock:
+            budgets.append(budget)
+        if data.startswith(b"fail"):
+            raise ValueError("unreadable image")
+        time.sleep(len(data) / 1000)
+        return data.decode()
+
+    monkeypatch.setattr(utils, "_ocr_image", ocr)
+    return budgets
+
+
+def test_images_come_back_in_input_order_with_errors_in_place(fake_ocr):
+    # Longer payloads take longer, so completion order is the reverse of input order.
+    uploads = [_Upload(b"x" * n) for n in (40, 30, 20)] + [_Upload(b"fail"), _Upload(b"y")]
+    results = utils.extract_text_from_images(uploads, max_workers=5)
+    assert [text for text, _ in results] == ["x" * 40, "x" * 30, "x" * 20, None, "y"]
+    _, error = results[3]
+    assert isinstance(error, ExtractionError) and error.stage == "extract_image"
+    assert "unreadable image" in str(error)
+    assert all(error is None for i, (_, error) in enumerate(results) if i != 3)
+
+
+def test_batches_share_one_memory_budget(fake_ocr):
+    utils.extract_text_from_images([_Upload(b"a"), _Upload(b"b")])
+    utils.extract_text_from_images([_Upload(b"c")])
+    assert len(fake_ocr) == 3 and all(budget is utils.get_ocr_memory_budget() for budget in fake_ocr)
+
+    utils.extract_text_from_images([_Upload(b"d")], memory_budget=1024)
+    assert fake_ocr[-1] is not utils.get_ocr_memory_budget() and fake_ocr[-1].total == 1024
+
+
+def test_memory_budget_admits_an_oversized_request_alone():
+    budget = utils.MemoryBudget(100)
+    held = budget.acquire(60)
+    admitted = threading.Event()
+
+    def big():
+        budget.release(budget.acquire(500))
+        admitted.set()
+
+    thread = threading.Thread(target=big)
+    thread.start()
+    assert not admitted.wait(0.05)
+    budget.release(held)
+    assert admitted.wait(5)
+    thread.join()
+    assert budget.used == 0
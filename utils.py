@@ -1,18 +1,205 @@
-import pytesseract
-from PIL import Image
-import requests
-from bs4 import BeautifulSoup
-import io
+# The OCR and HTTP/HTML stacks are imported on first use, so the app can
+# render before they load (see run_app.py for the background warm-up).
+import os
+import threading
 
-def extract_text_from_image(uploaded_file):
-    image = Image.open(uploaded_file)
-    text = pytesseract.image_to_string(image)
-    return text
+import metrics
+from errors import ExtractionError, error_reason
+from extract_cache import get_cache, image_key, url_key
+from rule_engine import get_engine
 
-def extract_text_from_url(url):
+
+def _read_image_bytes(uploaded_file):
+    if hasattr(uploaded_file, "getvalue"):
+        return uploaded_file.getvalue()
+    if hasattr(uploaded_file, "read"):
+        return uploaded_file.read()
+    with open(uploaded_file, "rb") as f:
+        return f.read()
+
+# Bytes that screenshots being OCR'd may hold decoded at once, across every
+# batch in the process.
+DEFAULT_OCR_MEMORY_BUDGET = 512 * 1024 * 1024
+
+class MemoryBudget:
+    """
+    Counting limit on estimated bytes in use. A request larger than the whole
+    budget is admitted once nothing else holds any, so it runs alone.
+    """
+
+    def __init__(self, total):
+        self.total = total
+        self.used = 0
+        self._cond = threading.Condition()
+
+    def acquire(self, amount):
+        amount = min(amount, self.total)
+        with self._cond:
+            while self.used and self.used + amount > self.total:
+                self._cond.wait()
+            self.used += amount
+        return amount
+
+    def release(self, amount):
+        with self._cond:
+            self.used -= amount
+            self._cond.notify_all()
+
+_ocr_budget = None
+_ocr_budget_lock = threading.Lock()
+
+def get_ocr_memory_budget():
+    """
+    Returns the process-wide OCR memory budget (A2P_OCR_MEMORY_BUDGET bytes,
+    default 512 MB) that every batch shares, so concurrent batches (Streamlit
+    sessions, API requests) together stay within it.
+    """
+    global _ocr_budget
+    with _ocr_budget_lock:
+        if _ocr_budget is None:
+            _ocr_budget = MemoryBudget(int(os.environ.get("A2P_OCR_MEMORY_BUDGET", DEFAULT_OCR_MEMORY_BUDGET)))
+        return _ocr_budget
+
+def _ocr_image(data, budget=None):
+    # Pooled in-process Tesseract with preprocessing (see ocr_engine.py)
+    from ocr_engine import estimate_memory, get_ocr_engine
+    if budget is None:
+        return get_ocr_engine().image_to_string(data)
+    held = budget.acquire(estimate_memory(data))
     try:
-        response = requests.get(url, timeout=10)
-        soup = BeautifulSoup(response.text, 'html.parser')
-        return soup.get_text(separator=' ')
-    except Exception as e:
-        return f"Failed to fetch content from URL: {e}"
+        return get_ocr_engine().image_to_string(data)
+    finally:
+        budget.release(held)
+
+def _fetch_url_text(url):
+    # Streamed, size-capped and stripped of page chrome (see html_extract.py)
+    from html_extract import PageText, stream_url_text
+    status = {}
+    text = "".join(stream_url_text(url, status=status))
+    return PageText(text, status.get("truncated", False))
+
+def _url_error(e):
+    import requests
+
+    if isinstance(e, ExtractionError):
+        return e
+    if isinstance(e, requests.exceptions.RequestException):
+        return ExtractionError("extract_url", error_reason(e), f"Failed to fetch content from URL: {e}")
+    return ExtractionError("extract_url", error_reason(e), f"An error occurred during URL processing: {e}")
+
+def extract_text_from_image(uploaded_file, budget=None):
+    """
+    Extracts text from an uploaded image file (or path) using OCR.
+    Results are cached by image content, so identical uploads are OCR'd once.
+    With a MemoryBudget, OCR waits until the image's estimated footprint fits.
+    Raises ExtractionError on failure.
+    """
+    with metrics.timed("extract_image"):
+        try:
+            data = _read_image_bytes(uploaded_file)
+            metrics.record_size("extract_image", "bytes", len(data))
+            cache = get_cache()
+            key = image_key(data)
+            text = cache.get(key) if cache else None
+            if text is None:
+                text = _ocr_image(data, budget)
+                if cache:
+                    cache.put(key, text)
+            return text
+        except Exception as e:
+            raise ExtractionError("extract_image", error_reason(e), f"Failed to extract text from image: {e}") from e
+
+def extract_text_from_images(uploaded_files, memory_budget=None, max_workers=None):
+    """
+    OCRs several images concurrently. Returns (text, error) pairs in input
+    order; exactly one of each pair is None (error is an ExtractionError).
+
+    Images whose estimated decode footprint (from their headers) would push
+    the images in flight past the budget wait for earlier ones to finish.
+    By default that is the budget shared with every other batch (see
+    get_ocr_memory_budget); `memory_budget` gives this batch its own.
+    """
+    import contextvars
+    from concurrent.futures import ThreadPoolExecutor
+
+    budget = MemoryBudget(int(memory_budget)) if memory_budget else get_ocr_memory_budget()
+
+    def extract(uploaded_file):
+        try:
+            return extract_text_from_image(uploaded_file, budget), None
+        except ExtractionError as e:
+            return None, e
+
+    # Threads suffice: tesserocr and Pillow release the GIL, and the OCR
+    # engine pool (see ocr_engine.py) is shared in-process.
+    workers = max_workers or min(4, os.cpu_count() or 1)
+    # Each task runs in a copy of the caller's context, so its stage timings
+    # join the caller's request trace.
+    tasks = [(contextvars.copy_context(), uploaded_file) for uploaded_file in uploaded_files]
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="a2p-ocr") as pool:
+        return list(pool.map(lambda task: task[0].run(extract, task[1]), tasks))
+
+def extract_text_from_url(url):
+    """
+    Scrapes and extracts text content from a given URL (HTML page or PDF).
+    A page cut at the byte cap comes back as an html_extract.PageText with
+    `truncated` set. Results are cached by normalized URL until the cache's
+    URL TTL expires; truncated ones are not cached, so the flag isn't lost.
+    Raises ExtractionError on failure.
+    """
+    with metrics.timed("extract_url"):
+        try:
+            cache = get_cache()
+            key = url_key(url)
+            text = cache.get(key) if cache else None
+            if text is None:
+                text = _fetch_url_text(url)
+                if cache and not text.truncated:
+                    cache.put(key, text, ttl=cache.url_ttl)
+            return text
+        except Exception as e:
+            raise _url_error(e) from e
+
+def extract_and_check_url(url, rule_set="privacy"):
+    """
+    Streams a URL's text into the rule checker and stops downloading once
+    every rule in `rule_set` has resolved. Returns (text, hits, complete);
+    when `complete` is False the text is only the part read before stopping,
+    or the page was cut at the byte cap (then text is an html_extract.PageText
+    with `truncated` set). Raises ExtractionError on failure.
+    """
+    with metrics.timed("extract_url"):
+        try:
+            cache = get_cache()
+            key = url_key(url)
+            text = cache.get(key) if cache else None
+            if text is not None:
+                return text, None, True
+
+            from html_extract import PageText, stream_url_text
+
+            scanner = get_engine().stream(rule_set)
+            parts = []
+            complete = True
+            status = {}
+            chunks = stream_url_text(url, status=status)
+            try:
+                for chunk in chunks:
+                    parts.append(chunk)
+                    scanner.feed(chunk)
+                    if scanner.resolved(rule_set):
+                        complete = False
+                        break
+            finally:
+                chunks.close()
+            text = PageText("".join(parts), status.get("truncated", False))
+            if not complete:
+                metrics.inc("a2p_early_exit_total", stage="extract_url")
+            elif text.truncated:
+                complete = False
+            # Only whole documents are cached; other rule sets may need the rest.
+            if complete and cache:
+                cache.put(key, text, ttl=cache.url_ttl)
+            return text, scanner.finish(), complete
+        except Exception as e:
+            raise _url_error(e) from e